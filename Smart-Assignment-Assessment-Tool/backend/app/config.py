@@ -0,0 +1,16 @@
+import os
+import tempfile
+from dotenv import load_dotenv
+
+load_dotenv()  # Load environment variables from .env
+
+# Root directory for local caches (GitHub responses, blobs, snapshots, ...).
+# Defaults to the machine's temp dir so every gunicorn worker on a host shares it.
+CACHE_ROOT = os.getenv("SAAT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "saat-cache"))
+
+
+def cache_dir(name):
+    """ Return (and create) a named sub-directory of the cache root """
+    path = os.path.join(CACHE_ROOT, name)
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,204 @@
+import hashlib
+
+from firebase_admin import firestore
+from google.api_core.exceptions import NotFound
+
+# Firestore accepts at most 500 writes per batch.
+FIRESTORE_BATCH_SIZE = 400
+
+
+class AnalysisIssue:
+    """
+    Analysis issues stored one document each in a subcollection of the codes
+    document (codes/{code_id}/{collection}/{issue_id}). The codes document
+    keeps only a summary of each analysis: its status fields, "issue_count"
+    and "storage": "rows". Editing or deleting one issue is then a single
+    document write instead of rewriting every issue of the submission.
+    """
+
+    # analysis -> (codes field, issues key, subcollection, identity fields, legacy lookup field, ok status, failed status)
+    # The identity fields match the keys the analyses deduplicate issues by.
+    ANALYSES = {
+        "file_naming": (
+            "file_naming_convention_results", "invalid_files", "file_naming_issues",
+            ("path", "file_name"), "file_name", "Yes", "No",
+        ),
+        "code_naming": (
+            "code_naming_convention_results", "issues", "code_naming_issues",
+            ("file_path", "line_number", "element_name"), "element_name", "Yes", "No",
+        ),
+        "comments_accuracy": (
+            "code_comments_accuracy", "issues", "comments_accuracy_issues",
+            ("file_path", "line_number", "actual_comment"), "file_path", "Pass", "Fail",
+        ),
+    }
+
+    @staticmethod
+    def issue_id(analysis, issue):
+        """ Stable id of an issue: a hash of the fields that identify it (file, line, element) """
+        identity = AnalysisIssue.ANALYSES[analysis][3]
+        key = "\0".join(str(issue.get(field) or "") for field in identity)
+        return hashlib.sha1(f"{analysis}\0{key}".encode()).hexdigest()[:20]
+
+    @staticmethod
+    def sort_key(issue, issue_id):
+        """ Listing order: by file, then line; unique so it can serve as a page token """
+        try:
+            line = int(issue.get("line_number") or 0)
+        except (TypeError, ValueError):
+            line = 0
+        return f"{issue.get('file_path') or issue.get('path') or ''}\0{line:08d}\0{issue_id}"
+
+    @staticmethod
+    def collection(db, code_id, analysis):
+        return db.collection("codes").document(code_id).collection(AnalysisIssue.ANALYSES[analysis][2])
+
+    @staticmethod
+    def _rows(analysis, issues):
+        rows = {}
+        for issue in issues or []:
+            issue_id = issue.get("issue_id") or AnalysisIssue.issue_id(analysis, issue)
+            rows[issue_id] = {**issue, "issue_id": issue_id}
+        return rows
+
+    @staticmethod
+    def _summary(analysis, results, issue_count):
+        field, issues_key, _, _, _, ok_status, failed_status = AnalysisIssue.ANALYSES[analysis]
+        summary = {name: value for name, value in results.items() if name not in (issues_key, "next_page_token")}
+        summary["status"] = failed_status if issue_count else ok_status
+        summary["issue_count"] = issue_count
+        summary["storage"] = "rows"
+        return summary
+
+    @staticmethod
+    def _commit(db, writes):
+        """ Apply [(op, ref, data)] in batches, in order """
+        for start in range(0, len(writes), FIRESTORE_BATCH_SIZE):
+            batch = db.batch()
+            for op, ref, data in writes[start:start + FIRESTORE_BATCH_SIZE]:
+                if op == "set":
+                    batch.set(ref, data)
+                elif op == "update":
+                    batch.update(ref, data)
+                else:
+                    batch.delete(ref)
+            batch.commit()
+
+    @staticmethod
+    def save_results(db, code_id, results, previous=None, fields=None):
+        """
+        Store analysis results, {analysis: results}, as issue rows plus a
+        summary on the codes document. previous holds the results as loaded
+        by load_results; only rows that changed are written and rows that
+        disappeared are deleted. The summaries, and any other codes document
+        fields given in fields, go in the last batch, in one update.
+        """
+        code_ref = db.collection("codes").document(code_id)
+        writes = []
+        summaries = dict(fields or {})
+        for analysis, analysis_results in results.items():
+            field, issues_key = AnalysisIssue.ANALYSES[analysis][:2]
+            before = (previous or {}).get(analysis) or {}
+            # Results still embedded in the codes document have no rows yet.
+            old_rows = AnalysisIssue._rows(analysis, before.get(issues_key)) if before.get("storage") == "rows" else {}
+            new_rows = AnalysisIssue._rows(analysis, analysis_results.get(issues_key))
+            collection = AnalysisIssue.collection(db, code_id, analysis)
+            for issue_id, row in new_rows.items():
+                if old_rows.get(issue_id) != row:
+                    writes.append(("set", collection.document(issue_id), {**row, "sort_key": AnalysisIssue.sort_key(row, issue_id)}))
+            for issue_id in old_rows.keys() - new_rows.keys():
+                writes.append(("delete", collection.document(issue_id), None))
+            summaries[field] = AnalysisIssue._summary(analysis, analysis_results, len(new_rows))
+        writes.append(("update", code_ref, summaries))
+        AnalysisIssue._commit(db, writes)
+        return True
+
+    @staticmethod
+    def load_results(db, code_id, analysis, code_data, limit=None, page_token=None):
+        """
+        Results of an analysis in the stored schema ({"status", issues_key: [...]})
+        with each issue's "issue_id". With limit, one page of issues in file /
+        line order plus "next_page_token" when more follow.
+        """
+        field, issues_key, _, _, _, ok_status, failed_status = AnalysisIssue.ANALYSES[analysis]
+        stored = dict((code_data or {}).get(field) or {})
+        if stored.get("storage") != "rows":
+            # Not migrated yet: page the embedded list.
+            issues = [
+                {**issue, "issue_id": AnalysisIssue.issue_id(analysis, issue)}
+                for issue in stored.get(issues_key) or []
+            ]
+            start = int(page_token or 0)
+            if limit:
+                if start + limit < len(issues):
+                    stored["next_page_token"] = str(start + limit)
+                issues = issues[start:start + limit]
+            if issues_key in stored or issues:
+                stored[issues_key] = issues
+            return stored
+
+        query = AnalysisIssue.collection(db, code_id, analysis).order_by("sort_key")
+        if page_token:
+            query = query.start_after({"sort_key": page_token})
+        if limit:
+            query = query.limit(limit + 1)
+        rows = [doc.to_dict() for doc in query.stream()]
+        if limit and len(rows) > limit:
+            rows = rows[:limit]
+            stored["next_page_token"] = rows[-1]["sort_key"]
+        for row in rows:
+            row.pop("sort_key", None)
+        # The count is kept by atomic increments, so the status follows it.
+        stored["status"] = failed_status if stored.get("issue_count") else ok_status
+        if rows or stored.get("issue_count"):
+            stored[issues_key] = rows
+        return stored
+
+    @staticmethod
+    def ensure_rows(db, code_id, analysis, code_data):
+        """ Move results still embedded in the codes document into issue rows (once per analysis) """
+        field = AnalysisIssue.ANALYSES[analysis][0]
+        stored = (code_data or {}).get(field) or {}
+        if stored and stored.get("storage") != "rows":
+            AnalysisIssue.save_results(db, code_id, {analysis: stored})
+
+    @staticmethod
+    def find(db, code_id, analysis, issue_id=None, lookup=None, line_number=None):
+        """
+        The stored issue document for issue_id, or else the first issue whose
+        legacy lookup field (file_name / element_name / file_path) equals lookup,
+        on line_number when given. Returns a snapshot or None.
+        """
+        collection = AnalysisIssue.collection(db, code_id, analysis)
+        if issue_id:
+            doc = collection.document(issue_id).get()
+            return doc if doc.exists else None
+        lookup_field = AnalysisIssue.ANALYSES[analysis][4]
+        for doc in collection.where(lookup_field, "==", lookup).stream():
+            if line_number is None or str(doc.to_dict().get("line_number")) == str(line_number):
+                return doc
+        return None
+
+    @staticmethod
+    def update_issue(db, code_id, analysis, doc, fields):
+        """ Overwrite some fields of one issue; its id stays the same """
+        issue = {**doc.to_dict(), **fields}
+        issue["sort_key"] = AnalysisIssue.sort_key(issue, doc.id)
+        doc.reference.update({**fields, "sort_key": issue["sort_key"]})
+        return True
+
+    @staticmethod
+    def delete_issue(db, code_id, analysis, doc):
+        """
+        Delete one issue and decrement the analysis' issue_count in the same
+        batch. Returns False when the issue was already deleted.
+        """
+        field = AnalysisIssue.ANALYSES[analysis][0]
+        batch = db.batch()
+        batch.delete(doc.reference, option=db.write_option(exists=True))
+        batch.update(db.collection("codes").document(code_id), {f"{field}.issue_count": firestore.Increment(-1)})
+        try:
+            batch.commit()
+        except NotFound:
+            return False
+        return True
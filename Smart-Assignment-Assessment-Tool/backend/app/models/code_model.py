@@ -1,7 +1,7 @@
 from datetime import datetime
 
 class Code:
-    def __init__(self, code_id, submission_id, github_url, comments=None, final_feedback=None, file_naming_convention_results=None, code_naming_convention_results=None, code_comments_accuracy=None):
+    def __init__(self, code_id, submission_id, github_url, comments=None, final_feedback=None, file_naming_convention_results=None, code_naming_convention_results=None, code_comments_accuracy=None, code_metrics=None):
         self.code_id = code_id
         self.submission_id = submission_id
         self.github_url = github_url
@@ -10,6 +10,7 @@ class Code:
         self.file_naming_convention_results = file_naming_convention_results if file_naming_convention_results else {}
         self.code_naming_convention_results = code_naming_convention_results if code_naming_convention_results else {}
         self.code_comments_accuracy = code_comments_accuracy if code_comments_accuracy else {}
+        self.code_metrics = code_metrics if code_metrics else {}
         self.submitted_at = datetime.utcnow().isoformat()
 
     def to_dict(self):
@@ -22,6 +23,7 @@ class Code:
             "file_naming_convention_results": self.file_naming_convention_results,
             "code_naming_convention_results": self.code_naming_convention_results,
             "code_comments_accuracy": self.code_comments_accuracy,
+            "code_metrics": self.code_metrics,
             "submitted_at": self.submitted_at
         }
 
@@ -55,4 +57,26 @@ class Code:
         """ Update naming convention results for a code submission """
         doc_ref = db.collection("codes").document(code_id)
         doc_ref.update({"code_comments_accuracy": results})
-        return True
\ No newline at end of file
+        return True
+    
+    @staticmethod
+    def update_code_metrics(db, code_id, results):
+        """ Update complexity / size / duplication metrics for a code submission """
+        doc_ref = db.collection("codes").document(code_id)
+        doc_ref.update({"code_metrics": results})
+        return True
+
+    @staticmethod
+    def update_prewarm_status(db, code_id, fields, job_id=None):
+        """
+        Update pre-warm job fields (dotted paths such as "prewarm.status").
+        With job_id, only while that job is still the recorded one; returns
+        whether the fields were written.
+        """
+        doc_ref = db.collection("codes").document(code_id)
+        if job_id is not None:
+            current = ((doc_ref.get().to_dict() or {}).get("prewarm") or {}).get("job_id")
+            if current != job_id:
+                return False
+        doc_ref.update(fields)
+        return True
@@ -1,10 +1,42 @@
-from flask import Blueprint, request, jsonify, current_app
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from app.utils.repo_analysis import check_file_naming_conventions, check_code_naming_conventions, check_code_comments_accuracy
+from app.models.analysis_issue_model import AnalysisIssue
 from app.models.code_model import Code
+from app.utils import code_metrics, comment_pairs, context_packer, file_naming, naming_engine
+from app.utils.analysis_cache import analysis_cache_stats, analyzer_version, cached_analysis, incremental_analysis
+from app.utils.code_metrics import compute_code_metrics
+from app.utils.file_naming import FILE_NAMING_ENGINE, check_file_naming_local
+from app.utils.github_client import parse_repo_url
+from app.utils.llm_gateway import gateway_metrics
+from app.utils.llm_usage import bind_usage_context, tag_llm_usage, usage_summary
+from app.utils.naming_engine import NAMING_ENGINE, check_code_naming_local
+from app.utils.github_api import GitHubAPIError
+from app.utils.repo_snapshot import SnapshotError, get_snapshot, resolve_head_sha
 
 # Define Routes
 check_naming_bp = Blueprint('check_naming_routes', __name__)
 
+# (issues key, status without issues, status with issues) of the stored results
+CODE_NAMING_SCHEMA = ("issues", "Yes", "No")
+COMMENTS_ACCURACY_SCHEMA = ("issues", "Pass", "Fail")
+
+
+def tag_code_usage(db, code_id, code_data):
+    """ Attribute this request's Gemini calls to the code document, its submission and assignment """
+    submission_id = code_data.get("submission_id")
+    assignment_id = None
+    if submission_id:
+        try:
+            submission_doc = db.collection("submissions").document(submission_id).get()
+            if submission_doc.exists:
+                assignment_id = submission_doc.to_dict().get("assignment_id")
+        except Exception as e:
+            print(f"Could not look up the assignment of submission {submission_id}: {e}")
+    tag_llm_usage(code_id=code_id, submission_id=submission_id, assignment_id=assignment_id)
+
 @check_naming_bp.route('/check-coding-comments', methods=['POST'])
 def check_naming():
     data = request.get_json()
@@ -16,10 +48,33 @@ def check_naming():
     result = check_code_comments_accuracy(repo_url)
     return jsonify(result)
 
+def run_file_naming_check(repo_url, engine=None, force=False):
+    """
+    Rule-based check over the repository tree by default; Gemini when asked
+    for, or when the tree cannot be fetched. Errors in the rules themselves
+    are raised, not hidden behind a Gemini run. Returns (results, cache_info).
+    """
+    if (engine or FILE_NAMING_ENGINE) == "local":
+        try:
+            owner, repo = parse_repo_url(repo_url)
+            return cached_analysis(
+                repo_url, "file_naming", analyzer_version(file_naming),
+                lambda sha: check_file_naming_local(owner, repo, sha), force
+            )
+        except (GitHubAPIError, SnapshotError) as e:
+            print(f"Local file naming check unavailable for {repo_url}, using Gemini: {e}")
+    return cached_analysis(
+        repo_url, "file_naming", analyzer_version(check_file_naming_conventions, context_packer),
+        lambda sha: check_file_naming_conventions(repo_url, sha), force, "repo_analysis.file_naming"
+    )
+
+
 @check_naming_bp.route('/check-file-naming-conventions', methods=['POST'])
 def checking_file_naming_conventions():
     """
-    Check file naming conventions for a repository and store results in the database
+    Check file naming conventions for a repository and store results in the database.
+    Optional "engine": "local" (default, see FILE_NAMING_ENGINE) or "gemini";
+    "force": true re-runs the check even if this commit was already analysed.
     """
     try:
         db = current_app.db
@@ -37,20 +92,24 @@ def checking_file_naming_conventions():
         
         if not doc.exists:
             return jsonify({"error": "Code ID not found"}), 404
+        code_data = doc.to_dict()
+        tag_code_usage(db, code_id, code_data)
+        previous = AnalysisIssue.load_results(db, code_id, "file_naming", code_data)
         
         # Get naming convention results
-        naming_results = check_file_naming_conventions(repo_url)
+        naming_results, cache_info = run_file_naming_check(repo_url, data.get("engine"), bool(data.get("force")))
         
         # Check if there was an error with the API call
         if "error" in naming_results:
             return jsonify(naming_results), 500
         
         # Update the database with the results
-        Code.update_file_naming_convention_results(db, code_id, naming_results)
+        AnalysisIssue.save_results(db, code_id, {"file_naming": naming_results}, {"file_naming": previous})
         
         return jsonify({
             "message": "File naming convention check completed successfully",
-            "results": naming_results
+            "results": naming_results,
+            "cache": cache_info
         }), 200
         
     except Exception as e:
@@ -59,7 +118,9 @@ def checking_file_naming_conventions():
 @check_naming_bp.route('/file-naming-convention-results', methods=['GET'])
 def get_file_naming_convention_results():
     """
-    Get naming convention results for a specific code submission
+    Get naming convention results for a specific code submission.
+    Optional "limit" returns one page of issues; pass its "next_page_token"
+    as "page_token" for the next one.
     """
     code_id = request.args.get('code_id')
     
@@ -74,8 +135,10 @@ def get_file_naming_convention_results():
         if not doc.exists:
             return jsonify({"error": "Code ID not found"}), 404
         
-        code_data = doc.to_dict()
-        naming_results = code_data.get("file_naming_convention_results", {})
+        naming_results = AnalysisIssue.load_results(
+            db, code_id, "file_naming", doc.to_dict(),
+            request.args.get("limit", type=int), request.args.get("page_token")
+        )
         
         return jsonify({
             "code_id": code_id,
@@ -105,21 +168,18 @@ def update_file_naming_result():
         if not doc.exists:
             return jsonify({"error": "Code ID not found"}), 404
             
-        code_data = doc.to_dict()
-        naming_results = code_data.get("file_naming_convention_results", {})
+        AnalysisIssue.ensure_rows(db, code_id, "file_naming", doc.to_dict())
+        issue = AnalysisIssue.find(db, code_id, "file_naming", data.get("issue_id"), file_name)
+        if issue is None:
+            return jsonify({"error": "File naming result not found"}), 404
         
         # Update the specific file entry
-        if "invalid_files" in naming_results:
-            for i, file in enumerate(naming_results["invalid_files"]):
-                if file["file_name"] == file_name:
-                    naming_results["invalid_files"][i] = {
-                        "file_name": file_name,
-                        "path": path or file.get("path", ""),
-                        "reason": reason or file.get("reason", "")
-                    }
-                    break
-        
-        doc_ref.update({"file_naming_convention_results": naming_results})
+        file = issue.to_dict()
+        AnalysisIssue.update_issue(db, code_id, "file_naming", issue, {
+            "file_name": file_name,
+            "path": path or file.get("path", ""),
+            "reason": reason or file.get("reason", "")
+        })
         
         return jsonify({"message": "File naming result updated successfully"}), 200
         
@@ -134,8 +194,9 @@ def delete_file_naming_result():
         
         code_id = data.get("code_id")
         file_name = data.get("file_name")
+        issue_id = data.get("issue_id")
         
-        if not code_id or not file_name:
+        if not code_id or not (file_name or issue_id):
             return jsonify({"error": "Missing required fields"}), 400
             
         doc_ref = db.collection("codes").document(code_id)
@@ -144,31 +205,61 @@ def delete_file_naming_result():
         if not doc.exists:
             return jsonify({"error": "Code ID not found"}), 404
             
-        code_data = doc.to_dict()
-        naming_results = code_data.get("file_naming_convention_results", {})
-        
-        # Remove the specific file entry
-        if "invalid_files" in naming_results:
-            naming_results["invalid_files"] = [
-                file for file in naming_results["invalid_files"] 
-                if file["file_name"] != file_name
-            ]
-            
-            # Update status if no more invalid files
-            if not naming_results["invalid_files"]:
-                naming_results["status"] = "Yes"
-        
-        doc_ref.update({"file_naming_convention_results": naming_results})
+        # Remove the specific file entry; the status follows its issue count
+        AnalysisIssue.ensure_rows(db, code_id, "file_naming", doc.to_dict())
+        issue = AnalysisIssue.find(db, code_id, "file_naming", issue_id, file_name)
+        if issue is None or not AnalysisIssue.delete_issue(db, code_id, "file_naming", issue):
+            return jsonify({"error": "File naming result not found"}), 404
         
         return jsonify({"message": "File naming result deleted successfully"}), 200
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def run_code_naming_check(repo_url, engine=None, force=False, previous=None):
+    """
+    Local AST / tokenizer engine by default; Gemini when asked for, or when
+    the repository cannot be snapshotted (engine errors are raised). previous
+    is the stored result, so only files changed since its commit are
+    re-analysed. Returns (results, run_info).
+    """
+    if (engine or NAMING_ENGINE) == "local":
+        try:
+            owner, repo = parse_repo_url(repo_url)
+            return incremental_analysis(
+                repo_url, "code_naming", analyzer_version(naming_engine),
+                lambda sha, paths: check_code_naming_local(get_snapshot(owner, repo, sha), paths),
+                CODE_NAMING_SCHEMA, previous, force
+            )
+        except (GitHubAPIError, SnapshotError) as e:
+            print(f"Local naming engine unavailable for {repo_url}, using Gemini: {e}")
+    return incremental_analysis(
+        repo_url, "code_naming", analyzer_version(check_code_naming_conventions, context_packer),
+        lambda sha, paths: check_code_naming_conventions(repo_url, sha, paths),
+        CODE_NAMING_SCHEMA, previous, force, "repo_analysis.code_naming"
+    )
+
+
+def run_comments_accuracy_check(repo_url, force=False, previous=None):
+    """ Gemini comments-accuracy review, incremental like run_code_naming_check. Returns (results, run_info). """
+    if comment_pairs.COMMENTS_ACCURACY_INPUT == "pairs":
+        version = analyzer_version(check_code_comments_accuracy, context_packer, comment_pairs)
+    else:
+        version = analyzer_version(check_code_comments_accuracy, context_packer)
+    return incremental_analysis(
+        repo_url, "comments_accuracy", version,
+        lambda sha, paths: check_code_comments_accuracy(repo_url, sha, paths),
+        COMMENTS_ACCURACY_SCHEMA, previous, force, "repo_analysis.comments_accuracy"
+    )
+
+
 @check_naming_bp.route('/check-code-naming-conventions', methods=['POST'])
 def checking_code_naming_conventions():
     """
-    Check code naming conventions for a repository and store results in the database
+    Check code naming conventions for a repository and store results in the database.
+    Optional "engine": "local" (default, see NAMING_ENGINE) or "gemini";
+    "force": true re-analyses every file; otherwise only files changed since the
+    stored results' commit are.
     """
     try:
         db = current_app.db
@@ -186,20 +277,26 @@ def checking_code_naming_conventions():
         
         if not doc.exists:
             return jsonify({"error": "Code ID not found"}), 404
+        code_data = doc.to_dict()
+        tag_code_usage(db, code_id, code_data)
+        previous = AnalysisIssue.load_results(db, code_id, "code_naming", code_data)
         
         # Get naming convention results
-        naming_results = check_code_naming_conventions(repo_url)
+        naming_results, cache_info = run_code_naming_check(
+            repo_url, data.get("engine"), bool(data.get("force")), previous
+        )
         
         # Check if there was an error with the API call
         if "error" in naming_results:
             return jsonify(naming_results), 500
         
         # Update the database with the results
-        Code.update_code_naming_convention_results(db, code_id, naming_results)
+        AnalysisIssue.save_results(db, code_id, {"code_naming": naming_results}, {"code_naming": previous})
         
         return jsonify({
             "message": "Code naming convention check completed successfully",
-            "results": naming_results
+            "results": naming_results,
+            "cache": cache_info
         }), 200
         
     except Exception as e:
@@ -208,7 +305,9 @@ def checking_code_naming_conventions():
 @check_naming_bp.route('/code-naming-convention-results', methods=['GET'])
 def get_code_naming_convention_results():
     """
-    Get naming convention results for a specific code submission
+    Get naming convention results for a specific code submission.
+    Optional "limit" returns one page of issues; pass its "next_page_token"
+    as "page_token" for the next one.
     """
     code_id = request.args.get('code_id')
     
@@ -223,8 +322,10 @@ def get_code_naming_convention_results():
         if not doc.exists:
             return jsonify({"error": "Code ID not found"}), 404
         
-        code_data = doc.to_dict()
-        naming_results = code_data.get("code_naming_convention_results", {})
+        naming_results = AnalysisIssue.load_results(
+            db, code_id, "code_naming", doc.to_dict(),
+            request.args.get("limit", type=int), request.args.get("page_token")
+        )
         
         return jsonify({
             "code_id": code_id,
@@ -257,24 +358,21 @@ def update_code_naming_result():
         if not doc.exists:
             return jsonify({"error": "Code ID not found"}), 404
             
-        code_data = doc.to_dict()
-        naming_results = code_data.get("code_naming_convention_results", {})
+        AnalysisIssue.ensure_rows(db, code_id, "code_naming", doc.to_dict())
+        stored_issue = AnalysisIssue.find(db, code_id, "code_naming", data.get("issue_id"), element_name)
+        if stored_issue is None:
+            return jsonify({"error": "Code naming result not found"}), 404
         
         # Update the specific code naming issue
-        if "issues" in naming_results:
-            for i, issue in enumerate(naming_results["issues"]):
-                if issue["element_name"] == element_name:
-                    naming_results["issues"][i] = {
-                        "element_name": element_name,
-                        "element_type": element_type or issue.get("element_type", ""),
-                        "file_path": file_path or issue.get("file_path", ""),
-                        "line_number": line_number or issue.get("line_number", ""),
-                        "reason": reason or issue.get("reason", ""),
-                        "suggested_name": suggested_name or issue.get("suggested_name", "")
-                    }
-                    break
-        
-        doc_ref.update({"code_naming_convention_results": naming_results})
+        issue = stored_issue.to_dict()
+        AnalysisIssue.update_issue(db, code_id, "code_naming", stored_issue, {
+            "element_name": element_name,
+            "element_type": element_type or issue.get("element_type", ""),
+            "file_path": file_path or issue.get("file_path", ""),
+            "line_number": line_number or issue.get("line_number", ""),
+            "reason": reason or issue.get("reason", ""),
+            "suggested_name": suggested_name or issue.get("suggested_name", "")
+        })
         
         return jsonify({"message": "Code naming result updated successfully"}), 200
         
@@ -289,8 +387,9 @@ def delete_code_naming_result():
         
         code_id = data.get("code_id")
         element_name = data.get("element_name")
+        issue_id = data.get("issue_id")
         
-        if not code_id or not element_name:
+        if not code_id or not (element_name or issue_id):
             return jsonify({"error": "Missing required fields"}), 400
             
         doc_ref = db.collection("codes").document(code_id)
@@ -299,21 +398,11 @@ def delete_code_naming_result():
         if not doc.exists:
             return jsonify({"error": "Code ID not found"}), 404
             
-        code_data = doc.to_dict()
-        naming_results = code_data.get("code_naming_convention_results", {})
-        
-        # Remove the specific code naming issue
-        if "issues" in naming_results:
-            naming_results["issues"] = [
-                issue for issue in naming_results["issues"] 
-                if issue["element_name"] != element_name
-            ]
-            
-            # Update status if no more issues
-            if not naming_results["issues"]:
-                naming_results["status"] = "Yes"
-        
-        doc_ref.update({"code_naming_convention_results": naming_results})
+        # Remove the specific code naming issue; the status follows its issue count
+        AnalysisIssue.ensure_rows(db, code_id, "code_naming", doc.to_dict())
+        issue = AnalysisIssue.find(db, code_id, "code_naming", issue_id, element_name)
+        if issue is None or not AnalysisIssue.delete_issue(db, code_id, "code_naming", issue):
+            return jsonify({"error": "Code naming result not found"}), 404
         
         return jsonify({"message": "Code naming result deleted successfully"}), 200
         
@@ -323,7 +412,9 @@ def delete_code_naming_result():
 @check_naming_bp.route('/check-code-comments-accuracy', methods=['POST'])
 def checking_code_comments_accuracy():
     """
-    Check code comments accuracy for a repository and store results in the database
+    Check code comments accuracy for a repository and store results in the database.
+    Optional "force": true re-analyses every file; otherwise only files changed
+    since the stored results' commit are.
     """
     try:
         db = current_app.db
@@ -341,20 +432,24 @@ def checking_code_comments_accuracy():
         
         if not doc.exists:
             return jsonify({"error": "Code ID not found"}), 404
+        code_data = doc.to_dict()
+        tag_code_usage(db, code_id, code_data)
+        previous = AnalysisIssue.load_results(db, code_id, "comments_accuracy", code_data)
         
         # Get naming convention results
-        naming_results = check_code_comments_accuracy(repo_url)
+        naming_results, cache_info = run_comments_accuracy_check(repo_url, bool(data.get("force")), previous)
         
         # Check if there was an error with the API call
         if "error" in naming_results:
             return jsonify(naming_results), 500
         
         # Update the database with the results
-        Code.update_code_comments_accuracy(db, code_id, naming_results)
+        AnalysisIssue.save_results(db, code_id, {"comments_accuracy": naming_results}, {"comments_accuracy": previous})
         
         return jsonify({
             "message": "Code Comments Accuracy check completed successfully",
-            "results": naming_results
+            "results": naming_results,
+            "cache": cache_info
         }), 200
         
     except Exception as e:
@@ -363,7 +458,8 @@ def checking_code_comments_accuracy():
 @check_naming_bp.route('/code-comments-accuracy-results', methods=['GET'])
 def get_code_comments_accuracy_results():
     """
-    Get Comment Accuracy results for a specific code submission
+    Get Comment Accuracy results for a specific code submission,
+    paged with "limit" / "page_token" like the naming results.
     """
     code_id = request.args.get('code_id')
     
@@ -378,8 +474,10 @@ def get_code_comments_accuracy_results():
         if not doc.exists:
             return jsonify({"error": "Code ID not found"}), 404
         
-        code_data = doc.to_dict()
-        naming_results = code_data.get("code_comments_accuracy", {})
+        naming_results = AnalysisIssue.load_results(
+            db, code_id, "comments_accuracy", doc.to_dict(),
+            request.args.get("limit", type=int), request.args.get("page_token")
+        )
         
         return jsonify({
             "code_id": code_id,
@@ -412,25 +510,23 @@ def update_comments_accuracy_result():
         if not doc.exists:
             return jsonify({"error": "Code ID not found"}), 404
             
-        code_data = doc.to_dict()
-        comments_results = code_data.get("code_comments_accuracy", {})
+        AnalysisIssue.ensure_rows(db, code_id, "comments_accuracy", doc.to_dict())
+        stored_issue = AnalysisIssue.find(
+            db, code_id, "comments_accuracy", data.get("issue_id"), file_path, line_number
+        )
+        if stored_issue is None:
+            return jsonify({"error": "Comments accuracy result not found"}), 404
         
         # Update the specific comment accuracy issue
-        if "issues" in comments_results:
-            for i, issue_data in enumerate(comments_results["issues"]):
-                if (issue_data["file_path"] == file_path and 
-                    str(issue_data["line_number"]) == str(line_number)):
-                    comments_results["issues"][i] = {
-                        "file_path": file_path,
-                        "line_number": line_number,
-                        "comment_type": comment_type or issue_data.get("comment_type", ""),
-                        "actual_comment": actual_comment or issue_data.get("actual_comment", ""),
-                        "issue": issue or issue_data.get("issue", ""),
-                        "suggestion": suggestion or issue_data.get("suggestion", "")
-                    }
-                    break
-        
-        doc_ref.update({"code_comments_accuracy": comments_results})
+        issue_data = stored_issue.to_dict()
+        AnalysisIssue.update_issue(db, code_id, "comments_accuracy", stored_issue, {
+            "file_path": file_path,
+            "line_number": line_number,
+            "comment_type": comment_type or issue_data.get("comment_type", ""),
+            "actual_comment": actual_comment or issue_data.get("actual_comment", ""),
+            "issue": issue or issue_data.get("issue", ""),
+            "suggestion": suggestion or issue_data.get("suggestion", "")
+        })
         
         return jsonify({"message": "Comments accuracy result updated successfully"}), 200
         
@@ -456,24 +552,244 @@ def delete_comments_accuracy_result():
         if not doc.exists:
             return jsonify({"error": "Code ID not found"}), 404
             
-        code_data = doc.to_dict()
-        comments_results = code_data.get("code_comments_accuracy", {})
-        
-        # Remove the specific comment accuracy issue
-        if "issues" in comments_results:
-            comments_results["issues"] = [
-                issue for issue in comments_results["issues"] 
-                if not (issue["file_path"] == file_path and 
-                       str(issue["line_number"]) == str(line_number))
-            ]
-            
-            # Update status if no more issues
-            if not comments_results["issues"]:
-                comments_results["status"] = "Pass"
-        
-        doc_ref.update({"code_comments_accuracy": comments_results})
+        # Remove the specific comment accuracy issue; the status follows its issue count
+        AnalysisIssue.ensure_rows(db, code_id, "comments_accuracy", doc.to_dict())
+        issue = AnalysisIssue.find(db, code_id, "comments_accuracy", data.get("issue_id"), file_path, line_number)
+        if issue is None or not AnalysisIssue.delete_issue(db, code_id, "comments_accuracy", issue):
+            return jsonify({"error": "Comments accuracy result not found"}), 404
         
         return jsonify({"message": "Comments accuracy result deleted successfully"}), 200
         
     except Exception as e:
-        return jsonify({"error": str(e)}), 500  
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500  
+
+
+def run_code_metrics(repo_url, force=False):
+    """ Local complexity, size and duplication metrics of the head commit. Returns (results, cache_info). """
+    owner, repo = parse_repo_url(repo_url)
+    return cached_analysis(
+        repo_url, "code_metrics", analyzer_version(code_metrics),
+        lambda sha: compute_code_metrics(get_snapshot(owner, repo, sha)), force
+    )
+
+
+@check_naming_bp.route('/check-code-metrics', methods=['POST'])
+def checking_code_metrics():
+    """
+    Compute cyclomatic complexity, nesting depth, function / file length,
+    comment density and duplicated blocks for a repository and store them
+    on the codes document. Optional "force": true recomputes this commit.
+    """
+    try:
+        db = current_app.db
+        data = request.get_json()
+
+        code_id = data.get("code_id")
+        repo_url = data.get("repo_url")
+
+        if not code_id or not repo_url:
+            return jsonify({"error": "Missing required fields: code_id or repo_url"}), 400
+
+        doc_ref = db.collection("codes").document(code_id)
+        if not doc_ref.get().exists:
+            return jsonify({"error": "Code ID not found"}), 404
+
+        metrics, cache_info = run_code_metrics(repo_url, bool(data.get("force")))
+        Code.update_code_metrics(db, code_id, metrics)
+
+        return jsonify({
+            "message": "Code metrics computed successfully",
+            "results": metrics,
+            "cache": cache_info
+        }), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@check_naming_bp.route('/code-metrics-results', methods=['GET'])
+def get_code_metrics_results():
+    """ Get stored code metrics for a specific code submission """
+    code_id = request.args.get('code_id')
+
+    if not code_id:
+        return jsonify({"error": "Missing required parameter: code_id"}), 400
+
+    try:
+        db = current_app.db
+        doc = db.collection("codes").document(code_id).get()
+
+        if not doc.exists:
+            return jsonify({"error": "Code ID not found"}), 404
+
+        return jsonify({
+            "code_id": code_id,
+            "code_metrics": doc.to_dict().get("code_metrics", {})
+        }), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@check_naming_bp.route('/analysis-cache-stats', methods=['GET'])
+def get_analysis_cache_stats():
+    """ Hit / miss counters of the analysis result cache for this worker """
+    return jsonify(analysis_cache_stats()), 200
+
+
+# name -> (field on the codes document, runner(repo_url, engine, force, previous))
+# Analyses with issues are named as in AnalysisIssue.ANALYSES.
+ANALYZERS = {
+    "file_naming": (
+        "file_naming_convention_results",
+        lambda repo_url, engine, force, previous: run_file_naming_check(repo_url, engine, force),
+    ),
+    "code_naming": (
+        "code_naming_convention_results",
+        lambda repo_url, engine, force, previous: run_code_naming_check(repo_url, engine, force, previous),
+    ),
+    "comments_accuracy": (
+        "code_comments_accuracy",
+        lambda repo_url, engine, force, previous: run_comments_accuracy_check(repo_url, force, previous),
+    ),
+    "code_metrics": (
+        "code_metrics",
+        lambda repo_url, engine, force, previous: run_code_metrics(repo_url, force),
+    ),
+}
+
+
+def iter_analyses(repo_url, names, stored, engine=None, force=False):
+    """
+    Run the named analyzers concurrently and yield (name, results, run_info)
+    as each one finishes. stored maps each name to its previous results.
+    The head commit and its snapshot are fetched once up front, so every
+    analyzer reads the same local copy.
+    """
+    try:
+        owner, repo = parse_repo_url(repo_url)
+        get_snapshot(owner, repo, resolve_head_sha(owner, repo))
+    except Exception as e:
+        print(f"No shared snapshot for {repo_url}, analyzers fetch on their own: {e}")
+
+    def run(name):
+        _, runner = ANALYZERS[name]
+        try:
+            return runner(repo_url, engine, force, stored.get(name))
+        except Exception as e:
+            return {"error": str(e)}, None
+
+    run = bind_usage_context(run)
+    with ThreadPoolExecutor(max_workers=len(names), thread_name_prefix="analyze-all") as executor:
+        futures = {executor.submit(run, name): name for name in names}
+        for future in as_completed(futures):
+            results, run_info = future.result()
+            yield futures[future], results, run_info
+
+
+@check_naming_bp.route('/analyze-all', methods=['POST'])
+def analyze_all():
+    """
+    Run file naming, code naming, comments accuracy and code metrics
+    concurrently and store every successful result (issue rows, then the
+    codes document).
+    Body: "code_id", optional "repo_url" (defaults to the submission's),
+    "analyses" (subset of ANALYZERS), "engine" and "force".
+    With "stream": true the response is NDJSON: a "start" line, one "result"
+    line per analyzer as soon as it finishes, then a "done" line once saved.
+    """
+    try:
+        db = current_app.db
+        data = request.get_json()
+
+        code_id = data.get("code_id")
+        if not code_id:
+            return jsonify({"error": "Missing required field: code_id"}), 400
+
+        doc = db.collection("codes").document(code_id).get()
+        if not doc.exists:
+            return jsonify({"error": "Code ID not found"}), 404
+
+        code_data = doc.to_dict()
+        tag_code_usage(db, code_id, code_data)
+        repo_url = data.get("repo_url") or code_data.get("github_url")
+        if not repo_url:
+            return jsonify({"error": "Missing required field: repo_url"}), 400
+
+        names = data.get("analyses") or list(ANALYZERS)
+        unknown = [name for name in names if name not in ANALYZERS]
+        if unknown:
+            return jsonify({"error": f"Unknown analyses: {', '.join(unknown)}"}), 400
+
+        stored = {
+            name: AnalysisIssue.load_results(db, code_id, name, code_data)
+            for name in names if name in AnalysisIssue.ANALYSES
+        }
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    engine = data.get("engine")
+    force = bool(data.get("force"))
+
+    def events():
+        yield {"event": "start", "code_id": code_id, "analyses": names}
+        updates = {}
+        for name, results, run_info in iter_analyses(repo_url, names, stored, engine, force):
+            if "error" not in results:
+                updates[name] = results
+            yield {"event": "result", "analysis": name, "results": results, "cache": run_info}
+        try:
+            issue_updates = {name: results for name, results in updates.items() if name in AnalysisIssue.ANALYSES}
+            # Metrics have no issue rows, but share the codes document update.
+            fields = {"code_metrics": updates["code_metrics"]} if "code_metrics" in updates else {}
+            if issue_updates or fields:
+                AnalysisIssue.save_results(db, code_id, issue_updates, stored, fields)
+            yield {"event": "done", "saved": sorted(ANALYZERS[name][0] for name in updates)}
+        except Exception as e:
+            yield {"event": "done", "saved": [], "error": str(e)}
+
+    if data.get("stream"):
+        # The request context stays open while streaming, so LLM calls keep their route and ids.
+        return Response(
+            stream_with_context(json.dumps(event) + "\n" for event in events()), mimetype="application/x-ndjson"
+        )
+
+    results = {}
+    cache = {}
+    done = {}
+    for event in events():
+        if event["event"] == "result":
+            results[event["analysis"]] = event["results"]
+            cache[event["analysis"]] = event["cache"]
+        elif event["event"] == "done":
+            done = event
+    if done.get("error"):
+        return jsonify({"error": done["error"], "results": results}), 500
+    return jsonify({
+        "message": "Repository analysis completed",
+        "results": results,
+        "cache": cache,
+        "saved": done.get("saved", [])
+    }), 200
+
+
+@check_naming_bp.route('/llm-stats', methods=['GET'])
+def get_llm_stats():
+    """ Gemini gateway limits, circuit state and per-caller counters for this worker """
+    return jsonify(gateway_metrics()), 200
+
+
+@check_naming_bp.route('/llm-usage', methods=['GET'])
+def get_llm_usage():
+    """
+    Gemini calls recorded on this host over the last "hours" (default 24):
+    calls, cache hits, errors, tokens, estimated cost and p50 / p95 latency,
+    overall and per route, assignment and caller.
+    """
+    try:
+        hours = float(request.args.get("hours", 24))
+        return jsonify(usage_summary(hours)), 200
+    except ValueError:
+        return jsonify({"error": "hours must be a number"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
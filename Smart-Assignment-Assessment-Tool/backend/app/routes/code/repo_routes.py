@@ -1,18 +1,33 @@
-from flask import Blueprint, request, jsonify, current_app
-import requests
-import os
-from dotenv import load_dotenv
+from flask import Blueprint, Response, request, jsonify, current_app, send_file
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime
+from urllib.parse import urlencode
+import base64
+import json
+import mimetypes
+import os
 import uuid
 from app.models.code_model import Code
-
-load_dotenv()  # Load environment variables from .env
+from app.utils.github_client import github_get, parse_repo_url, cache_stats, scheduler
+from app.utils.blob_store import get_blob_store
+from app.utils.repo_snapshot import REPO_SNAPSHOTS_ENABLED, SnapshotError, get_snapshot, resolve_head_sha
+from app.utils.github_api import GitHubAPIError, fetch_repo_tree, filter_tree, iter_commit_pages
+from app.utils.github_graphql import GraphQLError, batch_sizer, fetch_repo_graphql, graphql_enabled
+from app.utils.cohort import iter_cohort, load_cohort_codes
+from app.utils.commit_index import CommitIndex, CommitIndexError
+from app.utils.github_scheduler import INTERACTIVE
+from app.utils.prewarm import enqueue_prewarm
+from app.utils.git_mirror import GIT_MIRRORS_ENABLED, mirror_stats
+from app.utils.stats_warmer import (
+    StatsUnavailableError, contributor_activity, contributors_from_stats, get_cached_stats,
+    warm_contributor_stats
+)
 
 # Define Routes
 repo_bp = Blueprint('repo_routes', __name__)
 
-GITHUB_API_BASE = "https://api.github.com"
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+# How long /contributor-activity waits for a warm-up that is still running.
+STATS_REQUEST_WAIT_SECONDS = float(os.getenv("STATS_REQUEST_WAIT_SECONDS", "25"))
 
 # Create code submission
 @repo_bp.route("/add-repo-submission", methods=["POST"])
@@ -35,12 +50,44 @@ def add_repo_submission():
         new_code_submission = Code(code_id, submission_id, github_url, comments, final_feedback)
         new_code_submission.save(db)
 
+        # Snapshot the repository and fill the caches before a teacher opens it.
+        try:
+            enqueue_prewarm(db, code_id, github_url)
+        except Exception as e:
+            print(f"Pre-warm not started for {github_url}: {e}")
+
         return jsonify({"message": "Code Submission created successfully!", "code_id": code_id}), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
 
+@repo_bp.route('/prewarm/<code_id>', methods=['GET', 'POST'])
+def prewarm_status(code_id):
+    """
+    GET: pre-warm job status of a code submission.
+    POST: queue the pre-warm job again (e.g. after the student pushed more commits).
+    """
+    try:
+        db = current_app.db
+        doc = db.collection("codes").document(code_id).get()
+
+        if not doc.exists:
+            return jsonify({"error": "Code ID not found"}), 404
+
+        code_data = doc.to_dict()
+        if request.method == 'POST':
+            if not code_data.get("github_url"):
+                return jsonify({"error": "GitHub URL not found for this code ID"}), 404
+            enqueue_prewarm(db, code_id, code_data["github_url"])
+            return jsonify({"message": "Pre-warm queued", "code_id": code_id}), 202
+
+        return jsonify({"code_id": code_id, "prewarm": code_data.get("prewarm")}), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @repo_bp.route('/get-repo/<code_id>', methods=['GET'])
 def get_repo_by_code_id(code_id):
     """
@@ -67,6 +114,24 @@ def get_repo_by_code_id(code_id):
 
     
 
+def _graphql_summary(owner, repo):
+    """
+    Repository summary from the GraphQL backend when it is selected
+    (backend=graphql or GITHUB_BACKEND), or None to use REST.
+    Returns (summary, error_response).
+    """
+    if not graphql_enabled(request.args.get('backend')):
+        return None, None
+    try:
+        summary = fetch_repo_graphql(owner, repo)
+    except GraphQLError as e:
+        print(f"GraphQL backend unavailable, using REST: {e}")
+        return None, None
+    if summary is None:
+        return None, (jsonify({"message": "Not Found"}), 400)
+    return summary, None
+
+
 @repo_bp.route('/repo-details', methods=['GET'])
 def get_repo_details():
     """ Fetch GitHub repository details """
@@ -75,21 +140,28 @@ def get_repo_details():
         return jsonify({"error": "Missing required parameter: repo_url"}), 400
 
     try:
-        parts = repo_url.rstrip('/').split('/')
-        owner, repo = parts[-2], parts[-1].replace('.git', '')
-    except IndexError:
+        owner, repo = parse_repo_url(repo_url)
+    except ValueError:
         return jsonify({"error": "Invalid GitHub repository URL"}), 400
 
-    url = f"{GITHUB_API_BASE}/repos/{owner}/{repo}"
-    headers = {"Authorization": f"Bearer {GITHUB_TOKEN}"}
-    response = requests.get(url, headers=headers)
+    summary, error = _graphql_summary(owner, repo)
+    if error:
+        return error
+    if summary:
+        return jsonify(summary["details"]), 200
+
+    response = github_get(f"/repos/{owner}/{repo}")
 
     return jsonify(response.json()), response.status_code if response.ok else 400
 
 
 @repo_bp.route('/repo-contents', methods=['GET'])
 def get_repo_contents():
-    """ Fetch repository file structure from GitHub """
+    """
+    Fetch repository file structure.
+    Served from the local snapshot of the requested commit (HEAD by default)
+    when available, otherwise from the GitHub contents API.
+    """
     repo_url = request.args.get('repo_url')
     path = request.args.get('path', '')
 
@@ -97,38 +169,221 @@ def get_repo_contents():
         return jsonify({"error": "Missing required parameter: repo_url"}), 400
 
     try:
-        parts = repo_url.rstrip('/').split('/')
-        owner, repo = parts[-2], parts[-1].replace('.git', '')
-    except IndexError:
+        owner, repo = parse_repo_url(repo_url)
+    except ValueError:
         return jsonify({"error": "Invalid GitHub repository URL"}), 400
 
-    url = f"{GITHUB_API_BASE}/repos/{owner}/{repo}/contents/{path}"
-    headers = {"Authorization": f"Bearer {GITHUB_TOKEN}"}
-    response = requests.get(url, headers=headers)
+    snapshot = _local_snapshot(owner, repo, request.args.get('ref'))
+    if snapshot is not None:
+        return _serve_from_snapshot(snapshot, path)
+
+    response = github_get(f"/repos/{owner}/{repo}/contents/{path}")
 
     return jsonify(response.json()), response.status_code if response.ok else 400
 
 
+@repo_bp.route('/tree', methods=['GET'])
+def get_repo_tree():
+    """
+    Fetch the whole repository tree (paths, types, sizes and blob SHAs) in one call.
+    Optional filters: ext=py,js  glob=src/*.java  type=blob|tree
+    """
+    repo_url = request.args.get('repo_url')
+    if not repo_url:
+        return jsonify({"error": "Missing required parameter: repo_url"}), 400
+
+    try:
+        owner, repo = parse_repo_url(repo_url)
+    except ValueError:
+        return jsonify({"error": "Invalid GitHub repository URL"}), 400
+
+    extensions = [ext for ext in request.args.get('ext', '').split(',') if ext]
+    patterns = [pattern for pattern in request.args.get('glob', '').split(',') if pattern]
+
+    try:
+        commit_sha, tree_sha, entries = fetch_repo_tree(owner, repo, request.args.get('ref'))
+    except GitHubAPIError as e:
+        return jsonify({"error": str(e)}), e.status_code
+    except SnapshotError as e:
+        return jsonify({"error": str(e)}), 400
+
+    entries = filter_tree(entries, extensions, patterns, request.args.get('type'))
+    return jsonify({
+        "commit_sha": commit_sha,
+        "tree_sha": tree_sha,
+        "count": len(entries),
+        "tree": entries
+    }), 200
+
+
 @repo_bp.route('/file-content', methods=['GET'])
 def get_file_content():
-    """ Fetch file content from GitHub """
+    """
+    Fetch file content (or a directory listing).
+    When the caller passes the blob `sha` from the tree listing, the file is
+    served from the local blob store; otherwise from the repository snapshot,
+    falling back to the GitHub contents API (and the blobs API above 1 MB).
+    With raw=1 the bytes themselves are streamed, with HTTP Range support.
+    """
     repo_url = request.args.get('repo_url')
     path = request.args.get('path')
+    sha = request.args.get('sha')
 
     if not repo_url or not path:
         return jsonify({"error": "Missing required parameters: repo_url or path"}), 400
 
     try:
-        parts = repo_url.rstrip('/').split('/')
-        owner, repo = parts[-2], parts[-1].replace('.git', '')
-    except IndexError:
+        owner, repo = parse_repo_url(repo_url)
+    except ValueError:
         return jsonify({"error": "Invalid GitHub repository URL"}), 400
 
-    url = f"{GITHUB_API_BASE}/repos/{owner}/{repo}/contents/{path}"
-    headers = {"Authorization": f"Bearer {GITHUB_TOKEN}"}
-    response = requests.get(url, headers=headers)
+    if request.args.get('raw') == '1':
+        return _raw_file(owner, repo, path, sha)
 
-    return jsonify(response.json()), response.status_code if response.ok else 400
+    blob_store = get_blob_store()
+    if sha:
+        data = blob_store.get(sha)
+        if data is not None:
+            return jsonify(_file_envelope(path, sha, data)), 200
+
+    snapshot = _local_snapshot(owner, repo, request.args.get('ref'))
+    if snapshot is not None:
+        return _serve_from_snapshot(snapshot, path)
+
+    response = github_get(f"/repos/{owner}/{repo}/contents/{path}")
+    content = response.json()
+
+    # Files between 1 MB and 100 MB come back without content; the blobs API has it.
+    if response.ok and isinstance(content, dict) and content.get("encoding") == "none":
+        blob = github_get(f"/repos/{owner}/{repo}/git/blobs/{content.get('sha')}", use_cache=False)
+        if blob.ok:
+            content["encoding"] = "base64"
+            content["content"] = blob.json().get("content", "")
+
+    # Directory listings come back as lists; only files are content-addressed.
+    if response.ok and isinstance(content, dict) and content.get("encoding") == "base64":
+        try:
+            blob_store.put(base64.b64decode(content.get("content", "")), content.get("sha"))
+        except (ValueError, OSError) as e:
+            print(f"Blob store write skipped for {owner}/{repo}/{path}: {e}")
+
+    return jsonify(content), response.status_code if response.ok else 400
+
+
+RAW_CHUNK_SIZE = 256 * 1024
+# Passed through from GitHub when streaming a raw file.
+_RAW_HEADERS = ("Content-Length", "Content-Range", "Accept-Ranges", "ETag", "Last-Modified")
+
+
+def _send_local_file(file_path, path, sha):
+    """ Stream a local file; send_file answers Range and If-None-Match itself """
+    return send_file(
+        file_path,
+        mimetype=mimetypes.guess_type(path)[0] or "application/octet-stream",
+        conditional=True,
+        etag=sha or True,
+        download_name=path.rsplit('/', 1)[-1],
+        as_attachment=False,
+    )
+
+
+def _raw_file(owner, repo, path, sha):
+    """
+    Serve a file's bytes in chunks: from the blob store or the snapshot when
+    possible, otherwise proxied from GitHub (blobs API when the blob SHA is
+    known, else the contents API) with the vnd.github.raw media type.
+    """
+    path = path.strip('/')
+    if sha:
+        blob_path = get_blob_store().path_for(sha)
+        if blob_path:
+            return _send_local_file(blob_path, path, sha)
+
+    snapshot = _local_snapshot(owner, repo, request.args.get('ref'))
+    if snapshot is not None:
+        file_path = snapshot.file_path(path)
+        if file_path is None:
+            return jsonify({"message": "Not Found"}), 404
+        return _send_local_file(file_path, path, snapshot.entries[path].get("sha"))
+
+    headers = {"Accept": "application/vnd.github.raw"}
+    if request.headers.get('Range'):
+        # Byte ranges only line up with the file when GitHub does not compress.
+        headers["Range"] = request.headers['Range']
+        headers["Accept-Encoding"] = "identity"
+    # The blobs API has no 1 MB limit and its URL never changes for a given SHA.
+    endpoint = f"/repos/{owner}/{repo}/git/blobs/{sha}" if sha else f"/repos/{owner}/{repo}/contents/{path}"
+    response = github_get(endpoint, headers=headers, stream=True)
+    if not response.ok:
+        response.close()
+        return jsonify({"error": f"GitHub API error: {response.status_code}"}), response.status_code
+
+    def generate():
+        try:
+            for chunk in response.iter_content(RAW_CHUNK_SIZE):
+                yield chunk
+        finally:
+            response.close()
+
+    proxied = Response(
+        generate(),
+        status=response.status_code,
+        mimetype=mimetypes.guess_type(path)[0] or "application/octet-stream",
+    )
+    for name in _RAW_HEADERS:
+        if name == "Content-Length" and response.headers.get("Content-Encoding"):
+            continue  # iter_content decompresses, so the wire length does not apply
+        if response.headers.get(name):
+            proxied.headers[name] = response.headers[name]
+    return proxied
+
+
+def _local_snapshot(owner, repo, ref=None):
+    """ Local snapshot of the repository, or None to fall back to the GitHub API """
+    if not REPO_SNAPSHOTS_ENABLED:
+        return None
+    try:
+        return get_snapshot(owner, repo, ref)
+    except Exception as e:
+        print(f"Snapshot unavailable for {owner}/{repo}: {e}")
+        return None
+
+
+def _serve_from_snapshot(snapshot, path):
+    """ Answer a contents-API style request (directory or file) from a snapshot """
+    path = path.strip('/')
+    listing = snapshot.list_directory(path)
+    if listing is not None:
+        return jsonify(listing), 200
+
+    data = snapshot.read_file(path)
+    if data is None:
+        return jsonify({"message": "Not Found"}), 404
+    return jsonify(_file_envelope(path, snapshot.entries[path]["sha"], data)), 200
+
+
+def _file_envelope(path, sha, data):
+    """ Rebuild the contents-API shape the frontend decodes from a stored blob """
+    return {
+        "type": "file",
+        "encoding": "base64",
+        "name": path.rsplit('/', 1)[-1],
+        "path": path,
+        "sha": sha,
+        "size": len(data),
+        "content": base64.b64encode(data).decode("ascii"),
+    }
+
+@repo_bp.route('/github-stats', methods=['GET'])
+def get_github_stats():
+    """ GitHub quota, request queues, response cache and blob store counters for this worker """
+    return jsonify({
+        "scheduler": scheduler.metrics(),
+        "cache": cache_stats(),
+        "blob_store": get_blob_store().stats(),
+        "graphql": batch_sizer.metrics(),
+        "mirrors": mirror_stats()
+    }), 200
 
 @repo_bp.route('/save-line-comment', methods=['POST'])
 def save_line_comment():
@@ -252,96 +507,132 @@ def get_repo_contributors():
         return jsonify({"error": "Missing required parameter: repo_url"}), 400
 
     try:
-        parts = repo_url.rstrip('/').split('/')
-        owner, repo = parts[-2], parts[-1].replace('.git', '')
-    except IndexError:
+        owner, repo = parse_repo_url(repo_url)
+    except ValueError:
         return jsonify({"error": "Invalid GitHub repository URL"}), 400
 
-    url = f"{GITHUB_API_BASE}/repos/{owner}/{repo}/contributors"
-    headers = {"Authorization": f"Bearer {GITHUB_TOKEN}"}
-    response = requests.get(url, headers=headers)
+    summary, error = _graphql_summary(owner, repo)
+    if error:
+        return error
+    # Contributors from GraphQL only cover short histories; longer ones use the totals below.
+    if summary and summary["contributors"] is not None:
+        return jsonify(summary["contributors"]), 200
+
+    if GIT_MIRRORS_ENABLED:
+        # Same statistics /contributor-activity uses, computed from the local mirror.
+        try:
+            stats = _contributor_stats(owner, repo)
+        except (SnapshotError, StatsUnavailableError, FutureTimeoutError) as e:
+            print(f"Local contributor statistics unavailable for {owner}/{repo}: {e}")
+        else:
+            return jsonify(contributors_from_stats(stats)), 200
+
+    response = github_get(f"/repos/{owner}/{repo}/contributors")
 
     return jsonify(response.json()), response.status_code if response.ok else 400
 
 
 @repo_bp.route('/commits', methods=['GET'])
 def get_contributor_commits():
-    """ Fetch contributor commits from GitHub """
+    """
+    Fetch a page of a contributor's commits.
+    Pages and exact totals come from the local commit index, which is topped
+    up incrementally from GitHub when the default branch has moved.
+    Optional: since / until (ISO 8601) and with_stats=1 for additions / deletions.
+    """
     repo_url = request.args.get('repo_url')
     contributor_login = request.args.get('contributor_login')
-    page = request.args.get('page', 1, type=int)
+    page = max(request.args.get('page', 1, type=int), 1)
+    since = request.args.get('since')
+    until = request.args.get('until')
+    per_page = 10
 
     if not repo_url or not contributor_login:
         return jsonify({"error": "Missing required parameters"}), 400
 
     try:
-        parts = repo_url.rstrip('/').split('/')
-        owner, repo = parts[-2], parts[-1].replace('.git', '')
-    except IndexError:
+        owner, repo = parse_repo_url(repo_url)
+    except ValueError:
         return jsonify({"error": "Invalid GitHub repository URL"}), 400
 
-    url = f"{GITHUB_API_BASE}/repos/{owner}/{repo}/commits"
-    headers = {"Authorization": f"Bearer {GITHUB_TOKEN}"}
-    params = {"author": contributor_login, "page": page, "per_page": 10}
-    response = requests.get(url, headers=headers, params=params)
-
-    if not response.ok:
-        return jsonify({"error": f"GitHub API error: {response.status_code}"}), response.status_code
-        
-    # Get Link header for pagination information
-    link_header = response.headers.get('Link', '')
+    index = CommitIndex(owner, repo)
+    try:
+        index.refresh()
+    except CommitIndexError as e:
+        return jsonify({"error": str(e)}), e.status_code
+    except SnapshotError as e:
+        return jsonify({"error": str(e)}), 400
+
+    total_commits = index.count(contributor_login, since, until)
+    commits_data = index.page(contributor_login, page, per_page, since, until)
+    if request.args.get('with_stats') == '1':
+        index.fill_stats(commits_data)
+
+    # Same shape as GitHub's Link header: the frontend reads the page number.
     pagination = {}
-    
-    # Parse Link header to extract prev and next URLs
-    if link_header:
-        links = {}
-        for link in link_header.split(','):
-            part = link.split(';')
-            url = part[0].strip()[1:-1]  # Remove < and >
-            rel = part[1].split('=')[1].strip('"')  # Extract rel value
-            links[rel] = url
-            
-        if 'next' in links:
-            pagination['next'] = links['next']
-        if 'prev' in links:
-            pagination['prev'] = links['prev']
-            
-    # Format the response to match what the frontend expects
-    commits_data = response.json()
-    
-    # If we got an error message instead of an array
-    if not isinstance(commits_data, list):
-        return jsonify({"error": "Invalid response from GitHub API"}), 400
-    
-    # Count total commits for this contributor
-    # Note: This is approximate - GitHub API doesn't provide the total count directly
-    total_commits = len(commits_data)
-    if page == 1 and not pagination.get('next'):
-        # If there's only one page, this is the total
-        pass
-    else:
-        # Otherwise, we need to make another API call to count all commits
-        total_url = f"{GITHUB_API_BASE}/repos/{owner}/{repo}/commits"
-        total_params = {"author": contributor_login, "per_page": 1}  # Just to get the count
-        total_response = requests.get(total_url, headers=headers, params=total_params)
-        
-        if total_response.ok and 'link' in total_response.headers:
-            link = total_response.headers['link']
-            if 'rel="last"' in link:
-                # Extract page number from last link
-                last_link = [l.split(';')[0] for l in link.split(',') if 'rel="last"' in l][0]
-                last_page = int(last_link.split('page=')[1].split('&')[0])
-                total_commits = (last_page - 1) * 10 + len(total_response.json())
-    
+    base_params = {"repo_url": repo_url, "contributor_login": contributor_login}
+    # Keep the filters, so following a link doesn't widen the listing
+    for name in ('since', 'until', 'with_stats'):
+        if request.args.get(name) is not None:
+            base_params[name] = request.args.get(name)
+    if page > 1:
+        pagination['prev'] = f"{request.base_url}?{urlencode({**base_params, 'page': page - 1})}"
+    if page * per_page < total_commits:
+        pagination['next'] = f"{request.base_url}?{urlencode({**base_params, 'page': page + 1})}"
+
     # Return the data in a structured format as expected by frontend
     result = {
         "commits": commits_data,
         "total_commits": total_commits,
         "pagination": pagination
     }
-    
+
     return jsonify(result), 200
 
+@repo_bp.route('/commits/export', methods=['GET'])
+def export_commits():
+    """
+    Stream a repository's whole commit history as NDJSON, one GitHub commit
+    object per line, written out as each page of 100 arrives.
+    Optional: contributor_login, since / until (ISO 8601) and ref (branch or SHA).
+    """
+    repo_url = request.args.get('repo_url')
+    if not repo_url:
+        return jsonify({"error": "Missing required parameter: repo_url"}), 400
+
+    try:
+        owner, repo = parse_repo_url(repo_url)
+    except ValueError:
+        return jsonify({"error": "Invalid GitHub repository URL"}), 400
+
+    pages = iter_commit_pages(
+        owner, repo,
+        author=request.args.get('contributor_login'),
+        since=request.args.get('since'),
+        until=request.args.get('until'),
+        sha=request.args.get('ref'),
+    )
+
+    # Fetch the first page up front so a bad repository still gets a proper status.
+    try:
+        first_page = next(pages, [])
+    except GitHubAPIError as e:
+        return jsonify({"error": str(e)}), e.status_code
+
+    def generate():
+        for commit in first_page:
+            yield json.dumps(commit) + "\n"
+        try:
+            for page in pages:
+                for commit in page:
+                    yield json.dumps(commit) + "\n"
+        except GitHubAPIError as e:
+            # Headers are already sent; report the failure in-band.
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+
 @repo_bp.route('/get-github-url', methods=['GET'])
 def get_github_url():
     """ Fetch GitHub URL by code_id """
@@ -363,9 +654,26 @@ def get_github_url():
         return jsonify({"error": str(e)}), 500
 
 
+def _contributor_stats(owner, repo):
+    """
+    Contributor statistics for the repository's HEAD, waiting up to
+    STATS_REQUEST_WAIT_SECONDS for a warm-up that is still running.
+    """
+    head_sha = resolve_head_sha(owner, repo)
+    stats = get_cached_stats(owner, repo, head_sha)
+    if stats is None:
+        future = warm_contributor_stats(owner, repo, head_sha, priority=INTERACTIVE)
+        stats = future.result(timeout=STATS_REQUEST_WAIT_SECONDS)
+    return stats
+
+
 @repo_bp.route('/contributor-activity', methods=['GET'])
 def get_contributor_activity():
-    """Fetch all contributor activity data from GitHub"""
+    """
+    Fetch a contributor's weekly activity.
+    Statistics are warmed in the background (on submission, or on the first
+    request) and cached per HEAD commit, so this is a dictionary lookup.
+    """
     repo_url = request.args.get('repo_url')
     contributor_login = request.args.get('contributor_login')
 
@@ -373,57 +681,61 @@ def get_contributor_activity():
         return jsonify({"error": "Missing required parameters"}), 400
 
     try:
-        parts = repo_url.rstrip('/').split('/')
-        owner, repo = parts[-2], parts[-1].replace('.git', '')
-    except IndexError:
+        owner, repo = parse_repo_url(repo_url)
+    except ValueError:
         return jsonify({"error": "Invalid GitHub repository URL"}), 400
 
-    url = f"{GITHUB_API_BASE}/repos/{owner}/{repo}/stats/contributors"
-    headers = {"Authorization": f"Bearer {GITHUB_TOKEN}"}
-
-    response = requests.get(url, headers=headers)
-
-    if response.status_code == 202:
+    try:
+        stats = _contributor_stats(owner, repo)
+    except SnapshotError as e:
+        return jsonify({"error": str(e)}), 400
+    except FutureTimeoutError:
+        # Only when the statistics take longer than the request may wait; the
+        # warm-up carries on and the next request is served from cache.
         return jsonify({"message": "GitHub is calculating statistics. Please try again later."}), 202
+    except StatsUnavailableError as e:
+        return jsonify({"error": str(e)}), 502
 
-    if not response.ok:
-        return jsonify({"error": f"GitHub API error: {response.status_code}"}), response.status_code
-
-    contributors_data = response.json()
-
-    contributor_data = None
-    for contrib in contributors_data:
-        if contrib.get('author', {}).get('login') == contributor_login:
-            contributor_data = contrib
-            break
-
+    contributor_data = stats.get(contributor_login.lower())
     if not contributor_data:
         return jsonify({"error": f"No activity data found for {contributor_login}"}), 404
 
-    weeks_data = contributor_data.get('weeks', [])
-    weeks_data.sort(key=lambda x: x.get('w', 0))
-
-    activity_data = []
-    for i, week in enumerate(weeks_data):
-        week_timestamp = week.get('w', 0)
-        week_date = datetime.fromtimestamp(week_timestamp).strftime('%Y-%m-%d')
-        activity_data.append({
-            'week': f"Week {i+1}",
-            'commits': week.get('c', 0),
-            'additions': week.get('a', 0),
-            'deletions': week.get('d', 0),
-            'date': week_date
-        })
+    return jsonify(contributor_activity(contributor_data)), 200
 
-    print(f"activity_data: {activity_data}")
+@repo_bp.route('/cohort/<assignment_id>', methods=['GET'])
+def get_cohort(assignment_id):
+    """
+    Repository details, contributors and contributor activity for every code
+    submission of an assignment, loaded concurrently.
+    With stream=1 the response is NDJSON: a "start" line, one "repo" line per
+    repository as soon as it is ready, then a "done" line.
+    """
+    try:
+        cohort = load_cohort_codes(current_app.db, assignment_id)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
+    # Read before streaming: the generator runs after the request context is gone.
+    backend = request.args.get('backend')
+    if request.args.get('stream') == '1':
+        def generate():
+            yield json.dumps({"event": "start", "assignment_id": assignment_id, "total": len(cohort)}) + "\n"
+            for summary in iter_cohort(cohort, backend=backend):
+                yield json.dumps({"event": "repo", **summary}) + "\n"
+            yield json.dumps({"event": "done"}) + "\n"
+
+        return Response(generate(), mimetype="application/x-ndjson")
+
+    summaries = {summary["code_id"]: summary for summary in iter_cohort(cohort, backend=backend)}
+    repos = [summaries[entry["code_id"]] for entry in cohort]
     return jsonify({
-        "activity_data": activity_data,
-        "total_commits": contributor_data.get('total', 0),
-        "total_additions": sum(week.get('a', 0) for week in weeks_data),
-        "total_deletions": sum(week.get('d', 0) for week in weeks_data)
+        "assignment_id": assignment_id,
+        "total": len(repos),
+        "failed": sum(1 for summary in repos if summary.get("error")),
+        "repos": repos
     }), 200
 
+
 @repo_bp.route('/save-final-feedback', methods=['POST'])
 def save_final_feedback():
     """
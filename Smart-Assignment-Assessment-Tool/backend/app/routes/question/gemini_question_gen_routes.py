@@ -4,6 +4,7 @@ from app.utils.generate_questions import generate_questions_gemini
 from app.utils.generate_questions import generate_questions_from_github_url
 from app.utils.generate_questions import generate_questions_from_video
 from app.utils.generate_questions import generate_answer 
+from app.utils.llm_usage import tag_llm_usage
 
 qgenerate_bp = Blueprint("qgenerate", __name__)
 
@@ -24,6 +25,7 @@ def generate_general_questions():
             return jsonify({"error": "Submission not found"}), 404
         
         submission_data = submission_doc.to_dict()
+        tag_llm_usage(submission_id=submission_id, assignment_id=submission_data.get("assignment_id"))
         assignment_id = submission_data.get("assignment_id")
         
         if not assignment_id:
@@ -99,6 +101,7 @@ def generate_code_questions():
             return jsonify({"error": "Submission not found"}), 404
         
         submission_data = submission_doc.to_dict()
+        tag_llm_usage(submission_id=submission_id, assignment_id=submission_data.get("assignment_id"))
         code_id = submission_data.get("code_id")
         
         if not code_id:
@@ -175,6 +178,7 @@ def generate_report_questions():
             return jsonify({"error": "Submission not found"}), 404
         
         submission_data = submission_doc.to_dict()
+        tag_llm_usage(submission_id=submission_id, assignment_id=submission_data.get("assignment_id"))
         report_id = submission_data.get("report_id")
         
         if not report_id:
@@ -248,6 +252,7 @@ def generate_video_questions():
             return jsonify({"error": "Submission not found"}), 404
         
         submission_data = submission_doc.to_dict()
+        tag_llm_usage(submission_id=submission_id, assignment_id=submission_data.get("assignment_id"))
         video_id = submission_data.get("video_id")
         
         if not video_id:
@@ -327,6 +332,7 @@ def generate_answer_for_custom_questions():
             return jsonify({"error": "Submission not found"}), 404
 
         submission = doc.to_dict()
+        tag_llm_usage(submission_id=submission_id, assignment_id=submission.get("assignment_id"))
 
         # Determine content based on submission type
         if submission_type == "code":
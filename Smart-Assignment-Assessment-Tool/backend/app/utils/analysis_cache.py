@@ -0,0 +1,190 @@
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+import threading
+
+from app.config import cache_dir
+from app.utils.github_cache import LRUCache
+from app.utils.github_api import diff_trees
+from app.utils.github_client import parse_repo_url
+from app.utils.llm_usage import record_llm_call
+from app.utils.repo_snapshot import resolve_head_sha
+
+ANALYSIS_CACHE_ENABLED = os.getenv("ANALYSIS_CACHE_ENABLED", "true").lower() == "true"
+# Bump to drop every cached analysis at once (e.g. after a model change).
+ANALYSIS_CACHE_SALT = os.getenv("ANALYSIS_CACHE_SALT", "1")
+
+_memory = LRUCache(int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "500")))
+_counters = {}
+_counters_lock = threading.Lock()
+_versions = {}
+
+
+def analyzer_version(*analyzers):
+    """
+    Version of an analysis: a hash of the source of the functions / modules
+    that produce it. Editing a Gemini prompt or a local rule changes the
+    version, so results from the old analyzer are no longer served.
+    """
+    if analyzers not in _versions:
+        digest = hashlib.sha1(ANALYSIS_CACHE_SALT.encode())
+        for analyzer in analyzers:
+            digest.update(inspect.getsource(analyzer).encode())
+        _versions[analyzers] = digest.hexdigest()[:12]
+    return _versions[analyzers]
+
+
+def _count(analysis, name):
+    with _counters_lock:
+        counters = _counters.setdefault(analysis, {"hits": 0, "misses": 0, "forced": 0, "stored": 0, "incremental": 0, "unchanged": 0})
+        counters[name] += 1
+
+
+def _cache_path(owner, repo, sha, analysis, version):
+    return os.path.join(cache_dir("analyses"), f"{owner.lower()}__{repo.lower()}__{sha}__{analysis}__{version}.json")
+
+
+def get_cached_analysis(owner, repo, sha, analysis, version):
+    key = (owner.lower(), repo.lower(), sha, analysis, version)
+    result = _memory.get(key)
+    if result is not None:
+        return result
+    try:
+        with open(_cache_path(owner, repo, sha, analysis, version)) as f:
+            result = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    _memory.set(key, result)
+    return result
+
+
+def _store(owner, repo, sha, analysis, version, result):
+    # Written atomically so other workers never read half a file.
+    path = _cache_path(owner, repo, sha, analysis, version)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(fd, "w") as f:
+        json.dump(result, f)
+    os.replace(tmp_path, path)
+    _memory.set((owner.lower(), repo.lower(), sha, analysis, version), result)
+
+
+def cached_analysis(repo_url, analysis, version, compute, force=False, llm_caller=None):
+    """
+    Return (result, cache_info) for an analysis of the repository's current
+    head commit. compute(sha) runs the analysis on a miss, or always when
+    force is set; results with an "error" are never cached. When the head
+    commit cannot be resolved the analysis simply runs uncached. For
+    LLM-backed analyses, llm_caller names the gateway caller a hit saves.
+    """
+    info = {"hit": False, "sha": None, "version": version}
+    if not ANALYSIS_CACHE_ENABLED:
+        return compute(None), info
+
+    try:
+        owner, repo = parse_repo_url(repo_url)
+        sha = resolve_head_sha(owner, repo)
+    except Exception as e:
+        print(f"Analysis cache bypassed for {repo_url}: {e}")
+        return compute(None), info
+    info["sha"] = sha
+
+    if force:
+        _count(analysis, "forced")
+    else:
+        result = get_cached_analysis(owner, repo, sha, analysis, version)
+        if result is not None:
+            _count(analysis, "hits")
+            if llm_caller:
+                record_llm_call(llm_caller, cache_hit=True)
+            info["hit"] = True
+            return result, info
+        _count(analysis, "misses")
+
+    result = compute(sha)
+    if isinstance(result, dict) and "error" not in result:
+        _store(owner, repo, sha, analysis, version, result)
+        _count(analysis, "stored")
+    return result, info
+
+
+def _line_number(issue):
+    """ Line of an issue as an int for sorting; Gemini and edited issues may store "12" or "" """
+    try:
+        return int(issue.get("line_number") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def merge_issues(previous, partial, touched, schema):
+    """
+    Stored results with every issue in a touched (changed or deleted) file
+    replaced by the issues of the partial run. schema is
+    (issues_key, ok_status, failed_status). A "total_issues" count (and
+    "truncated" flag) reported by the partial run is carried over.
+    """
+    issues_key, ok_status, failed_status = schema
+    issues = [issue for issue in (previous or {}).get(issues_key) or [] if issue.get("file_path") not in touched]
+    kept = len(issues)
+    issues.extend(partial.get(issues_key) or [])
+    issues.sort(key=lambda issue: (issue.get("file_path") or "", _line_number(issue)))
+    result = {"status": failed_status, issues_key: issues} if issues else {"status": ok_status}
+    if issues and "total_issues" in partial:
+        result["total_issues"] = kept + partial["total_issues"]
+    if partial.get("truncated"):
+        result["truncated"] = True
+    if "usage" in partial:
+        result["usage"] = partial["usage"]
+    return result
+
+
+def incremental_analysis(repo_url, analysis, version, analyze, schema, previous=None, force=False, llm_caller=None):
+    """
+    Run an analysis against the repository's head commit, reusing the
+    previously stored results where possible. The results record the commit
+    and analyzer version under "analysis". When the stored results come from
+    an older commit of the same analyzer version, only the files changed
+    since then are analysed (analyze(sha, paths)) and merged in; otherwise the
+    whole repository is, through the result cache (analyze(sha, None)).
+    Returns (result, run_info); llm_caller is as for cached_analysis.
+    """
+    base = (previous or {}).get("analysis") or {}
+    # Truncated results don't hold every issue, so they can't be patched up
+    if not force and base.get("sha") and base.get("version") == version and not previous.get("truncated"):
+        try:
+            owner, repo = parse_repo_url(repo_url)
+            sha = resolve_head_sha(owner, repo)
+            if sha == base["sha"]:
+                _count(analysis, "unchanged")
+                if llm_caller:
+                    record_llm_call(llm_caller, cache_hit=True)
+                return previous, {"hit": True, "sha": sha, "version": version, "mode": "unchanged"}
+            changed, deleted = diff_trees(owner, repo, base["sha"], sha)
+        except Exception as e:
+            # e.g. the old commit was force-pushed away
+            print(f"Incremental {analysis} not possible for {repo_url}, analysing everything: {e}")
+        else:
+            partial = analyze(sha, changed) if changed else {"status": schema[1]}
+            if "error" in partial:
+                return partial, {"hit": False, "sha": sha, "version": version, "mode": "incremental"}
+            _count(analysis, "incremental")
+            result = merge_issues(previous, partial, set(changed) | set(deleted), schema)
+            result["analysis"] = {
+                "sha": sha, "version": version, "mode": "incremental", "base_sha": base["sha"],
+                "changed_files": len(changed), "deleted_files": len(deleted),
+            }
+            return result, {"hit": False, "sha": sha, "version": version, "mode": "incremental"}
+
+    result, info = cached_analysis(repo_url, analysis, version, lambda sha: analyze(sha, None), force, llm_caller)
+    info["mode"] = "full"
+    if "error" in result or not info["sha"]:
+        return result, info
+    # Copied: the cached object is shared with other requests.
+    return {**result, "analysis": {"sha": info["sha"], "version": version, "mode": "full"}}, info
+
+
+def analysis_cache_stats():
+    with _counters_lock:
+        counters = {analysis: dict(values) for analysis, values in _counters.items()}
+    return {"enabled": ANALYSIS_CACHE_ENABLED, "analyses": counters, "memory": _memory.stats()}
@@ -0,0 +1,219 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+
+from app.config import cache_dir
+
+BLOB_STORE_MAX_BYTES = int(os.getenv("BLOB_STORE_MAX_BYTES", str(2 * 1024 ** 3)))
+# put_stream keeps blobs up to this size in memory before spilling to a temporary file.
+BLOB_SPOOL_BYTES = int(os.getenv("BLOB_SPOOL_BYTES", str(1024 ** 2)))
+# Other workers write to the same directory, so re-measure it every so often.
+BLOB_RESCAN_EVERY = 200
+
+_SHA_PATTERN = re.compile(r"^[0-9a-f]{40}$")
+
+
+def git_blob_sha(data):
+    """ SHA-1 git assigns to a blob with this content """
+    header = f"blob {len(data)}\0".encode()
+    return hashlib.sha1(header + data).hexdigest()
+
+
+class BlobStore:
+    """
+    Content-addressed store of decoded file bytes keyed by git blob SHA.
+    A blob never changes for a given SHA, so entries are valid forever and are
+    shared by every fork and re-submission that contains the same file.
+    The directory is bounded by max_bytes; least-recently-read blobs go first.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._approx_bytes = None
+        self._writes_since_scan = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, sha):
+        return os.path.join(self.root, sha[:2], sha[2:])
+
+    @staticmethod
+    def is_valid_sha(sha):
+        return bool(sha) and bool(_SHA_PATTERN.match(sha))
+
+    def path_for(self, sha):
+        """ Filesystem path of a stored blob (refreshing its LRU position), or None """
+        if not self.is_valid_sha(sha):
+            return None
+        path = self._path(sha)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def get(self, sha):
+        """
+        Return the blob's bytes, or None when it is not stored. Callers that
+        stream large files should send path_for(sha) instead.
+        """
+        path = self.path_for(sha)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            # Evicted by another worker between the lookup and the read.
+            return None
+
+    def put(self, data, sha=None):
+        """
+        Store data and return its blob SHA.
+        When the caller already knows the SHA it is verified against the content.
+        """
+        actual_sha = git_blob_sha(data)
+        if sha and sha != actual_sha:
+            raise ValueError(f"Blob content does not match SHA {sha}")
+        return self._write(actual_sha, [data])
+
+    def put_stream(self, chunks, sha=None):
+        """ Store an iterable of byte chunks without holding the file in memory """
+        digest = hashlib.sha1()
+        spooled = tempfile.SpooledTemporaryFile(max_size=BLOB_SPOOL_BYTES, dir=self.root)
+        with spooled:
+            size = 0
+            for chunk in chunks:
+                spooled.write(chunk)
+                size += len(chunk)
+            spooled.seek(0)
+            digest.update(f"blob {size}\0".encode())
+            for chunk in iter(lambda: spooled.read(1024 * 1024), b""):
+                digest.update(chunk)
+            actual_sha = digest.hexdigest()
+            if sha and sha != actual_sha:
+                raise ValueError(f"Blob content does not match SHA {sha}")
+            spooled.seek(0)
+            return self._write(actual_sha, iter(lambda: spooled.read(1024 * 1024), b""))
+
+    def adopt(self, file_path, sha):
+        """
+        Add an existing file (whose blob SHA the caller computed) by hard-linking
+        it, so the store and e.g. a repository snapshot share a single copy.
+        """
+        path = self._path(sha)
+        if os.path.exists(path):
+            return sha
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            os.link(file_path, path)
+        except FileExistsError:
+            return sha
+        except OSError:
+            # Different filesystem: fall back to a copy.
+            with open(file_path, "rb") as f:
+                return self.put_stream(iter(lambda: f.read(1024 * 1024), b""), sha)
+        self._account(os.path.getsize(path))
+        return sha
+
+    def _write(self, sha, chunks):
+        path = self._path(sha)
+        if os.path.exists(path):
+            return sha
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file and rename so readers never see a partial blob.
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(path))
+        try:
+            size = 0
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self._account(size)
+        return sha
+
+    def _account(self, size):
+        """ Track the approximate store size and evict once it overflows """
+        with self._lock:
+            self._writes_since_scan += 1
+            rescan = self._approx_bytes is None or self._writes_since_scan >= BLOB_RESCAN_EVERY
+            if not rescan:
+                self._approx_bytes += size
+            needs_eviction = rescan or self._approx_bytes > self.max_bytes
+        if needs_eviction:
+            self.evict()
+
+    def evict(self):
+        """ Remove least-recently-used blobs until the store fits in max_bytes """
+        entries = []
+        total = 0
+        for prefix in os.listdir(self.root):
+            prefix_dir = os.path.join(self.root, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                if name.startswith("."):
+                    continue  # in-flight write
+                try:
+                    stat = os.stat(os.path.join(prefix_dir, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, os.path.join(prefix_dir, name)))
+                total += stat.st_size
+
+        if total > self.max_bytes:
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                with self._lock:
+                    self.evictions += 1
+
+        with self._lock:
+            self._approx_bytes = total
+            self._writes_since_scan = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "path": self.root,
+                "bytes": self._approx_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+_blob_store = None
+_blob_store_lock = threading.Lock()
+
+
+def get_blob_store():
+    """ Return the process-wide blob store under SAAT_CACHE_DIR/blobs """
+    global _blob_store
+    if _blob_store is None:
+        with _blob_store_lock:
+            if _blob_store is None:
+                _blob_store = BlobStore(cache_dir("blobs"), BLOB_STORE_MAX_BYTES)
+    return _blob_store
@@ -0,0 +1,560 @@
+import ast
+import hashlib
+import inspect
+import io
+import json
+import os
+import re
+import sqlite3
+import sys
+import tokenize
+from contextlib import closing
+
+try:
+    import esprima
+except ImportError:
+    esprima = None
+
+from app.config import cache_dir
+from app.utils.naming_engine import NAMING_WORKERS, get_pool, is_analyzable, language_for
+
+# Below this many uncached files the pool costs more than it saves.
+METRICS_PARALLEL_MIN_FILES = int(os.getenv("METRICS_PARALLEL_MIN_FILES", "40"))
+# Identical runs of this many code lines (whitespace and comments ignored) count as duplicated.
+METRICS_DUPLICATE_LINES = int(os.getenv("METRICS_DUPLICATE_LINES", "6"))
+METRICS_COMPLEXITY_THRESHOLD = int(os.getenv("METRICS_COMPLEXITY_THRESHOLD", "10"))
+METRICS_FUNCTION_LINES_THRESHOLD = int(os.getenv("METRICS_FUNCTION_LINES_THRESHOLD", "50"))
+METRICS_NESTING_THRESHOLD = int(os.getenv("METRICS_NESTING_THRESHOLD", "4"))
+# Caps on the lists stored in the codes document (Firestore's 1 MB limit); summary totals cover everything.
+METRICS_MAX_FILES = int(os.getenv("METRICS_MAX_FILES", "300"))
+METRICS_MAX_FUNCTIONS = int(os.getenv("METRICS_MAX_FUNCTIONS", "100"))
+METRICS_MAX_DUPLICATES = int(os.getenv("METRICS_MAX_DUPLICATES", "50"))
+
+# Occurrences of one block paired up when looking for duplicates; boilerplate repeats a lot.
+_MAX_OCCURRENCES = 10
+# Comments (group "comment") or string literals, so comment markers inside strings are skipped.
+C_COMMENTS = re.compile(
+    r"(?P<comment>//[^\n]*|/\*.*?\*/)|\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`",
+    re.DOTALL,
+)
+PHP_COMMENTS = re.compile(
+    r"(?P<comment>//[^\n]*|/\*.*?\*/|#(?!\[)[^\n]*)|\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*'",
+    re.DOTALL,
+)
+_HAS_WORD = re.compile(r"[A-Za-z0-9]")
+_TRIVIAL_LINES = {"else", "else:", "try:", "finally:", "pass", "break;", "continue;", "return;", "return", "default:"}
+
+
+# ------------------------------------------------------------ Lines
+
+def _blank_comment(match):
+    if match.group("comment") is None:
+        return match.group(0)
+    return re.sub(r"[^\n]", " ", match.group(0))
+
+
+def _python_lines(source, tree):
+    """ (code line numbers, comment line numbers, code text per line without comments) """
+    code, comments, cut = set(), set(), {}
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(source).readline):
+            if token.type == tokenize.COMMENT:
+                comments.add(token.start[0])
+                cut[token.start[0]] = token.start[1]
+            elif token.type not in (tokenize.NL, tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT, tokenize.ENDMARKER):
+                code.update(range(token.start[0], token.end[0] + 1))
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        code, comments, cut = set(), set(), {}
+        for number, line in enumerate(source.splitlines(), start=1):
+            stripped = line.strip()
+            if stripped.startswith("#"):
+                comments.add(number)
+            elif stripped:
+                code.add(number)
+
+    # Docstrings document the code, so they count as comments.
+    if tree is not None:
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)) and node.body:
+                first = node.body[0]
+                if isinstance(first, ast.Expr) and isinstance(first.value, ast.Constant) and isinstance(first.value.value, str):
+                    docstring = set(range(first.lineno, first.end_lineno + 1))
+                    code -= docstring
+                    comments |= docstring
+
+    lines = source.splitlines()
+    text = {number: lines[number - 1][:cut.get(number)] for number in code if number <= len(lines)}
+    return code, comments, text
+
+
+def _c_like_lines(source, language):
+    pattern = PHP_COMMENTS if language == "php" else C_COMMENTS
+    stripped = pattern.sub(_blank_comment, source).splitlines()
+    code, comments, text = set(), set(), {}
+    for number, (line, original) in enumerate(zip(stripped, source.splitlines()), start=1):
+        if line.strip():
+            code.add(number)
+            text[number] = line
+        elif original.strip():
+            comments.add(number)
+    return code, comments, text
+
+
+def _duplicate_windows(text):
+    """
+    Line numbers of the code lines worth comparing, and a hash of every run
+    of METRICS_DUPLICATE_LINES of them (run i starts at the i-th line).
+    """
+    numbers, normalised = [], []
+    for number in sorted(text):
+        line = " ".join(text[number].split())
+        if _HAS_WORD.search(line) and line not in _TRIVIAL_LINES:
+            numbers.append(number)
+            normalised.append(line)
+    hashes = [
+        hashlib.sha1("\n".join(normalised[index:index + METRICS_DUPLICATE_LINES]).encode()).hexdigest()[:16]
+        for index in range(len(normalised) - METRICS_DUPLICATE_LINES + 1)
+    ]
+    return numbers, hashes
+
+
+# --------------------------------------------------------------- Python
+
+_PY_BRANCHES = (ast.If, ast.IfExp, ast.For, ast.AsyncFor, ast.While, ast.ExceptHandler)
+_PY_BLOCKS = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.With, ast.AsyncWith, ast.Try) + (
+    (ast.Match,) if hasattr(ast, "Match") else ()
+) + ((ast.TryStar,) if hasattr(ast, "TryStar") else ())
+_PY_SCOPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+
+def _python_function(node, name):
+    """ McCabe complexity (1 + decision points) and deepest block nesting of one function """
+    complexity = 1
+    deepest = 0
+
+    def walk(parent, level):
+        nonlocal complexity, deepest
+        for child in ast.iter_child_nodes(parent):
+            if isinstance(child, _PY_SCOPES):
+                continue  # Nested functions and classes are measured on their own
+            if isinstance(child, _PY_BRANCHES):
+                complexity += 1
+            elif isinstance(child, ast.BoolOp):
+                complexity += len(child.values) - 1
+            elif isinstance(child, ast.comprehension):
+                complexity += 1 + len(child.ifs)
+            elif type(child).__name__ == "match_case":
+                complexity += 1
+            child_level = level
+            if isinstance(child, _PY_BLOCKS):
+                is_elif = isinstance(parent, ast.If) and parent.orelse == [child] and isinstance(child, ast.If)
+                child_level = level if is_elif else level + 1
+                deepest = max(deepest, child_level)
+            walk(child, child_level)
+
+    walk(node, 0)
+    arguments = node.args
+    parameters = [arg.arg for arg in arguments.posonlyargs + arguments.args + arguments.kwonlyargs]
+    if parameters and parameters[0] in ("self", "cls"):
+        parameters = parameters[1:]
+    return {
+        "name": name,
+        "line_number": node.lineno,
+        "end_line": node.end_lineno,
+        "length": node.end_lineno - node.lineno + 1,
+        "complexity": complexity,
+        "max_nesting": deepest,
+        "parameters": len(parameters) + bool(arguments.vararg) + bool(arguments.kwarg),
+    }
+
+
+def python_functions(tree):
+    functions = []
+
+    def visit(parent, prefix):
+        for child in ast.iter_child_nodes(parent):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                functions.append(_python_function(child, prefix + child.name))
+                visit(child, f"{prefix}{child.name}.")
+            elif isinstance(child, ast.ClassDef):
+                visit(child, f"{prefix}{child.name}.")
+            else:
+                visit(child, prefix)
+
+    visit(tree, "")
+    return functions
+
+
+# ----------------------------------------------------------- JavaScript
+
+_JS_FUNCTIONS = ("FunctionDeclaration", "FunctionExpression", "ArrowFunctionExpression")
+_JS_BRANCHES = (
+    "IfStatement", "ConditionalExpression", "ForStatement", "ForInStatement", "ForOfStatement",
+    "WhileStatement", "DoWhileStatement", "CatchClause",
+)
+_JS_BLOCKS = (
+    "IfStatement", "ForStatement", "ForInStatement", "ForOfStatement", "WhileStatement",
+    "DoWhileStatement", "SwitchStatement", "TryStatement",
+)
+
+
+def _js_children(node):
+    for value in vars(node).values():
+        if isinstance(value, list):
+            for item in value:
+                if isinstance(item, esprima.nodes.Node):
+                    yield item
+        elif isinstance(value, esprima.nodes.Node):
+            yield value
+
+
+def _js_name(node):
+    """ Readable name of an identifier, literal key or member expression (a.b.c) """
+    if node is None:
+        return None
+    if node.type == "Identifier":
+        return node.name
+    if node.type == "Literal":
+        return str(node.value)
+    if node.type == "MemberExpression" and not node.computed:
+        owner = _js_name(node.object) if node.object.type != "ThisExpression" else "this"
+        return f"{owner}.{node.property.name}" if owner else node.property.name
+    return None
+
+
+def _js_function(node, name):
+    complexity = 1
+    deepest = 0
+
+    def walk(parent, level):
+        nonlocal complexity, deepest
+        for child in _js_children(parent):
+            if child.type in _JS_FUNCTIONS:
+                continue
+            if child.type in _JS_BRANCHES:
+                complexity += 1
+            elif child.type == "SwitchCase" and child.test is not None:
+                complexity += 1
+            elif child.type == "LogicalExpression" and child.operator in ("&&", "||", "??"):
+                complexity += 1
+            child_level = level
+            if child.type in _JS_BLOCKS:
+                is_else_if = parent.type == "IfStatement" and child is parent.alternate and child.type == "IfStatement"
+                child_level = level if is_else_if else level + 1
+                deepest = max(deepest, child_level)
+            walk(child, child_level)
+
+    walk(node, 0)
+    return {
+        "name": name,
+        "line_number": node.loc.start.line,
+        "end_line": node.loc.end.line,
+        "length": node.loc.end.line - node.loc.start.line + 1,
+        "complexity": complexity,
+        "max_nesting": deepest,
+        "parameters": len(node.params),
+    }
+
+
+def javascript_functions(tree):
+    functions = []
+
+    def visit(parent, prefix):
+        for child in _js_children(parent):
+            if child.type in _JS_FUNCTIONS:
+                name = _js_name(child.id) if child.id is not None else None
+                if name is None:
+                    if parent.type == "VariableDeclarator" and child is parent.init:
+                        name = _js_name(parent.id)
+                    elif parent.type in ("MethodDefinition", "Property", "PropertyDefinition") and child is parent.value:
+                        name = _js_name(parent.key)
+                    elif parent.type == "AssignmentExpression" and child is parent.right:
+                        name = _js_name(parent.left)
+                name = prefix + (name or "<anonymous>")
+                functions.append(_js_function(child, name))
+                visit(child, name + ".")
+            elif child.type in ("ClassDeclaration", "ClassExpression") and child.id is not None:
+                visit(child, f"{prefix}{child.id.name}.")
+            else:
+                visit(child, prefix)
+
+    visit(tree, "")
+    return functions
+
+
+def _parse_javascript(source):
+    options = {"jsx": True, "tolerant": True, "loc": True}
+    try:
+        return esprima.parseModule(source, options)
+    except Exception:
+        return esprima.parseScript(source, options)
+
+
+# ----------------------------------------------------------------- Files
+
+def measure_source(source, language):
+    """
+    Metrics of one file: line counts, per-function complexity / length /
+    nesting (Python and JavaScript; other languages get line metrics only)
+    and the duplicate-detection windows.
+    """
+    functions = None
+    tree = None
+    if language == "python":
+        try:
+            tree = ast.parse(source)
+            functions = python_functions(tree)
+        except (SyntaxError, ValueError):
+            tree = None
+        code, comments, text = _python_lines(source, tree)
+    else:
+        if language == "javascript" and esprima is not None:
+            try:
+                functions = javascript_functions(_parse_javascript(source))
+            except Exception:
+                functions = None
+        code, comments, text = _c_like_lines(source, language)
+
+    total = len(source.splitlines())
+    comments -= code  # A line with code and a trailing comment is a code line
+    numbers, hashes = _duplicate_windows(text)
+    return {
+        "language": language,
+        "lines": total,
+        "code_lines": len(code),
+        "comment_lines": len(comments),
+        "blank_lines": total - len(code) - len(comments),
+        "functions": functions,
+        "duplicate_lines": numbers,
+        "duplicate_hashes": hashes,
+    }
+
+
+def measure_file(task):
+    """ Process-pool entry point: task is (absolute_path, language) """
+    file_path, language = task
+    try:
+        with open(file_path, "rb") as f:
+            source = f.read().decode("utf-8", errors="replace")
+    except OSError:
+        return None
+    return measure_source(source, language)
+
+
+# ----------------------------------------------------------------- Cache
+
+_version = None
+
+
+def metrics_version():
+    """ Hash of this module's source and duplicate window: cached file metrics from other versions are ignored """
+    global _version
+    if _version is None:
+        source = inspect.getsource(sys.modules[__name__])
+        _version = hashlib.sha1(f"{source}\0{METRICS_DUPLICATE_LINES}".encode()).hexdigest()[:12]
+    return _version
+
+
+class FileMetricsCache:
+    """
+    Per-file metrics keyed by git blob SHA, language and metrics version in
+    SQLite under SAAT_CACHE_DIR/metrics: a file unchanged between commits or
+    shared between repositories (templates, copied code) is measured once.
+    """
+
+    def __init__(self):
+        self.path = os.path.join(cache_dir("metrics"), "file_metrics.sqlite3")
+        with closing(self._connect()) as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS file_metrics (key TEXT PRIMARY KEY, data TEXT NOT NULL)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def get_many(self, keys):
+        found = {}
+        keys = list(keys)
+        with closing(self._connect()) as conn:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ", ".join("?" for _ in batch)
+                for key, data in conn.execute(f"SELECT key, data FROM file_metrics WHERE key IN ({placeholders})", batch):
+                    found[key] = json.loads(data)
+        return found
+
+    def put_many(self, items):
+        if not items:
+            return
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT OR REPLACE INTO file_metrics (key, data) VALUES (?, ?)",
+                [(key, json.dumps(data)) for key, data in items.items()],
+            )
+            conn.execute("COMMIT")
+
+
+_cache = None
+
+
+def get_metrics_cache():
+    global _cache
+    if _cache is None:
+        _cache = FileMetricsCache()
+    return _cache
+
+
+# ----------------------------------------------------------- Repository
+
+def find_duplicates(measured):
+    """
+    Duplicated blocks across (and within) files from their windows: runs of
+    windows shared by the same two places at a constant offset are merged
+    into one block. Returns (blocks, duplicated line numbers per path).
+    """
+    occurrences = {}
+    for path, metrics in measured.items():
+        for index, digest in enumerate(metrics["duplicate_hashes"]):
+            occurrences.setdefault(digest, []).append((path, index))
+
+    pairs = {}
+    for places in occurrences.values():
+        places = places[:_MAX_OCCURRENCES]
+        for position, (path, index) in enumerate(places):
+            for other_path, other_index in places[position + 1:]:
+                offset = other_index - index
+                if path == other_path and abs(offset) < METRICS_DUPLICATE_LINES:
+                    continue  # Overlapping windows of one repeated line
+                pairs.setdefault((path, other_path, offset), []).append(index)
+
+    blocks = []
+    duplicated = {}
+    for (path, other_path, offset), indexes in pairs.items():
+        indexes.sort()
+        start = previous = indexes[0]
+        for index in indexes[1:] + [None]:
+            if index is not None and index == previous + 1:
+                previous = index
+                continue
+            end = previous + METRICS_DUPLICATE_LINES - 1
+            numbers = measured[path]["duplicate_lines"]
+            other_numbers = measured[other_path]["duplicate_lines"]
+            blocks.append({
+                "file_path": path,
+                "start_line": numbers[start],
+                "end_line": numbers[end],
+                "other_file_path": other_path,
+                "other_start_line": other_numbers[start + offset],
+                "other_end_line": other_numbers[end + offset],
+                "lines": end - start + 1,
+            })
+            duplicated.setdefault(path, set()).update(numbers[start:end + 1])
+            duplicated.setdefault(other_path, set()).update(other_numbers[start + offset:end + offset + 1])
+            if index is not None:
+                start = previous = index
+    blocks.sort(key=lambda block: (-block["lines"], block["file_path"], block["start_line"]))
+    return blocks, duplicated
+
+
+def _ratio(part, whole):
+    return round(part / whole, 4) if whole else 0.0
+
+
+def summarize_metrics(measured):
+    """ The stored schema: repository summary, per-file rows, worst functions and duplicated blocks """
+    blocks, duplicated = find_duplicates(measured)
+    files = []
+    functions = []
+    for path, metrics in sorted(measured.items()):
+        file_functions = metrics["functions"] or []
+        complexities = [function["complexity"] for function in file_functions]
+        files.append({
+            "file_path": path,
+            "language": metrics["language"],
+            "lines": metrics["lines"],
+            "code_lines": metrics["code_lines"],
+            "comment_lines": metrics["comment_lines"],
+            "comment_density": _ratio(metrics["comment_lines"], metrics["code_lines"] + metrics["comment_lines"]),
+            "functions": len(file_functions) if metrics["functions"] is not None else None,
+            "max_complexity": max(complexities, default=0),
+            "avg_complexity": round(sum(complexities) / len(complexities), 2) if complexities else 0,
+            "max_nesting": max((function["max_nesting"] for function in file_functions), default=0),
+            "duplicated_lines": len(duplicated.get(path, ())),
+        })
+        functions.extend({"file_path": path, **function} for function in file_functions)
+
+    code_lines = sum(row["code_lines"] for row in files)
+    comment_lines = sum(row["comment_lines"] for row in files)
+    duplicated_lines = sum(row["duplicated_lines"] for row in files)
+    complexities = [function["complexity"] for function in functions]
+    summary = {
+        "files": len(files),
+        "lines": sum(row["lines"] for row in files),
+        "code_lines": code_lines,
+        "comment_lines": comment_lines,
+        "comment_density": _ratio(comment_lines, code_lines + comment_lines),
+        "functions": len(functions),
+        "avg_complexity": round(sum(complexities) / len(complexities), 2) if complexities else 0,
+        "max_complexity": max(complexities, default=0),
+        "complex_functions": sum(1 for function in functions if function["complexity"] > METRICS_COMPLEXITY_THRESHOLD),
+        "long_functions": sum(1 for function in functions if function["length"] > METRICS_FUNCTION_LINES_THRESHOLD),
+        "deeply_nested_functions": sum(1 for function in functions if function["max_nesting"] > METRICS_NESTING_THRESHOLD),
+        "duplicated_blocks": len(blocks),
+        "duplicated_lines": duplicated_lines,
+        "duplication_ratio": _ratio(duplicated_lines, code_lines),
+    }
+    functions.sort(key=lambda function: (-function["complexity"], -function["length"], function["file_path"], function["line_number"]))
+    files.sort(key=lambda row: (-row["max_complexity"], -row["code_lines"], row["file_path"]))
+    return {
+        "summary": summary,
+        "thresholds": {
+            "complexity": METRICS_COMPLEXITY_THRESHOLD,
+            "function_lines": METRICS_FUNCTION_LINES_THRESHOLD,
+            "nesting": METRICS_NESTING_THRESHOLD,
+            "duplicate_lines": METRICS_DUPLICATE_LINES,
+        },
+        "files": files[:METRICS_MAX_FILES],
+        "functions": functions[:METRICS_MAX_FUNCTIONS],
+        "duplicates": blocks[:METRICS_MAX_DUPLICATES],
+    }
+
+
+def compute_code_metrics(snapshot, paths=None):
+    """
+    Measure every source file of a repository snapshot (or only paths).
+    Files already measured (same blob SHA) come from the cache; the rest
+    are measured in the shared process pool when there are enough of them.
+    """
+    wanted = set(paths) if paths is not None else None
+    files = [
+        (path, info) for path, info in snapshot.files()
+        if (wanted is None or path in wanted) and is_analyzable(path, info.get("size"))
+    ]
+    version = metrics_version()
+    keys = {
+        path: f"{info['sha']}:{language_for(path)}:{version}"
+        for path, info in files if info.get("sha")
+    }
+    cache = get_metrics_cache()
+    cached = cache.get_many(set(keys.values()))
+
+    measured = {path: cached[keys[path]] for path, _ in files if keys.get(path) in cached}
+    missing = [path for path, _ in files if path not in measured]
+    tasks = [(snapshot.file_path(path), language_for(path)) for path in missing]
+    if len(tasks) >= METRICS_PARALLEL_MIN_FILES and NAMING_WORKERS > 1:
+        chunksize = max(1, len(tasks) // (NAMING_WORKERS * 4))
+        results = get_pool().map(measure_file, tasks, chunksize=chunksize)
+    else:
+        results = map(measure_file, tasks)
+
+    fresh = {}
+    for path, metrics in zip(missing, results):
+        if metrics is None:
+            continue
+        measured[path] = metrics
+        if path in keys:
+            fresh[keys[path]] = metrics
+    cache.put_many(fresh)
+
+    return summarize_metrics(measured)
@@ -0,0 +1,131 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
+
+from app.utils.github_client import github_get, parse_repo_url
+from app.utils.github_graphql import GraphQLError, fetch_repos_graphql, graphql_enabled
+from app.utils.stats_warmer import COHORT, StatsUnavailableError, contributor_activity, warm_contributor_stats
+
+# Repositories loaded at the same time for one cohort request. The GitHub
+# scheduler still caps the requests actually in flight.
+COHORT_MAX_WORKERS = int(os.getenv("COHORT_MAX_WORKERS", "16"))
+# How long each repository may wait for its contributor statistics.
+COHORT_STATS_WAIT_SECONDS = float(os.getenv("COHORT_STATS_WAIT_SECONDS", "20"))
+
+
+def load_cohort_codes(db, assignment_id):
+    """
+    Resolve an assignment's submissions to their code documents.
+    Returns [{"submission_id", "student_id", "code_id", "github_url"}].
+    """
+    submissions = [
+        doc.to_dict()
+        for doc in db.collection("submissions").where("assignment_id", "==", assignment_id).stream()
+    ]
+    submissions = [submission for submission in submissions if submission.get("code_id")]
+    if not submissions:
+        return []
+
+    # One batched read for every code document instead of one round trip each.
+    refs = [db.collection("codes").document(submission["code_id"]) for submission in submissions]
+    codes = {doc.id: doc.to_dict() for doc in db.get_all(refs) if doc.exists}
+
+    cohort = []
+    for submission in submissions:
+        code = codes.get(submission["code_id"])
+        if not code or not code.get("github_url"):
+            continue
+        cohort.append({
+            "submission_id": submission.get("submission_id"),
+            "student_id": submission.get("student_id"),
+            "code_id": submission["code_id"],
+            "github_url": code["github_url"],
+        })
+    return cohort
+
+
+def load_repo_summary(entry, prefetched=None):
+    """
+    Repository details, contributors and per-contributor activity for one
+    submission. prefetched maps (owner, repo) to GraphQL summaries fetched
+    for the whole cohort; repositories found there skip the REST calls.
+    """
+    result = dict(entry)
+    try:
+        owner, repo = parse_repo_url(entry["github_url"])
+    except ValueError:
+        result["error"] = "Invalid GitHub repository URL"
+        return result
+
+    summary = (prefetched or {}).get((owner, repo))
+    if summary is None and prefetched is not None and (owner, repo) in prefetched:
+        result["error"] = "GitHub API error: 404"
+        return result
+
+    if summary is None:
+        details = github_get(f"/repos/{owner}/{repo}")
+        if not details.ok:
+            result["error"] = f"GitHub API error: {details.status_code}"
+            return result
+        result["repo"] = details.json()
+    else:
+        result["repo"] = summary["details"]
+
+    # Start the statistics warm-up before listing contributors so both overlap.
+    future = None
+    try:
+        # The cohort lane has a worker per fetched repository, so warm-ups run side by side.
+        future = warm_contributor_stats(owner, repo, lane=COHORT)
+    except Exception as e:
+        result["activity_error"] = str(e)
+
+    # GraphQL contributors are None for histories longer than its window.
+    if summary is None or summary["contributors"] is None:
+        contributors = github_get(f"/repos/{owner}/{repo}/contributors")
+        result["contributors"] = contributors.json() if contributors.status_code == 200 else []
+    else:
+        result["contributors"] = summary["contributors"]
+
+    if future is not None:
+        try:
+            stats = future.result(timeout=COHORT_STATS_WAIT_SECONDS)
+            result["activity"] = {entry["author"]["login"]: contributor_activity(entry) for entry in stats.values()}
+        except FutureTimeoutError:
+            result["activity_error"] = "GitHub is calculating statistics. Please try again later."
+        except StatsUnavailableError as e:
+            result["activity_error"] = str(e)
+    return result
+
+
+def _prefetch_graphql(cohort):
+    repos = []
+    for entry in cohort:
+        try:
+            repos.append(parse_repo_url(entry["github_url"]))
+        except ValueError:
+            continue
+    try:
+        return fetch_repos_graphql(repos)
+    except GraphQLError as e:
+        print(f"GraphQL prefetch failed, using REST: {e}")
+        return None
+
+
+def iter_cohort(cohort, max_workers=None, backend=None):
+    """
+    Load every repository of the cohort concurrently and yield each summary as
+    soon as it is ready (completion order, not submission order). With the
+    GraphQL backend, details and contributors for the whole cohort are fetched
+    up front in a few batched queries.
+    """
+    prefetched = _prefetch_graphql(cohort) if graphql_enabled(backend) else None
+    executor = ThreadPoolExecutor(max_workers=max_workers or COHORT_MAX_WORKERS, thread_name_prefix="cohort")
+    try:
+        futures = {executor.submit(load_repo_summary, entry, prefetched): entry for entry in cohort}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                yield {**futures[future], "error": str(e)}
+    finally:
+        # A client that disconnects mid-stream should not keep the pool busy.
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,337 @@
+import ast
+import bisect
+import io
+import os
+import re
+import tokenize
+
+try:
+    import esprima
+except ImportError:
+    esprima = None
+
+from app.utils.code_metrics import C_COMMENTS, PHP_COMMENTS
+from app.utils.context_packer import CONTEXT_CHUNK_TOKENS, CONTEXT_MAX_CHUNKS, estimate_tokens
+from app.utils.naming_engine import LineIndex, language_for
+
+# "pairs": send only the extracted comments with the code they describe; "files": whole source files.
+COMMENTS_ACCURACY_INPUT = os.getenv("COMMENTS_ACCURACY_INPUT", "pairs").lower()
+# Comments judged per file; docstrings first, then block, header and inline comments.
+COMMENT_PAIRS_MAX_PER_FILE = int(os.getenv("COMMENT_PAIRS_MAX_PER_FILE", "40"))
+# Code lines shown after a comment (blank and comment lines not counted), up to the next comment.
+COMMENT_PAIR_CODE_LINES = int(os.getenv("COMMENT_PAIR_CODE_LINES", "12"))
+# Longer comments are cut when shown; actual_comment is cut the same way.
+COMMENT_PAIR_MAX_CHARS = int(os.getenv("COMMENT_PAIR_MAX_CHARS", "1000"))
+COMMENT_PAIRS_PER_PROMPT = int(os.getenv("COMMENT_PAIRS_PER_PROMPT", "150"))
+
+# Priority when a file has more comments than the cap.
+_PRIORITY = {"docstring": 0, "block": 1, "header": 2, "inline": 3}
+_MARKERS = re.compile(r'^\s*(?:#+|//+|/\*+|\*+/?|"""|\'\'\')?|(?:\*+/|"""|\'\'\')\s*$')
+_PRAGMA = re.compile(
+    r"^(?:!|-\*-|(?:vim?|ex):|noqa\b|type:|pylint:|pyright:|mypy:|fmt:|isort:|pragma\b|nosec\b|"
+    r"eslint\b|eslint-|prettier-ignore|istanbul\b|jshint\b|jscs:|global\s|globals\s|@ts-|@flow\b|"
+    r"#?region\b|#?endregion\b|nolint\b|clang-format\b|phpcs:|@codingStandards|sourceMappingURL)",
+    re.IGNORECASE,
+)
+_CODING = re.compile(r"coding[:=]\s*[-\w.]+")
+_TASK_ONLY = re.compile(r"^(?:TODO|FIXME|XXX|HACK)\b", re.IGNORECASE)
+_LICENSE = re.compile(r"copyright|\blicen[cs]e\b|SPDX-License-Identifier|all rights reserved", re.IGNORECASE)
+_HAS_WORD = re.compile(r"[A-Za-z0-9]")
+
+
+def comment_text(raw):
+    """ A comment without its markers (#, //, /* */, leading *, triple quotes) """
+    lines = [_MARKERS.sub("", line).strip() for line in raw.splitlines()]
+    return " ".join(line for line in lines if line)
+
+
+def _is_noise(raw):
+    """ Shebangs, encoding lines, tool pragmas, bare TODOs and decoration are not worth judging """
+    text = comment_text(raw)
+    if raw.startswith("#!") or not _HAS_WORD.search(text):
+        return True
+    return bool(_PRAGMA.match(text) or (_CODING.search(text) and len(text) < 40) or _TASK_ONLY.match(text))
+
+
+# ------------------------------------------------------------ Comments
+
+def _python_comments(source, lines):
+    """ (comments, code line numbers, docstring pairs) of a Python file """
+    comments, code = [], set()
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(source).readline):
+            if token.type == tokenize.COMMENT:
+                comments.append({"line": token.start[0], "end_line": token.start[0], "raw": token.string, "style": "line"})
+            elif token.type not in (tokenize.NL, tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT, tokenize.ENDMARKER):
+                code.update(range(token.start[0], token.end[0] + 1))
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        comments, code = [], set()
+        for number, line in enumerate(lines, start=1):
+            stripped = line.strip()
+            if stripped.startswith("#"):
+                comments.append({"line": number, "end_line": number, "raw": stripped, "style": "line"})
+            elif stripped:
+                code.add(number)
+    for comment in comments:
+        comment["inline"] = not lines[comment["line"] - 1].lstrip().startswith("#")
+
+    docstrings = []
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        tree = None
+    if tree is not None:
+        for node in ast.walk(tree):
+            if not isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)) or not node.body:
+                continue
+            first = node.body[0]
+            if not (isinstance(first, ast.Expr) and isinstance(first.value, ast.Constant) and isinstance(first.value.value, str)):
+                continue
+            docstring = {
+                "line": first.lineno, "end_line": first.end_lineno, "style": "block", "inline": False, "doc": True,
+                "raw": "\n".join(line.strip() for line in lines[first.lineno - 1:first.end_lineno]),
+            }
+            if not isinstance(node, ast.Module):
+                # The signature above the docstring and the body below it.
+                start = node.decorator_list[0].lineno if node.decorator_list else node.lineno
+                body = [number for number in range(first.end_lineno + 1, node.end_lineno + 1) if number in code]
+                docstring["code"] = list(range(start, first.lineno)) + body[:COMMENT_PAIR_CODE_LINES]
+            docstrings.append(docstring)
+    return comments, code, docstrings
+
+
+def _blank_ranges(source, ranges):
+    """ The source with every (start, end) range blanked out, newlines kept """
+    parts, position = [], 0
+    for start, end in ranges:
+        parts.append(source[position:start])
+        parts.append(re.sub(r"[^\n]", " ", source[start:end]))
+        position = end
+    parts.append(source[position:])
+    return "".join(parts)
+
+
+def _c_like_comments(source, language):
+    """ (comments, code line numbers) of a JavaScript / C-style file; comment ranges from esprima where it parses """
+    ranges = None
+    if esprima is not None and language == "javascript":
+        try:
+            tokens = esprima.tokenize(source, {"comment": True, "range": True, "jsx": True, "tolerant": True})
+            ranges = [tuple(token.range) for token in tokens if token.type in ("LineComment", "BlockComment")]
+        except Exception:
+            ranges = None
+    if ranges is None:
+        pattern = PHP_COMMENTS if language == "php" else C_COMMENTS
+        ranges = [match.span("comment") for match in pattern.finditer(source) if match.group("comment") is not None]
+
+    index = LineIndex(source)
+    code_text = _blank_ranges(source, ranges).splitlines()
+    code = {number for number, line in enumerate(code_text, start=1) if line.strip()}
+    comments = []
+    for start, end in ranges:
+        raw = source[start:end]
+        line = index.line(start)
+        comments.append({
+            "line": line,
+            "end_line": index.line(max(start, end - 1)),
+            "raw": raw,
+            "style": "block" if raw.startswith("/*") else "line",
+            "inline": line in code,
+            "doc": raw.startswith("/**") and not raw.startswith("/**/"),
+        })
+    return comments, code
+
+
+def _merge_line_comments(comments):
+    """ Consecutive full-line // or # comments read as one block """
+    merged = []
+    for comment in comments:
+        previous = merged[-1] if merged else None
+        if previous and comment["style"] == "line" and previous["style"] == "line" \
+                and not comment["inline"] and not previous["inline"] and comment["line"] == previous["end_line"] + 1:
+            previous["end_line"] = comment["line"]
+            previous["raw"] += "\n" + comment["raw"]
+        else:
+            merged.append(dict(comment))
+    return merged
+
+
+def extract_pairs(path, source):
+    """
+    The (comment, code it describes) pairs of one source file: dicts with
+    file_path, type (docstring / block / header / inline), line and end_line
+    of the comment, comment (its text as written) and code (the line numbers
+    shown with it: the following code lines, the commented line itself for
+    inline comments, signature and body for docstrings). At most
+    COMMENT_PAIRS_MAX_PER_FILE pairs, in line order.
+    """
+    language = language_for(path)
+    lines = source.splitlines()
+    if language == "python":
+        comments, code, docstrings = _python_comments(source, lines)
+    elif language is not None:
+        (comments, code), docstrings = _c_like_comments(source, language), []
+    else:
+        return []
+
+    comments = _merge_line_comments([comment for comment in comments if not _is_noise(comment["raw"])])
+    comments += [docstring for docstring in docstrings if not _is_noise(docstring["raw"])]
+    code_lines = sorted(code - {number for docstring in docstrings for number in range(docstring["line"], docstring["end_line"] + 1)})
+    first_code = code_lines[0] if code_lines else len(lines) + 1
+    # Code after the next comment is shown with that comment instead.
+    starts = sorted(comment["line"] for comment in comments if not comment["inline"])
+    comment_lines = {
+        number for comment in comments if not comment["inline"]
+        for number in range(comment["line"], comment["end_line"] + 1)
+    }
+
+    pairs = []
+    for comment in comments:
+        if comment["inline"]:
+            kind = "inline"
+        elif comment["line"] < first_code:
+            kind = "header"
+        elif comment.get("doc"):
+            kind = "docstring"
+        else:
+            kind = "block"
+        if kind == "header" and _LICENSE.search(comment["raw"]):
+            continue
+        if kind == "inline":
+            span = [comment["line"]]
+        elif "code" in comment:
+            # Docstrings keep their whole signature and body, which comments
+            # inside the body don't cut short.
+            span = [number for number in comment["code"] if number not in comment_lines]
+        else:
+            following = bisect.bisect_right(code_lines, comment["end_line"])
+            span = code_lines[following:following + COMMENT_PAIR_CODE_LINES]
+            following = bisect.bisect_right(starts, comment["end_line"])
+            if following < len(starts):
+                span = [number for number in span if number < starts[following]]
+        if not span:
+            continue  # Nothing to check the comment against
+        pairs.append({
+            "file_path": path,
+            "type": kind,
+            "line": comment["line"],
+            "end_line": comment["end_line"],
+            "comment": comment["raw"][:COMMENT_PAIR_MAX_CHARS],
+            "code": span,
+        })
+
+    pairs.sort(key=lambda pair: (_PRIORITY[pair["type"]], pair["line"]))
+    pairs = pairs[:COMMENT_PAIRS_MAX_PER_FILE]
+    pairs.sort(key=lambda pair: pair["line"])
+    return pairs
+
+
+# ------------------------------------------------------------ Prompts
+
+def _numbered(lines, numbers):
+    return "".join(f"{number}| {lines[number - 1]}\n" for number in numbers if number <= len(lines))
+
+
+def render_pair(pair, lines):
+    """ One pair as shown to the model: the numbered comment lines, then the numbered code """
+    comment_lines = list(range(pair["line"], pair["end_line"] + 1))
+    shown, size = [], 0
+    for number in comment_lines:
+        size += len(lines[number - 1]) + 1
+        if shown and size > COMMENT_PAIR_MAX_CHARS:
+            break
+        shown.append(number)
+    where = f"line {pair['line']}" if pair["line"] == pair["end_line"] else f"lines {pair['line']}-{pair['end_line']}"
+    text = f"{pair['type']} comment, {where}:\n{_numbered(lines, shown)}"
+    if len(shown) < len(comment_lines):
+        text += "   ... (comment continues)\n"
+    if pair["type"] == "inline":
+        return text
+    return text + f"code:\n{_numbered(lines, pair['code'])}"
+
+
+def pack_pairs(sources, budget=None, max_chunks=None, per_prompt=None):
+    """
+    Extract the pairs of ranked (path, text) sources and pack them into
+    chunks of at most `budget` estimated tokens and `per_prompt` pairs.
+    Returns (chunks, skipped_paths); each chunk is {"index", "files", "text",
+    "estimated_tokens", "pairs": {pair_id: pair}}, pair ids being P1, P2, ...
+    within the chunk. skipped_paths are the files whose pairs did not all fit
+    in max_chunks chunks; files without pairs are in neither.
+    """
+    budget = budget or CONTEXT_CHUNK_TOKENS
+    max_chunks = max_chunks or CONTEXT_MAX_CHUNKS
+    per_prompt = per_prompt or COMMENT_PAIRS_PER_PROMPT
+    chunks = []
+    skipped = []
+    current = None
+    full = False
+    for path, text in sources:
+        pairs = extract_pairs(path, text)
+        if not pairs:
+            continue
+        if full:
+            skipped.append(path)
+            continue
+        lines = text.splitlines()
+        header = f"=== FILE: {path} ===\n"
+        for pair in pairs:
+            block = render_pair(pair, lines)
+            tokens = estimate_tokens(header + block) + 2
+            if current is None or current["estimated_tokens"] + tokens > budget or len(current["pairs"]) == per_prompt:
+                if len(chunks) == max_chunks:
+                    full = True
+                    skipped.append(path)
+                    break
+                current = {"index": len(chunks), "files": [], "parts": [], "estimated_tokens": 0, "pairs": {}}
+                chunks.append(current)
+            if path not in current["files"]:
+                current["files"].append(path)
+                current["parts"].append("\n" + header)
+            pair_id = f"P{len(current['pairs']) + 1}"
+            current["pairs"][pair_id] = pair
+            current["parts"].append(f"[{pair_id}] {block}")
+            current["estimated_tokens"] += tokens
+    for chunk in chunks:
+        chunk["text"] = "".join(chunk.pop("parts")).lstrip("\n")
+    return chunks, skipped
+
+
+def _pair_at(pairs, file_path, line_number):
+    """ The pair whose comment covers file_path:line_number, for answers that left out pair_id """
+    try:
+        line_number = int(line_number)
+    except (TypeError, ValueError):
+        return None
+    for pair in pairs.values():
+        if pair["file_path"] == file_path and pair["line"] <= line_number <= pair["end_line"]:
+            return pair
+    return None
+
+
+def resolve_issues(chunk, result, issues_key="issues"):
+    """
+    Tie the issues of a chunk's answer back to its pairs: file_path,
+    line_number, comment_type and actual_comment come from the pair, not the
+    model. Issues that match no pair are dropped.
+    """
+    if not isinstance(result, dict) or "error" in result:
+        return result
+    pairs = chunk["pairs"]
+    issues = []
+    for issue in result.get(issues_key) or []:
+        if not isinstance(issue, dict):
+            continue
+        pair = pairs.get(str(issue.get("pair_id") or "").strip("[] ")) \
+            or _pair_at(pairs, issue.get("file_path"), issue.get("line_number"))
+        if pair is None:
+            continue
+        issue = {name: value for name, value in issue.items() if name != "pair_id"}
+        issue.update({
+            "file_path": pair["file_path"],
+            "line_number": pair["line"],
+            "comment_type": pair["type"],
+            "actual_comment": pair["comment"],
+        })
+        issues.append(issue)
+    return {**result, issues_key: issues}
@@ -0,0 +1,225 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from urllib.parse import parse_qs, urlparse
+
+from app.config import cache_dir
+from app.utils.github_client import github_get
+from app.utils.repo_snapshot import resolve_head_sha
+
+COMMIT_PAGE_SIZE = 100
+
+_refresh_locks = {}
+_refresh_locks_guard = threading.Lock()
+
+
+class CommitIndexError(Exception):
+    """ Raised when GitHub cannot be read while filling the index """
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CommitIndex:
+    """
+    Persistent per-repository index of commits (author, sha, timestamp,
+    message, stats and the raw GitHub payload), stored in SQLite under
+    SAAT_CACHE_DIR/commits. It is filled incrementally from the head commit
+    back to already indexed commits, and checked against GitHub's count of
+    commits reachable from the head, so pages and exact per-author totals
+    are local queries.
+    """
+
+    def __init__(self, owner, repo):
+        self.owner = owner
+        self.repo = repo
+        self.path = os.path.join(cache_dir("commits"), f"{owner.lower()}__{repo.lower()}.sqlite3")
+        with closing(self._connect()) as conn:
+            conn.executescript(
+                "CREATE TABLE IF NOT EXISTS commits ("
+                " sha TEXT PRIMARY KEY,"
+                " author_login TEXT,"
+                " author_name TEXT,"
+                " author_email TEXT,"
+                " committed_at TEXT NOT NULL,"
+                " message TEXT,"
+                " additions INTEGER,"
+                " deletions INTEGER,"
+                " payload TEXT NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS commits_author ON commits (author_login, committed_at DESC);"
+                "CREATE INDEX IF NOT EXISTS commits_date ON commits (committed_at DESC);"
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);"
+            )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def has_commit(self, sha):
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT 1 FROM commits WHERE sha = ?", (sha,)).fetchone() is not None
+
+    def refresh(self):
+        """
+        Bring the index up to date with the default branch. Costs one
+        (ETag-cached) HEAD lookup when nothing changed. Otherwise the history
+        is listed from the new head back to the first page of already indexed
+        commits, and the indexed count is checked against GitHub's. When
+        they differ (older branches merged in, history force-pushed), the
+        whole history is listed again and commits no longer in it are dropped.
+        Returns the number of commits added.
+        """
+        key = self.path
+        with _refresh_locks_guard:
+            lock = _refresh_locks.setdefault(key, threading.Lock())
+        with lock:
+            head_sha = resolve_head_sha(self.owner, self.repo)
+            if self._get_meta("head_sha") == head_sha:
+                return 0
+
+            added, _ = self._walk(head_sha, stop_at_known=True)
+            if self.count() != self._remote_count(head_sha):
+                more, reachable = self._walk(head_sha, stop_at_known=False)
+                added += more
+                self._prune(reachable)
+
+            self._set_meta("head_sha", head_sha)
+            self._set_meta("synced_at", str(time.time()))
+            return added
+
+    def _walk(self, head_sha, stop_at_known):
+        """
+        Store the commits reachable from head_sha, newest first. With
+        stop_at_known, stop after the first page that adds nothing new.
+        Returns (commits added, SHAs listed).
+        """
+        params = {"per_page": COMMIT_PAGE_SIZE, "sha": head_sha}
+        endpoint = f"/repos/{self.owner}/{self.repo}/commits"
+        added = 0
+        listed = set()
+        while endpoint:
+            # Pages are stored here, so the response cache would only hold a second copy.
+            response = github_get(endpoint, params=params, use_cache=False)
+            if response.status_code == 409:
+                break  # Empty repository
+            if not response.ok:
+                raise CommitIndexError(f"GitHub API error: {response.status_code}", response.status_code)
+            commits = response.json()
+            new = self._store(commits)
+            added += new
+            listed.update(item["sha"] for item in commits)
+            if stop_at_known and not new:
+                break
+            # The next link already carries every query parameter.
+            endpoint = response.links.get("next", {}).get("url")
+            params = None
+        return added, listed
+
+    def _remote_count(self, head_sha):
+        """ Commits reachable from head_sha: the last page number of a one-per-page listing """
+        response = github_get(
+            f"/repos/{self.owner}/{self.repo}/commits", params={"sha": head_sha, "per_page": 1}, use_cache=False
+        )
+        if response.status_code == 409:
+            return 0
+        if not response.ok:
+            raise CommitIndexError(f"GitHub API error: {response.status_code}", response.status_code)
+        last = response.links.get("last", {}).get("url")
+        if not last:
+            return len(response.json())
+        return int(parse_qs(urlparse(last).query)["page"][0])
+
+    def _prune(self, reachable):
+        """ Drop indexed commits that are no longer in the history (force pushes) """
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN")
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS reachable (sha TEXT PRIMARY KEY)")
+            conn.execute("DELETE FROM reachable")
+            conn.executemany("INSERT OR IGNORE INTO reachable (sha) VALUES (?)", [(sha,) for sha in reachable])
+            conn.execute("DELETE FROM commits WHERE sha NOT IN (SELECT sha FROM reachable)")
+            conn.execute("COMMIT")
+
+    def _store(self, commits):
+        rows = []
+        for item in commits:
+            commit = item.get("commit", {})
+            author = commit.get("author") or {}
+            stats = item.get("stats") or {}
+            rows.append((
+                item["sha"],
+                (item.get("author") or {}).get("login"),
+                author.get("name"),
+                author.get("email"),
+                author.get("date") or (commit.get("committer") or {}).get("date") or "",
+                commit.get("message"),
+                stats.get("additions"),
+                stats.get("deletions"),
+                json.dumps(item),
+            ))
+        with closing(self._connect()) as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO commits (sha, author_login, author_name, author_email,"
+                " committed_at, message, additions, deletions, payload) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            return conn.total_changes - before
+
+    def _get_meta(self, key):
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        with closing(self._connect()) as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _filters(self, author_login=None, since=None, until=None):
+        clauses, args = [], []
+        if author_login:
+            clauses.append("author_login = ? COLLATE NOCASE")
+            args.append(author_login)
+        if since:
+            clauses.append("committed_at >= ?")
+            args.append(since)
+        if until:
+            clauses.append("committed_at <= ?")
+            args.append(until)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+    def count(self, author_login=None, since=None, until=None):
+        where, args = self._filters(author_login, since, until)
+        with closing(self._connect()) as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM commits{where}", args).fetchone()[0]
+
+    def page(self, author_login=None, page=1, per_page=10, since=None, until=None):
+        """ Newest-first page of raw GitHub commit payloads """
+        where, args = self._filters(author_login, since, until)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT payload FROM commits{where} ORDER BY committed_at DESC LIMIT ? OFFSET ?",
+                args + [per_page, (max(page, 1) - 1) * per_page],
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def fill_stats(self, commits):
+        """ Fetch additions / deletions for commits that do not have them yet (in place) """
+        for item in commits:
+            if item.get("stats"):
+                continue
+            response = github_get(f"/repos/{self.owner}/{self.repo}/commits/{item['sha']}", use_cache=False)
+            if not response.ok:
+                continue
+            stats = response.json().get("stats") or {}
+            item["stats"] = stats
+            with closing(self._connect()) as conn:
+                conn.execute(
+                    "UPDATE commits SET additions = ?, deletions = ?, payload = ? WHERE sha = ?",
+                    (stats.get("additions"), stats.get("deletions"), json.dumps(item), item["sha"]),
+                )
+        return commits
@@ -0,0 +1,247 @@
+import os
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils.blob_store import get_blob_store
+from app.utils.github_api import fetch_repo_tree
+from app.utils.github_client import github_get, parse_repo_url
+from app.utils.llm_usage import bind_usage_context
+from app.utils.naming_engine import EXCLUDED_DIRS, GENERATED_SUFFIXES, language_for
+from app.utils.repo_snapshot import get_snapshot
+
+# Source tokens per Gemini call; prompt instructions and the answer come on top.
+CONTEXT_CHUNK_TOKENS = int(os.getenv("CONTEXT_CHUNK_TOKENS", "60000"))
+# Files that do not fit in this many chunks are left out (lowest ranked first).
+CONTEXT_MAX_CHUNKS = int(os.getenv("CONTEXT_MAX_CHUNKS", "12"))
+CONTEXT_MAX_WORKERS = int(os.getenv("CONTEXT_MAX_WORKERS", "4"))
+CONTEXT_MAX_FILE_BYTES = int(os.getenv("CONTEXT_MAX_FILE_BYTES", str(256 * 1024)))
+# Rough size of a token for code; only used to pack chunks, usage comes from Gemini.
+CHARS_PER_TOKEN = 4
+
+_TEST_MARKERS = ("/test/", "/tests/", "/__tests__/", "/spec/")
+_ENTRY_STEMS = {"main", "app", "index", "server", "__init__", "run", "manage"}
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def is_packable(path, size=None):
+    """ Source files worth showing the model: no vendored, generated, binary or huge files """
+    if size is not None and size > CONTEXT_MAX_FILE_BYTES:
+        return False
+    if path.endswith(GENERATED_SUFFIXES):
+        return False
+    if any(part in EXCLUDED_DIRS for part in path.split("/")[:-1]):
+        return False
+    return language_for(path) is not None
+
+
+def relevance(path, size):
+    """
+    Sort key, most relevant first: application code before tests, shallow
+    entry points before deeply nested helpers, then larger files first.
+    """
+    lowered = "/" + path.lower()
+    name = posixpath.basename(lowered)
+    is_test = any(marker in lowered for marker in _TEST_MARKERS) or name.startswith("test_") \
+        or ".test." in name or ".spec." in name or name.endswith("_test.py")
+    stem = os.path.splitext(name)[0]
+    return (is_test, stem not in _ENTRY_STEMS, path.count("/"), -(size or 0), path)
+
+
+def _decode(data):
+    """ Text of a file, or None for binary content """
+    if b"\0" in data[:8192]:
+        return None
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+
+def _fetch_blob(owner, repo, sha):
+    store = get_blob_store()
+    data = store.get(sha)
+    if data is None:
+        response = github_get(
+            f"/repos/{owner}/{repo}/git/blobs/{sha}",
+            headers={"Accept": "application/vnd.github.raw"},
+            use_cache=False,  # Kept in the blob store instead
+        )
+        if not response.ok:
+            return None
+        data = response.content
+        store.put(data, sha)
+    return data
+
+
+def load_sources(repo_url, sha=None, paths=None):
+    """
+    Return [(path, text)] for every packable source file of the repository
+    (or only those in paths), read from a local snapshot, or blob by blob
+    through the API (and the blob store) when no snapshot can be made.
+    """
+    owner, repo = parse_repo_url(repo_url)
+    try:
+        snapshot = get_snapshot(owner, repo, sha)
+        candidates = [(path, info.get("size")) for path, info in snapshot.files() if is_packable(path, info.get("size"))]
+        read = snapshot.read_file
+    except Exception as e:
+        print(f"No snapshot for {owner}/{repo}, reading blobs instead: {e}")
+        _, _, entries = fetch_repo_tree(owner, repo, sha)
+        blob_shas = {entry["path"]: entry["sha"] for entry in entries if entry["type"] == "blob"}
+        candidates = [
+            (entry["path"], entry.get("size")) for entry in entries
+            if entry["type"] == "blob" and is_packable(entry["path"], entry.get("size"))
+        ]
+        read = lambda path: _fetch_blob(owner, repo, blob_shas[path])
+
+    if paths is not None:
+        wanted = set(paths)
+        candidates = [candidate for candidate in candidates if candidate[0] in wanted]
+    candidates.sort(key=lambda candidate: relevance(*candidate))
+    with ThreadPoolExecutor(max_workers=CONTEXT_MAX_WORKERS) as executor:
+        contents = executor.map(read, [path for path, _ in candidates])
+        sources = []
+        for (path, _), data in zip(candidates, contents):
+            text = _decode(data) if data is not None else None
+            if text and text.strip():
+                sources.append((path, text))
+    return sources
+
+
+def _render(path, lines, first_line):
+    """ A file (or part of one) with line numbers, so findings can cite them """
+    numbered = "\n".join(f"{number}| {line}" for number, line in enumerate(lines, start=first_line))
+    return f"=== FILE: {path} ===\n{numbered}\n"
+
+
+def _split(path, text, budget):
+    """ Render a file as one block, or as several line ranges when it exceeds the budget """
+    lines = text.splitlines()
+    block = _render(path, lines, 1)
+    if estimate_tokens(block) <= budget:
+        return [block]
+    blocks = []
+    start = 0
+    while start < len(lines):
+        end = start
+        size = 0
+        while end < len(lines) and (end == start or size + estimate_tokens(lines[end]) + 2 <= budget):
+            size += estimate_tokens(lines[end]) + 2
+            end += 1
+        blocks.append(_render(path, lines[start:end], start + 1))
+        start = end
+    return blocks
+
+
+def pack_chunks(sources, budget=None, max_chunks=None):
+    """
+    Pack ranked (path, text) sources into chunks of at most `budget`
+    estimated tokens. Returns (chunks, skipped_paths); each chunk is
+    {"index", "files", "text", "estimated_tokens"}.
+    """
+    budget = budget or CONTEXT_CHUNK_TOKENS
+    max_chunks = max_chunks or CONTEXT_MAX_CHUNKS
+    chunks = []
+    skipped = []
+    current = None
+    for path, text in sources:
+        blocks = _split(path, text, budget)
+        for block in blocks:
+            tokens = estimate_tokens(block)
+            if current is None or current["estimated_tokens"] + tokens > budget:
+                if len(chunks) == max_chunks:
+                    current = None
+                    break
+                current = {"index": len(chunks), "files": [], "parts": [], "estimated_tokens": 0}
+                chunks.append(current)
+            if path not in current["files"]:
+                current["files"].append(path)
+            current["parts"].append(block)
+            current["estimated_tokens"] += tokens
+        if current is None:
+            skipped.append(path)
+    for chunk in chunks:
+        chunk["text"] = "\n".join(chunk.pop("parts"))
+    return chunks, skipped
+
+
+def pack_paths(paths, budget=None):
+    """ Pack a repository's file list (paths only, no contents) into chunks like pack_chunks """
+    budget = budget or CONTEXT_CHUNK_TOKENS
+    chunks = []
+    current = None
+    for path in paths:
+        tokens = estimate_tokens(path) + 1
+        if current is None or current["estimated_tokens"] + tokens > budget:
+            current = {"index": len(chunks), "files": [], "estimated_tokens": 0}
+            chunks.append(current)
+        current["files"].append(path)
+        current["estimated_tokens"] += tokens
+    for chunk in chunks:
+        chunk["text"] = "\n".join(chunk["files"])
+    return chunks
+
+
+def map_chunks(chunks, run_chunk, max_workers=None):
+    """
+    Run run_chunk(chunk) -> (result, usage) over every chunk with bounded
+    concurrency. Returns [(chunk, result, usage, error)] in chunk order.
+    """
+    def run(chunk):
+        try:
+            result, usage = run_chunk(chunk)
+            return chunk, result, usage, None
+        except Exception as e:
+            return chunk, None, None, str(e)
+
+    if not chunks:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers or CONTEXT_MAX_WORKERS, len(chunks))) as executor:
+        return list(executor.map(bind_usage_context(run), chunks))
+
+
+def reduce_results(mapped, issues_key, issue_identity, ok_status, failed_status):
+    """
+    Merge per-chunk results into the stored schema: {"status": ok_status} or
+    {"status": failed_status, issues_key: [...]}, with duplicate issues
+    (same issue_identity) dropped and per-chunk token usage under "usage".
+    Fails as a whole ({"error", "usage"}) when any chunk failed: a partial
+    result would read as clean for the files of the failed chunks, and be
+    cached or merged as such.
+    """
+    issues = []
+    seen = set()
+    usage = []
+    errors = []
+    for chunk, result, chunk_usage, error in mapped:
+        if error is None and isinstance(result, dict) and "error" in result:
+            error = result["error"]
+        usage.append({
+            "chunk": chunk["index"],
+            "files": len(chunk["files"]),
+            "estimated_tokens": chunk["estimated_tokens"],
+            **(chunk_usage or {}),
+            **({"error": error} if error else {}),
+        })
+        if error:
+            errors.append(error)
+            continue
+        for issue in result.get(issues_key) or []:
+            identity = issue_identity(issue)
+            if identity not in seen:
+                seen.add(identity)
+                issues.append(issue)
+
+    if errors:
+        return {"error": f"{len(errors)} of {len(mapped)} chunks failed: {errors[0]}", "usage": {"chunks": usage}}
+
+    totals = {
+        name: sum(entry.get(name) or 0 for entry in usage)
+        for name in ("prompt_tokens", "output_tokens", "total_tokens")
+    }
+    result = {"status": failed_status, issues_key: issues} if issues else {"status": ok_status}
+    result["usage"] = {"chunks": usage, **totals}
+    return result
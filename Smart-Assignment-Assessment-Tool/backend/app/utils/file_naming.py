@@ -0,0 +1,174 @@
+import bisect
+import os
+import re
+
+from app.utils.github_api import fetch_repo_tree
+from app.utils.naming_engine import EXCLUDED_DIRS, NAMING_ENGINE
+
+# "local" applies the rules below; "gemini" keeps the old LLM check.
+FILE_NAMING_ENGINE = os.getenv("FILE_NAMING_ENGINE", NAMING_ENGINE).lower()
+
+SNAKE = r"_{0,2}[a-z0-9]+(?:_[a-z0-9]+)*_{0,2}"
+CAMEL = r"[a-z][a-zA-Z0-9]*"
+PASCAL = r"[A-Z][a-zA-Z0-9]*"
+KEBAB = r"[a-z0-9]+(?:-[a-z0-9]+)*"
+LOWER_SEPARATED = r"[a-z0-9]+(?:[-_.@][a-z0-9]+)*"
+# Next.js routes: [id].js, [...slug].tsx, [[...path]].jsx
+DYNAMIC_ROUTE = r"\[\[?(?:\.\.\.)?[A-Za-z0-9_]+\]\]?"
+# Framework entry points that are lowercase by convention.
+ENTRY_NAMES = r"index|main|page|layout|loading|error|route|template|default|not-found|global-error|middleware|_app|_document|_error"
+JS_SUFFIXES = r"(?:\.(?:test|spec|stories|config|module|d|setup|mock))?"
+
+ROOT_DOCS = {
+    "README", "CONTRIBUTING", "CHANGELOG", "LICENSE", "LICENCE", "CODE_OF_CONDUCT", "SECURITY",
+    "AUTHORS", "NOTICE", "HISTORY", "SUPPORT", "CODEOWNERS", "TODO", "INSTALL", "MAINTAINERS",
+}
+STANDARD_FILES = {
+    "Dockerfile", "Makefile", "Procfile", "Pipfile", "Pipfile.lock", "Gemfile", "Gemfile.lock",
+    "Jenkinsfile", "Vagrantfile", "CMakeLists.txt", "Rakefile", "Brewfile", "Caddyfile",
+    "LICENSE", "LICENCE", "NOTICE", "AUTHORS", "CODEOWNERS", "OWNERS",
+}
+ALLOWED_HIDDEN = re.compile(
+    r"^\.(?:gitignore|gitattributes|gitkeep|gitmodules|dockerignore|editorconfig|env(?:\..+)?|npmrc|nvmrc|yarnrc(?:\.yml)?|"
+    r"babelrc(?:\..+)?|eslintrc(?:\..+)?|eslintignore|prettierrc(?:\..+)?|prettierignore|stylelintrc(?:\..+)?|"
+    r"browserslistrc|flake8|pylintrc|coveragerc|python-version|ruby-version|node-version|tool-versions|"
+    r"travis\.yml|htaccess|firebaserc|vercelignore|gcloudignore|slugignore|clang-format|clang-tidy|"
+    r"pre-commit-config\.yaml|markdownlint(?:\..+)?|huskyrc(?:\..+)?|lintstagedrc(?:\..+)?|swcrc|npmignore|DS_Store)$"
+)
+
+ASSET_EXTENSIONS = "png|jpe?g|gif|svg|webp|ico|bmp|avif|ttf|otf|woff2?|eot|mp3|mp4|wav|ogg|webm|mov"
+CONFIG_EXTENSIONS = "json|ya?ml|toml|ini|cfg|conf|properties"
+
+# (name, pattern matched against the file name, valid-name pattern, reason).
+# The first rule whose file pattern matches decides; the order matters.
+RULES = [
+    ("python_test", r"(?:test_.+|.+_test)\.py", rf"{SNAKE}\.py",
+     "Python test files should be snake_case: test_*.py or *_test.py"),
+    ("python", r".+\.pyi?", rf"{SNAKE}\.pyi?",
+     "Python modules should be lowercase snake_case, e.g. data_processor.py"),
+    ("react_component", r".+\.[jt]sx",
+     rf"(?:{PASCAL}|use[A-Z][a-zA-Z0-9]*|{ENTRY_NAMES}|{DYNAMIC_ROUTE}){JS_SUFFIXES}\.[jt]sx",
+     "React component files should be PascalCase, e.g. UserProfile.jsx"),
+    ("javascript", r".+\.(?:[mc]?js|ts)",
+     rf"(?:{CAMEL}|{PASCAL}|{KEBAB}|{ENTRY_NAMES}|{DYNAMIC_ROUTE}){JS_SUFFIXES}\.(?:[mc]?js|ts)",
+     "JavaScript/TypeScript modules should be camelCase (dataUtils.js) or kebab-case for config files"),
+    ("java", r".+\.java", rf"(?:{PASCAL}|package-info|module-info)\.java",
+     "Java class files should be PascalCase and match the class name, e.g. UserService.java"),
+    ("c_cpp", r".+\.(?:c|h|cpp|hpp|cc|hh|cxx|hxx)", rf"{SNAKE}\.(?:c|h|cpp|hpp|cc|hh|cxx|hxx)",
+     "C/C++ source and header files should be snake_case, e.g. string_utils.c"),
+    ("php_template", r".+\.blade\.php", rf"{LOWER_SEPARATED}\.blade\.php",
+     "Blade templates should be lowercase"),
+    ("php", r".+\.php", rf"(?:{PASCAL}|{KEBAB})\.php",
+     "PHP class files should be PascalCase (UserModel.php), other files lowercase with hyphens"),
+    ("docs", r".+\.(?:md|rst|txt|adoc)",
+     rf"(?:(?:{'|'.join(sorted(ROOT_DOCS))})|{LOWER_SEPARATED})\.(?:md|rst|txt|adoc)",
+     "Documentation files should be uppercase for main docs (README.md) or lowercase with separators"),
+    ("asset", rf".+\.(?:{ASSET_EXTENSIONS})", rf"{LOWER_SEPARATED}\.(?:{ASSET_EXTENSIONS})",
+     "Asset files should be lowercase with hyphens, e.g. hero-image.png"),
+    ("config", rf".+\.(?:{CONFIG_EXTENSIONS})", rf"{LOWER_SEPARATED}\.(?:{CONFIG_EXTENSIONS})",
+     "Config files should be lowercase with separators (_, -, .)"),
+]
+
+# One alternation classifies every name in a single regex pass; the winning
+# group tells which rule applies.
+_CLASSIFIER = re.compile(
+    "^(?:" + "|".join(f"(?P<{name}>{pattern})" for name, pattern, _, _ in RULES) + ")$",
+    re.MULTILINE,
+)
+# For each rule, one multiline pattern that matches only the names breaking it.
+_VIOLATIONS = {
+    name: re.compile(rf"^(?!(?:{valid})$)[^\n]*$", re.MULTILINE)
+    for name, _, valid, _ in RULES
+}
+_REASONS = {name: reason for name, _, _, reason in RULES}
+_JAVA_PACKAGE_SEGMENT = re.compile(r"^[a-z][a-z0-9_]*$")
+
+
+def _line_numbers(text):
+    starts = [0] + [match.end() for match in re.finditer("\n", text)]
+    return lambda offset: bisect.bisect_right(starts, offset) - 1
+
+
+def _general_reason(path, name):
+    """ Rules that apply to every file regardless of language """
+    if " " in name:
+        return "File names should not contain spaces"
+    if name.startswith("."):
+        if ALLOWED_HIDDEN.match(name) or path.startswith((".github/", ".vscode/", ".husky/", ".devcontainer/")):
+            return None
+        return "Hidden files (starting with '.') should only be system or config files"
+    stem, dot, extension = name.partition(".")
+    if stem.upper() in ROOT_DOCS and stem != stem.upper() and extension.lower() in ("", "md", "rst", "txt"):
+        return f"Main documentation files should be uppercase, e.g. {stem.upper()}{dot}{extension}"
+    return None
+
+
+def _java_package_reason(path):
+    """ Package directories below src/.../java/ must be lowercase """
+    parts = path.split("/")[:-1]
+    if "java" not in parts:
+        return None
+    for segment in parts[parts.index("java") + 1:]:
+        if not _JAVA_PACKAGE_SEGMENT.match(segment):
+            return f"Java package directory '{segment}' should be lowercase, e.g. com/example/project"
+    return None
+
+
+def check_file_names(paths):
+    """
+    Check every file path of a repository tree against the per-language file
+    naming rules. Returns {"status": "Yes"} or
+    {"status": "No", "invalid_files": [{"file_name", "path", "reason"}]}.
+    """
+    paths = [
+        path for path in paths
+        if "\n" not in path and not any(part in EXCLUDED_DIRS for part in path.split("/")[:-1])
+    ]
+    names = [path.rsplit("/", 1)[-1] for path in paths]
+    reasons = {}
+
+    for index, (path, name) in enumerate(zip(paths, names)):
+        if name in STANDARD_FILES:
+            continue
+        reason = _general_reason(path, name)
+        if reason:
+            reasons[index] = reason
+
+    # Sort every name into its rule in one pass over the whole tree...
+    groups = {}
+    joined = "\n".join(names)
+    line_of = _line_numbers(joined)
+    for match in _CLASSIFIER.finditer(joined):
+        index = line_of(match.start())
+        # Dotfiles were already judged against the config allowlist.
+        if index not in reasons and names[index] not in STANDARD_FILES and not names[index].startswith("."):
+            groups.setdefault(match.lastgroup, []).append(index)
+
+    # ...then find each rule's violators with one pass over its names.
+    for rule, indexes in groups.items():
+        text = "\n".join(names[index] for index in indexes)
+        rule_line_of = _line_numbers(text)
+        for match in _VIOLATIONS[rule].finditer(text):
+            reasons[indexes[rule_line_of(match.start())]] = _REASONS[rule]
+        if rule == "java":
+            for index in indexes:
+                if index not in reasons:
+                    reason = _java_package_reason(paths[index])
+                    if reason:
+                        reasons[index] = reason
+
+    if not reasons:
+        return {"status": "Yes"}
+    return {
+        "status": "No",
+        "invalid_files": [
+            {"file_name": names[index], "path": paths[index], "reason": reasons[index]}
+            for index in sorted(reasons, key=lambda index: paths[index])
+        ],
+    }
+
+
+def check_file_naming_local(owner, repo, ref=None):
+    """ Run the file naming rules over the repository tree at ref (default branch head) """
+    _, _, entries = fetch_repo_tree(owner, repo, ref)
+    return check_file_names([entry["path"] for entry in entries if entry["type"] == "blob"])
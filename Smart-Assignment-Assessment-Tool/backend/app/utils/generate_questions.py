@@ -1,9 +1,4 @@
-import google.generativeai as genai
-import os
-
-# Configure Gemini API
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=GEMINI_API_KEY)
+from app.utils.llm_gateway import generate
 
 def generate_questions_gemini(assignment_description, metric_type):
     prompt = f"""
@@ -30,8 +25,7 @@ def generate_questions_gemini(assignment_description, metric_type):
     """
 
     try:
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        response = model.generate_content(prompt)
+        response = generate(prompt, caller="questions.assignment_metric")
         return response.text if response else None
     except Exception as e:
         return str(e)
@@ -65,8 +59,7 @@ def generate_questions_from_github_url(repo_url, metric_type):
     """
 
     try:
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        response = model.generate_content(prompt)
+        response = generate(prompt, caller="questions.github")
         return response.text if response else None
     except Exception as e:
         return str(e)
@@ -103,8 +96,7 @@ def generate_questions_from_report(summary, metric_type):
     """
 
     try:
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        response = model.generate_content(prompt)
+        response = generate(prompt, caller="questions.report")
         return response.text if response else None
     except Exception as e:
         return str(e)
@@ -136,8 +128,7 @@ def generate_questions_from_video(combined_text, metric_type):
     """
 
     try:
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        response = model.generate_content(prompt)
+        response = generate(prompt, caller="questions.video")
         return response.text if response else None
     except Exception as e:
         return str(e)
@@ -170,8 +161,7 @@ def generate_questions_from_assignment(description):
     """
 
     try:
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        response = model.generate_content(prompt)
+        response = generate(prompt, caller="questions.assignment")
 
         if not response or not response.text:
             print("[ERROR] No response from Gemini.")
@@ -209,8 +199,7 @@ def generate_questions_from_assignment(description):
 #Customized questions
 def generate_answer(prompt) :
     try:
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        response = model.generate_content(prompt)
+        response = generate(prompt, caller="questions.custom")
         return response.text if response else None
     except Exception as e:
         return str(e)
\ No newline at end of file
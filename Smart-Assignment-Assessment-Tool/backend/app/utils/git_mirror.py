@@ -0,0 +1,309 @@
+import base64
+import os
+import re
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import closing, contextmanager
+from datetime import datetime, timezone
+
+from app.config import cache_dir
+from app.utils.github_client import GITHUB_TOKEN, github_get
+
+try:
+    import fcntl  # Serialises fetches across gunicorn workers (POSIX only)
+except ImportError:
+    fcntl = None
+
+GIT_BINARY = shutil.which("git")
+GIT_MIRRORS_ENABLED = os.getenv("GIT_MIRRORS_ENABLED", "true").lower() == "true" and GIT_BINARY is not None
+GITHUB_GIT_BASE = os.getenv("GITHUB_GIT_BASE", "https://github.com")
+MIRROR_MAX_BYTES = int(os.getenv("MIRROR_MAX_BYTES", str(10 * 1024 ** 3)))
+MIRROR_GIT_TIMEOUT = int(os.getenv("MIRROR_GIT_TIMEOUT", "600"))
+
+WEEK_SECONDS = 7 * 24 * 3600
+# 12345+login@users.noreply.github.com or login@users.noreply.github.com
+_NOREPLY_PATTERN = re.compile(r"^(?:(\d+)\+)?([A-Za-z0-9-]+)@users\.noreply\.github\.com$", re.IGNORECASE)
+_RECORD_SEPARATOR = "\x1e"
+_FIELD_SEPARATOR = "\x1f"
+
+
+class MirrorError(Exception):
+    """ Raised when a repository cannot be mirrored or read with git """
+
+
+def _git_env():
+    env = dict(os.environ, GIT_TERMINAL_PROMPT="0")
+    if GITHUB_TOKEN:
+        # Passed through the environment so the token never shows up in `ps`.
+        credentials = base64.b64encode(f"x-access-token:{GITHUB_TOKEN}".encode()).decode()
+        env.update({
+            "GIT_CONFIG_COUNT": "1",
+            "GIT_CONFIG_KEY_0": "http.extraHeader",
+            "GIT_CONFIG_VALUE_0": f"Authorization: Basic {credentials}",
+        })
+    return env
+
+
+def _git(args, cwd=None):
+    try:
+        result = subprocess.run(
+            [GIT_BINARY, *args],
+            cwd=cwd,
+            env=_git_env(),
+            capture_output=True,
+            timeout=MIRROR_GIT_TIMEOUT,
+        )
+    except subprocess.TimeoutExpired:
+        raise MirrorError(f"git {args[0]} timed out")
+    if result.returncode != 0:
+        raise MirrorError(f"git {args[0]} failed: {result.stderr.decode(errors='replace').strip()}")
+    return result.stdout
+
+
+_key_locks = {}
+_key_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _mirror_lock(key):
+    """ One clone / fetch per repository across threads and worker processes """
+    with _key_locks_guard:
+        thread_lock = _key_locks.setdefault(key, threading.Lock())
+    with thread_lock:
+        if fcntl is None:
+            yield
+            return
+        lock_path = os.path.join(cache_dir("mirrors/.locks"), key)
+        with open(lock_path, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class Mirror:
+    """
+    Bare clone of a GitHub repository's branches under SAAT_CACHE_DIR/mirrors,
+    kept current with incremental `git fetch`.
+    """
+
+    def __init__(self, owner, repo):
+        self.owner = owner
+        self.repo = repo
+        self.key = f"{owner.lower()}__{repo.lower()}"
+        self.path = os.path.join(cache_dir("mirrors"), f"{self.key}.git")
+        self.url = f"{GITHUB_GIT_BASE}/{owner}/{repo}.git"
+
+    def has_commit(self, sha):
+        if not os.path.isdir(self.path):
+            return False
+        try:
+            _git(["cat-file", "-e", f"{sha}^{{commit}}"], cwd=self.path)
+            return True
+        except MirrorError:
+            return False
+
+    def sync(self, sha=None):
+        """ Clone on first use, otherwise fetch; nothing happens when sha is already present """
+        if sha and self.has_commit(sha):
+            os.utime(self.path)
+            return
+        with _mirror_lock(self.key):
+            if sha and self.has_commit(sha):
+                return
+            if os.path.isdir(self.path):
+                _git(["fetch", "--prune", "--no-tags", "--quiet", "origin"], cwd=self.path)
+            else:
+                self._clone()
+            os.utime(self.path)
+        if sha and not self.has_commit(sha):
+            raise MirrorError(f"Commit {sha} not found in {self.owner}/{self.repo}")
+        evict_mirrors()
+
+    def _clone(self):
+        # Cloned next to the final path and renamed, so readers never see half a mirror.
+        tmp_path = tempfile.mkdtemp(dir=os.path.dirname(self.path), prefix=".tmp-")
+        try:
+            _git(["clone", "--bare", "--no-tags", "--quiet", self.url, tmp_path])
+            # Only branches: GitHub also advertises refs/pull/*, which we never read.
+            _git(["config", "remote.origin.fetch", "+refs/heads/*:refs/heads/*"], cwd=tmp_path)
+            os.rename(tmp_path, self.path)
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+    def log_numstat(self, sha):
+        """ Yield (sha, author_name, author_email, timestamp, additions, deletions) per non-merge commit """
+        output = _git(
+            ["log", "--no-merges", "--numstat", "--no-renames",
+             f"--format={_RECORD_SEPARATOR}%H{_FIELD_SEPARATOR}%an{_FIELD_SEPARATOR}%ae{_FIELD_SEPARATOR}%at", sha],
+            cwd=self.path,
+        ).decode("utf-8", errors="replace")
+
+        for record in output.split(_RECORD_SEPARATOR)[1:]:
+            header, _, numstat = record.partition("\n")
+            commit_sha, name, email, timestamp = header.split(_FIELD_SEPARATOR)
+            additions = deletions = 0
+            for line in numstat.splitlines():
+                parts = line.split("\t", 2)
+                # Binary files show "-" instead of line counts.
+                if len(parts) == 3 and parts[0].isdigit() and parts[1].isdigit():
+                    additions += int(parts[0])
+                    deletions += int(parts[1])
+            yield commit_sha, name, email, int(timestamp), additions, deletions
+
+
+class AuthorDirectory:
+    """
+    Maps commit e-mail addresses to GitHub accounts. noreply addresses are
+    decoded directly; any other address costs one commit lookup, cached in
+    SQLite so it is only ever asked once.
+    """
+
+    def __init__(self):
+        self.path = os.path.join(cache_dir("mirrors"), "authors.sqlite3")
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS authors ("
+                " email TEXT PRIMARY KEY, login TEXT, id INTEGER, avatar_url TEXT, html_url TEXT)"
+            )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def resolve(self, owner, repo, email, commit_sha):
+        email = email.lower()
+        match = _NOREPLY_PATTERN.match(email)
+        if match:
+            user_id, login = match.groups()
+            return _account(login, int(user_id) if user_id else None)
+
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT login, id, avatar_url, html_url FROM authors WHERE email = ?", (email,)
+            ).fetchone()
+        if row is not None:
+            return _account(*row) if row[0] else None
+
+        response = github_get(f"/repos/{owner}/{repo}/commits/{commit_sha}", use_cache=False)
+        if not response.ok:
+            return None  # Not cached: the lookup may succeed next time
+        author = response.json().get("author") or {}
+        row = (email, author.get("login"), author.get("id"), author.get("avatar_url"), author.get("html_url"))
+        with closing(self._connect()) as conn:
+            conn.execute("INSERT OR REPLACE INTO authors VALUES (?, ?, ?, ?, ?)", row)
+        return _account(*row[1:]) if row[1] else None
+
+
+def _account(login, user_id=None, avatar_url=None, html_url=None):
+    if not avatar_url and user_id:
+        avatar_url = f"https://avatars.githubusercontent.com/u/{user_id}?v=4"
+    return {
+        "login": login,
+        "id": user_id,
+        "avatar_url": avatar_url,
+        "html_url": html_url or f"https://github.com/{login}",
+        "type": "User",
+    }
+
+
+def _week_start(timestamp):
+    """ Sunday 00:00 UTC of the timestamp's week, as GitHub buckets its statistics """
+    day = datetime.fromtimestamp(timestamp, tz=timezone.utc)
+    midnight = int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp())
+    return midnight - ((day.weekday() + 1) % 7) * 24 * 3600
+
+
+def contributor_stats_from_mirror(owner, repo, sha):
+    """
+    Compute what GitHub's /stats/contributors returns (per author: total
+    commits and weekly commits / additions / deletions) from a local mirror at
+    commit sha. Commits whose author has no GitHub account are left out, like
+    GitHub does.
+    """
+    mirror = Mirror(owner, repo)
+    mirror.sync(sha)
+    directory = AuthorDirectory()
+
+    emails = {}
+    per_author = {}
+    first_week = last_week = None
+    for commit_sha, _, email, timestamp, additions, deletions in mirror.log_numstat(sha):
+        email = email.lower()
+        if email not in emails:
+            emails[email] = directory.resolve(owner, repo, email, commit_sha)
+        account = emails[email]
+        if account is None:
+            continue
+
+        week = _week_start(timestamp)
+        first_week = week if first_week is None else min(first_week, week)
+        last_week = week if last_week is None else max(last_week, week)
+
+        entry = per_author.setdefault(account["login"].lower(), {"author": account, "total": 0, "weeks": {}})
+        bucket = entry["weeks"].setdefault(week, {"w": week, "a": 0, "d": 0, "c": 0})
+        bucket["a"] += additions
+        bucket["d"] += deletions
+        bucket["c"] += 1
+        entry["total"] += 1
+
+    # Every contributor gets the same contiguous range of weeks, zeros included.
+    stats = []
+    for entry in per_author.values():
+        weeks = [
+            entry["weeks"].get(week, {"w": week, "a": 0, "d": 0, "c": 0})
+            for week in range(first_week, last_week + 1, WEEK_SECONDS)
+        ]
+        stats.append({"author": entry["author"], "total": entry["total"], "weeks": weeks})
+    return stats
+
+
+def _directory_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+def evict_mirrors():
+    """ Remove least recently used mirrors until they fit in MIRROR_MAX_BYTES """
+    base = cache_dir("mirrors")
+    mirrors = []
+    for name in os.listdir(base):
+        path = os.path.join(base, name)
+        if name.startswith(".") or not name.endswith(".git") or not os.path.isdir(path):
+            continue  # Locks, clones in progress and the author directory
+        try:
+            mirrors.append((os.stat(path).st_mtime, _directory_size(path), name[:-4], path))
+        except OSError:
+            continue
+
+    total = sum(size for _, size, _, _ in mirrors)
+    for _, size, key, path in sorted(mirrors):
+        if total <= MIRROR_MAX_BYTES:
+            break
+        with _mirror_lock(key):
+            shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+
+def mirror_stats():
+    base = cache_dir("mirrors")
+    names = [name for name in os.listdir(base) if name.endswith(".git") and not name.startswith(".")]
+    return {
+        "enabled": GIT_MIRRORS_ENABLED,
+        "mirrors": len(names),
+        "bytes": sum(_directory_size(os.path.join(base, name)) for name in names),
+        "max_bytes": MIRROR_MAX_BYTES,
+    }
@@ -1,10 +1,152 @@
-import requests
+import fnmatch
 import os
 
-GITHUB_API_BASE = "https://api.github.com"
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+from app.utils.github_cache import LRUCache
+from app.utils.github_client import github_get
+from app.utils.repo_snapshot import find_snapshot, resolve_head_sha
+
+TREE_CACHE_MAX_ENTRIES = int(os.getenv("TREE_CACHE_MAX_ENTRIES", "500"))
+
+# Git objects are immutable: a commit always points at the same tree and a
+# tree SHA always lists the same entries.
+_commit_trees = LRUCache(TREE_CACHE_MAX_ENTRIES * 4)
+_trees = LRUCache(TREE_CACHE_MAX_ENTRIES)
+
+
+class GitHubAPIError(Exception):
+    """ Raised when GitHub answers with an error status """
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
 
 def fetch_from_github(endpoint):
-    headers = {"Authorization": f"Bearer {GITHUB_TOKEN}"}
-    response = requests.get(f"{GITHUB_API_BASE}{endpoint}", headers=headers)
+    response = github_get(endpoint)
+    return response.json()
+
+
+def iter_commit_pages(owner, repo, author=None, since=None, until=None, sha=None):
+    """
+    Yield the repository's commits one GitHub page (up to 100) at a time,
+    following the Link headers, so only a single page is held in memory.
+    Filters map to the commits API's author / since / until / sha parameters.
+    """
+    params = {"per_page": 100}
+    for name, value in (("author", author), ("since", since), ("until", until), ("sha", sha)):
+        if value:
+            params[name] = value
+    endpoint = f"/repos/{owner}/{repo}/commits"
+
+    while endpoint:
+        # Not cached: a full history export would otherwise be copied into the response cache.
+        response = github_get(endpoint, params=params, use_cache=False)
+        if response.status_code == 409:
+            return  # Empty repository
+        if not response.ok:
+            raise GitHubAPIError(f"GitHub API error: {response.status_code}", response.status_code)
+        yield response.json()
+        # The next link already carries every query parameter.
+        endpoint = response.links.get("next", {}).get("url")
+        params = None
+
+
+def _get_tree(owner, repo, tree_ish, recursive):
+    params = {"recursive": 1} if recursive else None
+    response = github_get(f"/repos/{owner}/{repo}/git/trees/{tree_ish}", params=params)
+    if not response.ok:
+        raise GitHubAPIError(f"GitHub API error: {response.status_code}", response.status_code)
     return response.json()
+
+
+def _walk_tree(owner, repo, tree_sha, prefix=""):
+    """
+    Fallback for trees GitHub truncates: list one level, then fetch each
+    sub-tree recursively on its own (recursing again if that is truncated too).
+    """
+    entries = []
+    level = _get_tree(owner, repo, tree_sha, recursive=False)
+    for item in level.get("tree", []):
+        path = f"{prefix}{item['path']}"
+        entries.append({"path": path, "type": item["type"], "sha": item["sha"], "size": item.get("size")})
+        if item["type"] != "tree":
+            continue
+        subtree = _get_tree(owner, repo, item["sha"], recursive=True)
+        if subtree.get("truncated"):
+            entries.extend(_walk_tree(owner, repo, item["sha"], f"{path}/"))
+        else:
+            entries.extend(
+                {"path": f"{path}/{sub['path']}", "type": sub["type"], "sha": sub["sha"], "size": sub.get("size")}
+                for sub in subtree.get("tree", [])
+            )
+    return entries
+
+
+def fetch_repo_tree(owner, repo, ref=None):
+    """
+    Return (commit_sha, tree_sha, entries) for the whole repository in one go.
+    entries are {"path", "type" ("blob" | "tree" | "commit"), "sha", "size"}.
+    """
+    commit_sha = resolve_head_sha(owner, repo, ref)
+    tree_sha = _commit_trees.get(commit_sha)
+    if tree_sha:
+        entries = _trees.get(tree_sha)
+        if entries is not None:
+            return commit_sha, tree_sha, entries
+
+    snapshot = find_snapshot(owner, repo, commit_sha)
+    if snapshot is not None:
+        # A local snapshot already knows every path, size and blob SHA.
+        entries = [
+            {
+                "path": path,
+                "type": "blob" if info["type"] == "file" else "tree",
+                "sha": info.get("sha"),
+                "size": info.get("size"),
+            }
+            for path, info in sorted(snapshot.entries.items())
+        ]
+        return commit_sha, tree_sha, entries
+
+    tree = _get_tree(owner, repo, commit_sha, recursive=True)
+    tree_sha = tree["sha"]
+    if tree.get("truncated"):
+        entries = _walk_tree(owner, repo, tree_sha)
+    else:
+        entries = [
+            {"path": item["path"], "type": item["type"], "sha": item["sha"], "size": item.get("size")}
+            for item in tree.get("tree", [])
+        ]
+
+    _commit_trees.set(commit_sha, tree_sha)
+    _trees.set(tree_sha, entries)
+    return commit_sha, tree_sha, entries
+
+
+def filter_tree(entries, extensions=None, patterns=None, entry_type=None):
+    """ Keep entries matching any extension / glob pattern and the given type """
+    extensions = tuple(f".{ext.lstrip('.').lower()}" for ext in extensions or [])
+    result = []
+    for entry in entries:
+        if entry_type and entry["type"] != entry_type:
+            continue
+        if extensions and not entry["path"].lower().endswith(extensions):
+            continue
+        if patterns and not any(fnmatch.fnmatchcase(entry["path"], pattern) for pattern in patterns):
+            continue
+        result.append(entry)
+    return result
+
+
+def diff_trees(owner, repo, old_ref, new_ref):
+    """
+    Files that differ between two commits, from their trees' blob SHAs:
+    returns (changed, deleted) where changed holds added and modified paths.
+    """
+    _, _, old_entries = fetch_repo_tree(owner, repo, old_ref)
+    _, _, new_entries = fetch_repo_tree(owner, repo, new_ref)
+    old_blobs = {entry["path"]: entry["sha"] for entry in old_entries if entry["type"] == "blob"}
+    new_blobs = {entry["path"]: entry["sha"] for entry in new_entries if entry["type"] == "blob"}
+    changed = sorted(path for path, sha in new_blobs.items() if old_blobs.get(path) != sha)
+    deleted = sorted(path for path in old_blobs if path not in new_blobs)
+    return changed, deleted
@@ -0,0 +1,202 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from app.config import cache_dir
+
+GITHUB_CACHE_BACKEND = os.getenv("GITHUB_CACHE_BACKEND", "memory")  # memory | disk | none
+GITHUB_CACHE_MAX_ENTRIES = int(os.getenv("GITHUB_CACHE_MAX_ENTRIES", "5000"))
+# Total size of the cached bodies, and the largest body worth caching at all.
+GITHUB_CACHE_MAX_BYTES = int(os.getenv("GITHUB_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+GITHUB_CACHE_MAX_BODY_BYTES = int(os.getenv("GITHUB_CACHE_MAX_BODY_BYTES", str(1024 * 1024)))
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU map with a bounded number of entries and,
+    when max_bytes and size_of(value) are given, a bounded total size.
+    Keeps hit / miss / eviction counters for the metrics endpoint.
+    """
+
+    def __init__(self, max_entries, max_bytes=None, size_of=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_of = size_of
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def set(self, key, value):
+        size = self.size_of(value) if self.size_of else 0
+        with self._lock:
+            self._pop(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._entries[key] = value
+            self._sizes[key] = size
+            self.bytes += size
+            while len(self._entries) > self.max_entries or (self.max_bytes is not None and self.bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._pop(oldest)
+                self.evictions += 1
+
+    def _pop(self, key):
+        if key in self._entries:
+            del self._entries[key]
+            self.bytes -= self._sizes.pop(key)
+
+    def delete(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class DiskResponseCache:
+    """
+    SQLite-backed response cache shared by every gunicorn worker on the host.
+    Entries are evicted least-recently-used once max_entries or max_bytes
+    (total body size) is exceeded. Hit / miss counters are per process.
+    """
+
+    def __init__(self, path, max_entries, max_bytes=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._counter_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " entry TEXT NOT NULL,"
+                " body BLOB NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name, amount=1):
+        with self._counter_lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def get(self, key):
+        conn = self._connect()
+        row = conn.execute("SELECT entry, body FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._count("misses")
+            return None
+        conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        self._count("hits")
+        entry = json.loads(row[0])
+        entry["body"] = bytes(row[1])
+        return entry
+
+    def set(self, key, value):
+        entry = {k: v for k, v in value.items() if k != "body"}
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, entry, body, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(entry), value["body"], time.time()),
+        )
+        overflow = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            )
+            self._count("evictions", overflow)
+        if self.max_bytes is not None:
+            excess = conn.execute("SELECT COALESCE(SUM(length(body)), 0) FROM responses").fetchone()[0] - self.max_bytes
+            if excess > 0:
+                keys = []
+                for old_key, size in conn.execute("SELECT key, length(body) FROM responses ORDER BY accessed_at"):
+                    if excess <= 0:
+                        break
+                    keys.append((old_key,))
+                    excess -= size
+                conn.executemany("DELETE FROM responses WHERE key = ?", keys)
+                self._count("evictions", len(keys))
+
+    def delete(self, key):
+        self._connect().execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def stats(self):
+        entries, size = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(length(body)), 0) FROM responses"
+        ).fetchone()
+        return {
+            "backend": "disk",
+            "path": self.path,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """
+    Return the configured GitHub response cache (GITHUB_CACHE_BACKEND),
+    or None when caching is disabled.
+    """
+    global _response_cache
+    if GITHUB_CACHE_BACKEND == "none":
+        return None
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                if GITHUB_CACHE_BACKEND == "disk":
+                    path = os.path.join(cache_dir("github"), "responses.sqlite3")
+                    _response_cache = DiskResponseCache(path, GITHUB_CACHE_MAX_ENTRIES, GITHUB_CACHE_MAX_BYTES)
+                else:
+                    _response_cache = LRUCache(
+                        GITHUB_CACHE_MAX_ENTRIES, GITHUB_CACHE_MAX_BYTES, lambda entry: len(entry["body"])
+                    )
+    return _response_cache
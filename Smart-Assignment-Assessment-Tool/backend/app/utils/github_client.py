@@ -0,0 +1,241 @@
+import os
+import threading
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+
+from app.utils.github_cache import GITHUB_CACHE_MAX_BODY_BYTES, get_response_cache
+from app.utils.github_scheduler import GitHubScheduler
+
+load_dotenv()  # Load environment variables from .env
+
+GITHUB_API_BASE = "https://api.github.com"
+GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+
+# Each gunicorn worker process gets its own pool, so it only has to cover the
+# threads of one worker (plus some headroom for background jobs).
+GUNICORN_THREADS = int(os.getenv("GUNICORN_THREADS", "1"))
+GITHUB_POOL_SIZE = int(os.getenv("GITHUB_POOL_SIZE", str(max(10, GUNICORN_THREADS * 2))))
+
+GITHUB_CONNECT_TIMEOUT = float(os.getenv("GITHUB_CONNECT_TIMEOUT", "3.05"))
+GITHUB_READ_TIMEOUT = float(os.getenv("GITHUB_READ_TIMEOUT", "20"))
+GITHUB_MAX_RETRIES = int(os.getenv("GITHUB_MAX_RETRIES", "3"))
+GITHUB_BACKOFF_FACTOR = float(os.getenv("GITHUB_BACKOFF_FACTOR", "0.5"))
+GITHUB_MAX_RETRY_AFTER = float(os.getenv("GITHUB_MAX_RETRY_AFTER", "30"))
+
+
+class GitHubRetry(Retry):
+    """
+    Retry policy for the GitHub API.
+    5xx responses are retried with exponential backoff. 403/429 are only retried
+    when GitHub signals a secondary rate limit with a Retry-After header, so
+    permission errors and an exhausted primary quota fail immediately.
+    """
+
+    RATE_LIMIT_STATUSES = frozenset({403, 429})
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if status_code in self.RATE_LIMIT_STATUSES:
+            return has_retry_after and self.total is not None and self.total > 0
+        return super().is_retry(method, status_code, has_retry_after)
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        # Never park a request thread for minutes on a long Retry-After.
+        return min(retry_after, GITHUB_MAX_RETRY_AFTER)
+
+
+def _build_session():
+    retry = GitHubRetry(
+        total=GITHUB_MAX_RETRIES,
+        connect=GITHUB_MAX_RETRIES,
+        read=GITHUB_MAX_RETRIES,
+        status=GITHUB_MAX_RETRIES,
+        backoff_factor=GITHUB_BACKOFF_FACTOR,
+        status_forcelist=(403, 429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD", "OPTIONS"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=GITHUB_POOL_SIZE,
+        pool_block=True,
+        max_retries=retry,
+    )
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    # The session is shared between threads; never let it collect cookies.
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    session.headers.update({
+        "Accept": "application/vnd.github+json",
+        "X-GitHub-Api-Version": "2022-11-28",
+        "Connection": "keep-alive",
+    })
+    if GITHUB_TOKEN:
+        session.headers["Authorization"] = f"Bearer {GITHUB_TOKEN}"
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+# Requests beyond the pool size would only queue inside urllib3 anyway.
+scheduler = GitHubScheduler(GITHUB_POOL_SIZE)
+
+
+def get_session():
+    """ Return the process-wide GitHub session, creating it on first use """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def build_url(endpoint):
+    """ Accept either an API path (/repos/...) or an absolute URL (e.g. from a Link header) """
+    if endpoint.startswith("http://") or endpoint.startswith("https://"):
+        return endpoint
+    return f"{GITHUB_API_BASE}{endpoint}"
+
+
+# Describe the encoded wire body, which no longer applies to the decoded copy we keep.
+_UNCACHED_HEADERS = frozenset({"content-encoding", "content-length", "transfer-encoding", "connection"})
+
+_not_modified = 0
+_not_modified_lock = threading.Lock()
+
+
+def _cache_key(url, params, headers):
+    query = urlencode(sorted((params or {}).items()), doseq=True)
+    accept = (headers or {}).get("Accept", "")
+    return f"{url}?{query}|{accept}"
+
+
+def _response_from_cache(entry, url, revalidation):
+    """ Rebuild a 200 response from a cache entry after GitHub answered 304 """
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response.headers = CaseInsensitiveDict(entry["headers"])
+    # Fresh rate-limit headers come from the 304 itself.
+    for name, value in revalidation.headers.items():
+        if name.lower().startswith("x-ratelimit"):
+            response.headers[name] = value
+    response._content = entry["body"]
+    response.encoding = "utf-8"
+    response.from_cache = True
+    return response
+
+
+def github_get(endpoint, params=None, headers=None, stream=False, timeout=None, use_cache=True, priority=None):
+    """
+    GET a GitHub API endpoint through the shared keep-alive connection pool.
+    Cacheable responses are revalidated with If-None-Match / If-Modified-Since;
+    a 304 is served from the response cache and does not count against the quota.
+    Pass use_cache=False for content the caller keeps itself (blobs, commit
+    pages, immutable commits); streamed responses are never cached.
+    The request waits for a scheduler slot at `priority` (default: the calling
+    thread's, see github_priority). Returns the requests.Response; callers
+    decide how to map the status code.
+    """
+    global _not_modified
+    url = build_url(endpoint)
+    cache = get_response_cache() if use_cache and not stream else None
+    if cache is not None and headers and "Range" in headers:
+        cache = None
+
+    key = entry = None
+    request_headers = dict(headers or {})
+    if cache is not None:
+        key = _cache_key(url, params, headers)
+        entry = cache.get(key)
+        if entry:
+            if entry.get("etag"):
+                request_headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                request_headers["If-Modified-Since"] = entry["last_modified"]
+
+    with scheduler.slot(priority):
+        response = get_session().get(
+            url,
+            params=params,
+            headers=request_headers,
+            stream=stream,
+            timeout=timeout or (GITHUB_CONNECT_TIMEOUT, GITHUB_READ_TIMEOUT),
+        )
+    scheduler.observe(response)
+
+    if cache is None:
+        return response
+
+    if response.status_code == 304 and entry:
+        with _not_modified_lock:
+            _not_modified += 1
+        return _response_from_cache(entry, response.url, response)
+
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    # Large bodies (blobs, big listings) would crowd everything else out of the cache.
+    if response.status_code == 200 and (etag or last_modified) and len(response.content) <= GITHUB_CACHE_MAX_BODY_BYTES:
+        cache.set(key, {
+            "etag": etag,
+            "last_modified": last_modified,
+            "headers": {
+                name: value for name, value in response.headers.items()
+                if name.lower() not in _UNCACHED_HEADERS
+            },
+            "body": response.content,
+        })
+    elif entry:
+        cache.delete(key)
+    return response
+
+
+def github_graphql(query, variables=None, timeout=None, priority=None):
+    """
+    POST a query to the GitHub GraphQL API through the shared session.
+    Returns the requests.Response; GraphQL needs a token, so callers should
+    check GITHUB_TOKEN first.
+    """
+    with scheduler.slot(priority):
+        response = get_session().post(
+            f"{GITHUB_API_BASE}/graphql",
+            json={"query": query, "variables": variables or {}},
+            timeout=timeout or (GITHUB_CONNECT_TIMEOUT, GITHUB_READ_TIMEOUT),
+        )
+    scheduler.observe(response)
+    return response
+
+
+def cache_stats():
+    """ Response cache counters plus the number of 304s served from it """
+    cache = get_response_cache()
+    stats = cache.stats() if cache is not None else {"backend": "none"}
+    stats["not_modified"] = _not_modified
+    return stats
+
+
+def parse_repo_url(repo_url):
+    """
+    Split a GitHub repository URL into (owner, repo).
+    Raises ValueError when the URL does not contain both parts.
+    """
+    parts = [part for part in repo_url.strip().rstrip('/').split('/') if part]
+    if len(parts) < 2:
+        raise ValueError("Invalid GitHub repository URL")
+    owner, repo = parts[-2], parts[-1]
+    if repo.endswith('.git'):
+        repo = repo[:-4]
+    return owner, repo
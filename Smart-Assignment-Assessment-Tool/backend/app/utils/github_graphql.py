@@ -0,0 +1,236 @@
+import os
+import threading
+
+from app.utils.github_client import GITHUB_TOKEN, github_graphql
+
+# "rest" (default) or "graphql": which backend the repo routes use for
+# repository details and contributors. GraphQL always needs GITHUB_TOKEN.
+GITHUB_BACKEND = os.getenv("GITHUB_BACKEND", "rest").lower()
+GRAPHQL_MAX_BATCH = int(os.getenv("GRAPHQL_MAX_BATCH", "25"))
+# Rate-limit points one query may cost; batches are sized to stay under it.
+GRAPHQL_TARGET_COST = float(os.getenv("GRAPHQL_TARGET_COST", "5"))
+# Commits read per repository. Contributors are only counted from them when
+# they are the whole history; otherwise callers fall back to REST.
+GRAPHQL_HISTORY_DEPTH = min(int(os.getenv("GRAPHQL_HISTORY_DEPTH", "100")), 100)
+GRAPHQL_RESERVE = float(os.getenv("GRAPHQL_RESERVE", "0.1"))
+
+REPOSITORY_FIELDS = """
+fragment RepositoryFields on Repository {
+  databaseId name nameWithOwner description url isPrivate isFork isArchived
+  createdAt updatedAt pushedAt diskUsage stargazerCount forkCount
+  owner { login avatarUrl url }
+  primaryLanguage { name }
+  issues(states: OPEN) { totalCount }
+  languages(first: 20, orderBy: {field: SIZE, direction: DESC}) { edges { size node { name } } }
+  defaultBranchRef {
+    name
+    target {
+      ... on Commit {
+        oid
+        history(first: $depth) {
+          totalCount
+          nodes {
+            oid messageHeadline message committedDate url
+            author { name email date user { login databaseId avatarUrl url } }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+
+class GraphQLError(Exception):
+    """ Raised when a GraphQL query fails as a whole """
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def graphql_enabled(backend=None):
+    """ Whether repository metadata should come from GraphQL (per request override or GITHUB_BACKEND) """
+    return (backend or GITHUB_BACKEND) == "graphql" and bool(GITHUB_TOKEN)
+
+
+class BatchSizer:
+    """
+    Picks how many repositories go into the next query from the `cost` the
+    previous queries reported, and keeps a reserve of the GraphQL quota.
+    """
+
+    def __init__(self, max_batch, target_cost):
+        self.max_batch = max_batch
+        self.target_cost = target_cost
+        self.cost_per_repo = None
+        self.limit = None
+        self.remaining = None
+        self.reset_at = None
+        self._lock = threading.Lock()
+
+    def next_size(self, pending):
+        with self._lock:
+            size = self.max_batch
+            if self.cost_per_repo:
+                size = int(self.target_cost / self.cost_per_repo)
+                if self.remaining is not None and self.limit:
+                    spendable = self.remaining - self.limit * GRAPHQL_RESERVE
+                    if spendable < self.cost_per_repo:
+                        raise GraphQLError("GraphQL rate limit reserve reached", 429)
+                    size = min(size, int(spendable / self.cost_per_repo))
+            return max(1, min(size, self.max_batch, pending))
+
+    def observe(self, rate_limit, batch_size):
+        if not rate_limit:
+            return
+        with self._lock:
+            cost = float(rate_limit.get("cost") or 1)
+            observed = cost / max(batch_size, 1)
+            # Smooth towards the latest figure; query cost barely varies per repo.
+            self.cost_per_repo = observed if self.cost_per_repo is None else (self.cost_per_repo + observed) / 2
+            self.limit = rate_limit.get("limit")
+            self.remaining = rate_limit.get("remaining")
+            self.reset_at = rate_limit.get("resetAt")
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "cost_per_repo": self.cost_per_repo,
+                "limit": self.limit,
+                "remaining": self.remaining,
+                "reset_at": self.reset_at,
+            }
+
+
+batch_sizer = BatchSizer(GRAPHQL_MAX_BATCH, GRAPHQL_TARGET_COST)
+
+
+def _build_query(count):
+    variables = ", ".join(f"$o{i}: String!, $n{i}: String!" for i in range(count))
+    aliases = "\n".join(f"  r{i}: repository(owner: $o{i}, name: $n{i}) {{ ...RepositoryFields }}" for i in range(count))
+    return (
+        f"query({variables}, $depth: Int!) {{\n{aliases}\n"
+        "  rateLimit { cost limit remaining resetAt }\n}\n"
+        + REPOSITORY_FIELDS
+    )
+
+
+def _query_batch(batch):
+    variables = {"depth": GRAPHQL_HISTORY_DEPTH}
+    for i, (owner, repo) in enumerate(batch):
+        variables[f"o{i}"] = owner
+        variables[f"n{i}"] = repo
+
+    response = github_graphql(_build_query(len(batch)), variables)
+    if not response.ok:
+        raise GraphQLError(f"GitHub GraphQL error: {response.status_code}", response.status_code)
+    payload = response.json()
+    data = payload.get("data")
+    if data is None:
+        # No data at all means the query itself was rejected.
+        messages = "; ".join(error.get("message", "") for error in payload.get("errors", []))
+        raise GraphQLError(f"GitHub GraphQL error: {messages}", 502)
+
+    batch_sizer.observe(data.get("rateLimit"), len(batch))
+    # Missing repositories come back as null aliases with a NOT_FOUND error.
+    return {batch[i]: data.get(f"r{i}") for i in range(len(batch))}
+
+
+def fetch_repos_graphql(repos):
+    """
+    Fetch metadata, languages, contributors and recent commits for many
+    repositories with as few GraphQL queries as possible.
+    repos is a list of (owner, repo); returns {(owner, repo): summary or None}.
+    """
+    pending = list(dict.fromkeys(repos))
+    results = {}
+    while pending:
+        size = batch_sizer.next_size(len(pending))
+        batch, pending = pending[:size], pending[size:]
+        for key, node in _query_batch(batch).items():
+            results[key] = repository_summary(node) if node else None
+    return results
+
+
+def fetch_repo_graphql(owner, repo):
+    return fetch_repos_graphql([(owner, repo)]).get((owner, repo))
+
+
+def _rest_user(user):
+    return {
+        "login": user["login"],
+        "id": user.get("databaseId"),
+        "avatar_url": user.get("avatarUrl"),
+        "html_url": user.get("url"),
+    }
+
+
+def repository_summary(node):
+    """
+    Map a GraphQL repository node onto the REST shapes the frontend already
+    reads: details (GET /repos/{owner}/{repo}), contributors and commits.
+    contributors is None when the history is longer than the fetched window,
+    as counts over a sample would differ from the REST totals.
+    """
+    branch = node.get("defaultBranchRef") or {}
+    head = branch.get("target") or {}
+    history = head.get("history") or {}
+    commits = history.get("nodes") or []
+
+    languages = {edge["node"]["name"]: edge["size"] for edge in (node.get("languages") or {}).get("edges", [])}
+    details = {
+        "id": node.get("databaseId"),
+        "name": node["name"],
+        "full_name": node["nameWithOwner"],
+        "description": node.get("description"),
+        "html_url": node.get("url"),
+        "private": node.get("isPrivate"),
+        "fork": node.get("isFork"),
+        "archived": node.get("isArchived"),
+        "created_at": node.get("createdAt"),
+        "updated_at": node.get("updatedAt"),
+        "pushed_at": node.get("pushedAt"),
+        "size": node.get("diskUsage"),
+        "stargazers_count": node.get("stargazerCount"),
+        "forks_count": node.get("forkCount"),
+        "open_issues_count": (node.get("issues") or {}).get("totalCount"),
+        "language": (node.get("primaryLanguage") or {}).get("name"),
+        "default_branch": branch.get("name"),
+        "owner": {
+            "login": node["owner"]["login"],
+            "avatar_url": node["owner"].get("avatarUrl"),
+            "html_url": node["owner"].get("url"),
+        },
+        "languages": languages,
+        "head_sha": head.get("oid"),
+        "total_commits": history.get("totalCount"),
+    }
+
+    # GraphQL has no contributors connection, so commit authors are counted
+    # over the fetched history (GRAPHQL_HISTORY_DEPTH commits).
+    contributors = {}
+    recent_commits = []
+    for commit in commits:
+        author = commit.get("author") or {}
+        user = author.get("user")
+        if user:
+            contributor = contributors.setdefault(user["login"], {**_rest_user(user), "type": "User", "contributions": 0})
+            contributor["contributions"] += 1
+        recent_commits.append({
+            "sha": commit["oid"],
+            "html_url": commit.get("url"),
+            "commit": {
+                "message": commit.get("message"),
+                "author": {"name": author.get("name"), "email": author.get("email"), "date": author.get("date")},
+                "committer": {"date": commit.get("committedDate")},
+            },
+            "author": _rest_user(user) if user else None,
+        })
+
+    complete = history.get("totalCount") is not None and len(commits) >= history["totalCount"]
+    return {
+        "details": details,
+        "contributors": sorted(contributors.values(), key=lambda c: c["contributions"], reverse=True) if complete else None,
+        "recent_commits": recent_commits,
+    }
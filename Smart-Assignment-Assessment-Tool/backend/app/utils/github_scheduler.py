@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+INTERACTIVE = "interactive"  # A teacher or student is waiting on the response
+BATCH = "batch"              # Prefetch, warm-up and analysis jobs
+PRIORITIES = (INTERACTIVE, BATCH)
+
+# Part of the hourly quota batch traffic may never touch.
+GITHUB_INTERACTIVE_RESERVE = float(os.getenv("GITHUB_INTERACTIVE_RESERVE", "0.1"))
+# Below this fraction of the quota, batch requests are spread out until the reset.
+GITHUB_BATCH_SLOWDOWN_AT = float(os.getenv("GITHUB_BATCH_SLOWDOWN_AT", "0.5"))
+
+_context = threading.local()
+
+
+def current_priority():
+    return getattr(_context, "priority", INTERACTIVE)
+
+
+@contextmanager
+def github_priority(priority):
+    """ Run every GitHub call made by this thread inside the block at the given priority """
+    previous = current_priority()
+    _context.priority = priority
+    try:
+        yield
+    finally:
+        _context.priority = previous
+
+
+class GitHubScheduler:
+    """
+    Admission control in front of the GitHub client.
+    Tracks the remaining REST quota from X-RateLimit-* headers and hands out
+    request slots: interactive requests always go first, batch requests wait
+    while interactive ones are queued, are paced as the quota shrinks and stop
+    entirely once only the interactive reserve is left.
+    """
+
+    def __init__(self, max_in_flight):
+        self.max_in_flight = max_in_flight
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiting = {priority: 0 for priority in PRIORITIES}
+        self._started = {priority: 0 for priority in PRIORITIES}
+        self._wait_seconds = {priority: 0.0 for priority in PRIORITIES}
+        self._next_batch_at = 0.0
+        self.limit = None
+        self.remaining = None
+        self.reset_at = None
+
+    def observe(self, response):
+        """ Update the quota from a GitHub response's core rate-limit headers """
+        headers = response.headers
+        if headers.get("X-RateLimit-Resource", "core") != "core":
+            return
+        try:
+            limit = int(headers["X-RateLimit-Limit"])
+            remaining = int(headers["X-RateLimit-Remaining"])
+            reset_at = float(headers["X-RateLimit-Reset"])
+        except (KeyError, ValueError):
+            return
+        with self._cond:
+            self.limit, self.remaining, self.reset_at = limit, remaining, reset_at
+            self._cond.notify_all()
+
+    def _batch_delay(self, now):
+        """ Seconds a batch request still has to wait, or 0 when it may start """
+        if self._waiting[INTERACTIVE]:
+            return 0.05
+        if self.remaining is None or self.limit is None:
+            return 0.0
+        if self.reset_at is not None and now >= self.reset_at:
+            return 0.0  # Window rolled over; the next response refreshes the numbers
+
+        reserve = self.limit * GITHUB_INTERACTIVE_RESERVE
+        until_reset = max(self.reset_at - now, 0.0) if self.reset_at else 60.0
+        if self.remaining <= reserve:
+            return until_reset
+        if self.remaining < self.limit * GITHUB_BATCH_SLOWDOWN_AT:
+            # Paced by _schedule_next_batch, which spreads the quota left above
+            # the reserve evenly over the rest of the window.
+            return max(self._next_batch_at - now, 0.0)
+        return 0.0
+
+    def acquire(self, priority=None):
+        priority = priority or current_priority()
+        start = time.monotonic()
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    now = time.time()
+                    if self._in_flight < self.max_in_flight:
+                        delay = 0.0 if priority == INTERACTIVE else self._batch_delay(now)
+                        if delay <= 0:
+                            break
+                        self._cond.wait(timeout=min(delay, 5.0))
+                    else:
+                        self._cond.wait(timeout=5.0)
+            finally:
+                self._waiting[priority] -= 1
+
+            self._in_flight += 1
+            self._started[priority] += 1
+            self._wait_seconds[priority] += time.monotonic() - start
+            if priority == BATCH:
+                self._schedule_next_batch(time.time())
+
+    def _schedule_next_batch(self, now):
+        if self.remaining is None or self.limit is None or not self.reset_at:
+            return
+        if self.remaining >= self.limit * GITHUB_BATCH_SLOWDOWN_AT:
+            self._next_batch_at = 0.0
+            return
+        reserve = self.limit * GITHUB_INTERACTIVE_RESERVE
+        interval = max(self.reset_at - now, 0.0) / max(self.remaining - reserve, 1)
+        self._next_batch_at = now + interval
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority=None):
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def metrics(self):
+        with self._cond:
+            return {
+                "quota": {
+                    "limit": self.limit,
+                    "remaining": self.remaining,
+                    "reset_at": self.reset_at,
+                },
+                "in_flight": self._in_flight,
+                "max_in_flight": self.max_in_flight,
+                "queue_depth": dict(self._waiting),
+                "started": dict(self._started),
+                "wait_seconds": {k: round(v, 3) for k, v in self._wait_seconds.items()},
+            }
@@ -0,0 +1,295 @@
+import os
+import random
+import threading
+import time
+
+import google.generativeai as genai
+from dotenv import load_dotenv
+
+from app.utils.llm_usage import record_llm_call
+
+load_dotenv()  # Load environment variables from .env
+
+# genai.configure is process-wide, so the gateway configures it once for every caller.
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY") or os.getenv("GEMINI_API_KEY_CODE")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "4"))
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "1000000"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+# Whole-call budget (queueing, throttling and retries included) and per-attempt timeout.
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "120"))
+LLM_ATTEMPT_TIMEOUT = float(os.getenv("LLM_ATTEMPT_TIMEOUT", "60"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+# Output tokens reserved per call before the real count is known.
+LLM_EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "2048"))
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+CHARS_PER_TOKEN = 4
+
+genai.configure(api_key=GEMINI_API_KEY)
+
+
+class LLMError(Exception):
+    """ Raised when an LLM call is rejected or fails for good """
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class TokenBucket:
+    """ Refills `per_minute` units evenly over a minute, holding at most one minute's worth """
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount, deadline):
+        """ Take amount units, waiting for the refill; returns seconds waited """
+        amount = min(amount, self.capacity)  # An oversized request waits for a full bucket
+        started = time.monotonic()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self.level >= amount:
+                    self.level -= amount
+                    return now - started
+                wait = (amount - self.level) / self.rate
+                if now + wait > deadline:
+                    raise LLMError("LLM rate limit: no capacity before the deadline", 429)
+                self._cond.wait(min(wait, 1.0))
+
+    def adjust(self, amount):
+        """ Give back (or take more of) an estimate once the real usage is known """
+        with self._cond:
+            self.level = min(self.capacity, self.level + amount)
+            self._cond.notify_all()
+
+    def metrics(self):
+        with self._cond:
+            self._refill(time.monotonic())
+            return {"per_minute": self.capacity, "available": round(self.level, 1)}
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failed calls and rejects calls for
+    `reset_seconds`; then lets one trial call through (half-open) and closes
+    again when it succeeds.
+    """
+
+    def __init__(self, threshold, reset_seconds):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state()
+            if state == "closed":
+                return
+            if state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                return
+            raise LLMError("LLM upstream unavailable (circuit open)", 503)
+
+    def record(self, success):
+        with self._lock:
+            self._trial_running = False
+            if success:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.failures >= self.threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """ End a call that never reached the upstream without judging it """
+        with self._lock:
+            self._trial_running = False
+
+    def metrics(self):
+        with self._lock:
+            return {"state": self.state(), "consecutive_failures": self.failures}
+
+
+_semaphore = threading.BoundedSemaphore(LLM_MAX_IN_FLIGHT)
+_requests = TokenBucket(LLM_REQUESTS_PER_MINUTE)
+_tokens = TokenBucket(LLM_TOKENS_PER_MINUTE)
+breaker = CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_SECONDS)
+
+_models = {}
+_models_lock = threading.Lock()
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def get_model(name=None):
+    """ One reusable client per model name """
+    name = name or GEMINI_MODEL
+    with _models_lock:
+        if name not in _models:
+            _models[name] = genai.GenerativeModel(name)
+        return _models[name]
+
+
+def _record(caller, **increments):
+    with _metrics_lock:
+        entry = _metrics.setdefault(caller, {
+            "calls": 0, "succeeded": 0, "failed": 0, "rejected": 0, "retries": 0,
+            "throttled_seconds": 0.0, "latency_seconds": 0.0,
+        })
+        for name, value in increments.items():
+            entry[name] += value
+
+
+def _status_of(error):
+    """ HTTP status of a google.api_core error (or anything carrying one) """
+    code = getattr(error, "code", None)
+    if callable(code):
+        code = code()
+    try:
+        return int(code)
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_retryable(error):
+    status = _status_of(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return isinstance(error, (TimeoutError, ConnectionError))
+
+
+def usage_of(response):
+    """ Token counts Gemini reports for a response """
+    metadata = getattr(response, "usage_metadata", None)
+    return {
+        "prompt_tokens": getattr(metadata, "prompt_token_count", None),
+        "output_tokens": getattr(metadata, "candidates_token_count", None),
+        "total_tokens": getattr(metadata, "total_token_count", None),
+    }
+
+
+def generate(prompt, caller="default", model=None, deadline_seconds=None):
+    """
+    Call Gemini's generate_content through the shared limits: at most
+    LLM_MAX_IN_FLIGHT calls at once, request and token budgets per minute,
+    retries with exponential backoff and jitter on 429 / 5xx, one deadline for
+    the whole call and a circuit breaker. Returns the Gemini response;
+    raises LLMError when the call is rejected or runs out of attempts.
+    Every call is recorded with its tokens and latency (see llm_usage).
+    """
+    started = time.monotonic()
+    attempts = []
+    try:
+        response = _generate(prompt, caller, model, deadline_seconds, attempts)
+    except Exception as e:
+        status = getattr(e, "status_code", None) or _status_of(e)
+        record_llm_call(caller, model or GEMINI_MODEL, latency_seconds=time.monotonic() - started,
+                        attempts=len(attempts), status=f"error:{status or 'unknown'}")
+        raise
+    record_llm_call(caller, model or GEMINI_MODEL, usage=usage_of(response),
+                    latency_seconds=time.monotonic() - started, attempts=len(attempts))
+    return response
+
+
+def _generate(prompt, caller, model, deadline_seconds, attempts):
+    deadline = time.monotonic() + (deadline_seconds or LLM_DEADLINE_SECONDS)
+    estimate = len(prompt) // CHARS_PER_TOKEN + LLM_EXPECTED_OUTPUT_TOKENS
+    _record(caller, calls=1)
+    try:
+        breaker.allow()
+    except LLMError:
+        _record(caller, rejected=1)
+        raise
+
+    attempt = 0
+    while True:
+        try:
+            throttled = _requests.acquire(1, deadline) + _tokens.acquire(estimate, deadline)
+            _record(caller, throttled_seconds=throttled)
+            if not _semaphore.acquire(timeout=max(deadline - time.monotonic(), 0)):
+                raise LLMError("LLM call timed out waiting for a free slot", 504)
+        except LLMError:
+            breaker.release()  # Local back-pressure says nothing about the upstream
+            _record(caller, failed=1)
+            raise
+
+        started = time.monotonic()
+        attempts.append(started)
+        try:
+            timeout = max(min(LLM_ATTEMPT_TIMEOUT, deadline - started), 1)
+            response = get_model(model).generate_content(prompt, request_options={"timeout": timeout})
+        except Exception as e:
+            error = e
+        else:
+            error = None
+        finally:
+            _semaphore.release()
+        _record(caller, latency_seconds=time.monotonic() - started)
+
+        if error is None:
+            used = usage_of(response)["total_tokens"]
+            if used is not None:
+                _tokens.adjust(estimate - used)
+            breaker.record(success=True)
+            _record(caller, succeeded=1)
+            return response
+
+        retryable = _is_retryable(error)
+        # Any answer other than 429 / 5xx / timeout means the upstream is up.
+        breaker.record(success=not retryable)
+        delay = min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+        if not retryable or attempt >= LLM_MAX_RETRIES or time.monotonic() + delay >= deadline:
+            _record(caller, failed=1)
+            if isinstance(error, LLMError) or not retryable:
+                raise error
+            raise LLMError(f"LLM call failed after {attempt + 1} attempts: {error}", _status_of(error) or 502) from error
+        attempt += 1
+        _record(caller, retries=1)
+        time.sleep(delay)
+        try:
+            breaker.allow()
+        except LLMError:
+            _record(caller, rejected=1)
+            raise
+
+
+def gateway_metrics():
+    with _metrics_lock:
+        callers = {caller: {name: round(value, 3) if isinstance(value, float) else value
+                            for name, value in entry.items()}
+                   for caller, entry in _metrics.items()}
+    return {
+        "model": GEMINI_MODEL,
+        "max_in_flight": LLM_MAX_IN_FLIGHT,
+        "requests": _requests.metrics(),
+        "tokens": _tokens.metrics(),
+        "circuit": breaker.metrics(),
+        "callers": callers,
+    }
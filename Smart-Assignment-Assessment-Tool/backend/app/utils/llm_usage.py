@@ -0,0 +1,212 @@
+import atexit
+import contextvars
+import math
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from flask import g, has_request_context, request
+
+from app.config import cache_dir
+
+LLM_USAGE_ENABLED = os.getenv("LLM_USAGE_ENABLED", "true").lower() == "true"
+LLM_USAGE_FLUSH_SECONDS = float(os.getenv("LLM_USAGE_FLUSH_SECONDS", "5"))
+LLM_USAGE_BATCH_SIZE = int(os.getenv("LLM_USAGE_BATCH_SIZE", "200"))
+LLM_USAGE_RETENTION_DAYS = int(os.getenv("LLM_USAGE_RETENTION_DAYS", "90"))
+# USD per million tokens (gemini-1.5-flash list prices by default).
+LLM_INPUT_COST_PER_MTOK = float(os.getenv("LLM_INPUT_COST_PER_MTOK", "0.075"))
+LLM_OUTPUT_COST_PER_MTOK = float(os.getenv("LLM_OUTPUT_COST_PER_MTOK", "0.30"))
+
+COLUMNS = (
+    "ts", "caller", "route", "assignment_id", "submission_id", "code_id", "model",
+    "prompt_tokens", "output_tokens", "total_tokens", "latency_ms", "attempts", "cache_hit", "status", "cost_usd",
+)
+TAGS = ("route", "assignment_id", "submission_id", "code_id")
+
+# Tags for threads that run outside the request (executors, streamed responses).
+_tags = contextvars.ContextVar("llm_usage_tags", default={})
+_queue = queue.Queue()
+_flush_lock = threading.Lock()
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def tag_llm_usage(**fields):
+    """ Attach ids (assignment_id, submission_id, code_id) to every LLM call of the current request """
+    fields = {name: value for name, value in fields.items() if value}
+    if has_request_context():
+        g.llm_usage_tags = {**getattr(g, "llm_usage_tags", {}), **fields}
+    else:
+        _tags.set({**_tags.get(), **fields})
+
+
+def current_tags():
+    tags = dict(_tags.get())
+    if has_request_context():
+        tags.setdefault("route", request.endpoint)
+        tags.update(getattr(g, "llm_usage_tags", {}))
+    return tags
+
+
+def bind_usage_context(fn):
+    """
+    Wrap fn so that, run on another thread, its LLM calls are still
+    attributed to the route and ids of the request that submitted it.
+    """
+    tags = current_tags()
+
+    def run(*args, **kwargs):
+        token = _tags.set(tags)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _tags.reset(token)
+    return run
+
+
+def _cost(prompt_tokens, output_tokens):
+    return ((prompt_tokens or 0) * LLM_INPUT_COST_PER_MTOK + (output_tokens or 0) * LLM_OUTPUT_COST_PER_MTOK) / 1e6
+
+
+def record_llm_call(caller, model=None, usage=None, latency_seconds=None, attempts=0, cache_hit=False, status="ok"):
+    """ Queue one usage record; a background thread writes them to SQLite in batches """
+    if not LLM_USAGE_ENABLED:
+        return
+    usage = usage or {}
+    tags = current_tags()
+    row = {
+        "ts": time.time(),
+        "caller": caller,
+        **{name: tags.get(name) for name in TAGS},
+        "model": model,
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "output_tokens": usage.get("output_tokens"),
+        "total_tokens": usage.get("total_tokens"),
+        "latency_ms": int(latency_seconds * 1000) if latency_seconds is not None else None,
+        "attempts": attempts,
+        "cache_hit": 1 if cache_hit else 0,
+        "status": status,
+        "cost_usd": _cost(usage.get("prompt_tokens"), usage.get("output_tokens")),
+    }
+    _queue.put(tuple(row[name] for name in COLUMNS))
+    _start_writer()
+
+
+class UsageStore:
+    """ SQLite table of LLM call records under SAAT_CACHE_DIR/llm, shared by every worker on the host """
+
+    def __init__(self):
+        self.path = os.path.join(cache_dir("llm"), "usage.sqlite3")
+        with closing(self._connect()) as conn:
+            conn.executescript(
+                "CREATE TABLE IF NOT EXISTS llm_calls ("
+                " ts REAL NOT NULL, caller TEXT, route TEXT, assignment_id TEXT, submission_id TEXT,"
+                " code_id TEXT, model TEXT, prompt_tokens INTEGER, output_tokens INTEGER,"
+                " total_tokens INTEGER, latency_ms INTEGER, attempts INTEGER, cache_hit INTEGER,"
+                " status TEXT, cost_usd REAL);"
+                "CREATE INDEX IF NOT EXISTS llm_calls_ts ON llm_calls (ts);"
+            )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def insert(self, rows):
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN")
+            conn.executemany(f"INSERT INTO llm_calls ({', '.join(COLUMNS)}) VALUES ({placeholders})", rows)
+            conn.execute("DELETE FROM llm_calls WHERE ts < ?", (time.time() - LLM_USAGE_RETENTION_DAYS * 86400,))
+            conn.execute("COMMIT")
+
+    def rows_since(self, since):
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM llm_calls WHERE ts >= ?", (since,))
+            return [dict(zip(COLUMNS, row)) for row in cursor]
+
+
+_store = None
+
+
+def get_usage_store():
+    global _store
+    if _store is None:
+        _store = UsageStore()
+    return _store
+
+
+def flush():
+    """ Write every queued record now """
+    with _flush_lock:
+        rows = []
+        while True:
+            try:
+                rows.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        if rows:
+            try:
+                get_usage_store().insert(rows)
+            except Exception as e:
+                print(f"Could not write {len(rows)} LLM usage records: {e}")
+        return len(rows)
+
+
+def _writer_loop():
+    while True:
+        # Wake up for a full batch or at the flush interval, whichever comes first.
+        deadline = time.monotonic() + LLM_USAGE_FLUSH_SECONDS
+        while _queue.qsize() < LLM_USAGE_BATCH_SIZE and time.monotonic() < deadline:
+            time.sleep(min(0.5, LLM_USAGE_FLUSH_SECONDS))
+        flush()
+
+
+def _start_writer():
+    global _writer
+    if _writer is not None:
+        return
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_writer_loop, name="llm-usage-writer", daemon=True)
+            _writer.start()
+            atexit.register(flush)
+
+
+def _percentile(values, fraction):
+    """ Nearest-rank percentile of an already sorted list """
+    if not values:
+        return None
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def _summarise(rows):
+    calls = [row for row in rows if not row["cache_hit"]]
+    latencies = sorted(row["latency_ms"] for row in calls if row["latency_ms"] is not None)
+    return {
+        "calls": len(calls),
+        "cache_hits": len(rows) - len(calls),
+        "errors": sum(1 for row in calls if row["status"] != "ok"),
+        "prompt_tokens": sum(row["prompt_tokens"] or 0 for row in calls),
+        "output_tokens": sum(row["output_tokens"] or 0 for row in calls),
+        "total_tokens": sum(row["total_tokens"] or 0 for row in calls),
+        "cost_usd": round(sum(row["cost_usd"] or 0 for row in calls), 6),
+        "latency_p50_ms": _percentile(latencies, 0.5),
+        "latency_p95_ms": _percentile(latencies, 0.95),
+    }
+
+
+def usage_summary(hours=24):
+    """ Token, cost and latency figures over the last `hours`, overall and per route / assignment / caller """
+    flush()
+    rows = get_usage_store().rows_since(time.time() - hours * 3600)
+    summary = {"window_hours": hours, "overall": _summarise(rows)}
+    for key, label in (("route", "by_route"), ("assignment_id", "by_assignment"), ("caller", "by_caller")):
+        groups = {}
+        for row in rows:
+            groups.setdefault(row[key] or "unknown", []).append(row)
+        summary[label] = {name: _summarise(group) for name, group in sorted(groups.items())}
+    return summary
@@ -0,0 +1,687 @@
+import ast
+import bisect
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import esprima
+except ImportError:
+    esprima = None
+
+# "local" analyses the source itself; "gemini" keeps the old LLM check.
+NAMING_ENGINE = os.getenv("NAMING_ENGINE", "local").lower()
+NAMING_WORKERS = int(os.getenv("NAMING_WORKERS", str(os.cpu_count() or 2)))
+# Below this many files the pool costs more than it saves.
+NAMING_PARALLEL_MIN_FILES = int(os.getenv("NAMING_PARALLEL_MIN_FILES", "40"))
+NAMING_MAX_FILE_BYTES = int(os.getenv("NAMING_MAX_FILE_BYTES", str(256 * 1024)))
+# Keeps the stored result well inside Firestore's 1 MB document limit.
+NAMING_MAX_ISSUES = int(os.getenv("NAMING_MAX_ISSUES", "500"))
+# forkserver avoids forking a process that is running request threads.
+NAMING_START_METHOD = os.getenv("NAMING_START_METHOD", "forkserver")
+
+LANGUAGES = {
+    ".py": "python",
+    ".js": "javascript", ".jsx": "javascript", ".mjs": "javascript", ".cjs": "javascript",
+    ".ts": "typescript", ".tsx": "typescript",
+    ".java": "java",
+    ".c": "c", ".h": "c",
+    ".cpp": "cpp", ".cc": "cpp", ".cxx": "cpp", ".hpp": "cpp", ".hh": "cpp", ".hxx": "cpp",
+    ".php": "php",
+}
+
+EXCLUDED_DIRS = {
+    "node_modules", "bower_components", "vendor", "dist", "build", "out", "target", "coverage",
+    "venv", ".venv", "env", "__pycache__", "site-packages", "migrations", ".git", ".next", ".nuxt",
+}
+GENERATED_SUFFIXES = (".min.js", ".bundle.js", ".pb.go", "_pb2.py", ".d.ts")
+
+SNAKE = re.compile(r"^[a-z][a-z0-9]*(?:_[a-z0-9]+)*$")
+CAMEL = re.compile(r"^[a-z][a-zA-Z0-9]*$")
+PASCAL = re.compile(r"^[A-Z][a-zA-Z0-9]*$")
+UPPER = re.compile(r"^[A-Z][A-Z0-9]*(?:_[A-Z0-9]+)*$")
+
+BOOLEAN_PREFIXES = ("is", "has", "can", "should", "was", "will", "did", "does", "needs", "allow", "enable", "show", "use")
+LOOP_COUNTERS = {"i", "j", "k"}
+# Python method names dictated by the standard library (ast visitors, http.server, unittest).
+PYTHON_FRAMEWORK_METHODS = re.compile(r"^(?:visit_|depart_|do_)\w+$|^(?:setUp|tearDown|setUpClass|tearDownClass|asyncSetUp|asyncTearDown)$")
+_WORDS = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+
+def _core(name):
+    """ Name without the leading / trailing underscores or $ that only mark visibility """
+    return name.strip("_$")
+
+
+def _words(name):
+    return [word.lower() for word in _WORDS.findall(_core(name))]
+
+
+def _prefix(name):
+    return name[:len(name) - len(name.lstrip("_$"))]
+
+
+def to_snake(name):
+    return _prefix(name) + "_".join(_words(name))
+
+
+def to_camel(name):
+    words = _words(name)
+    return _prefix(name) + (words[0] + "".join(word.capitalize() for word in words[1:]) if words else name)
+
+
+def to_pascal(name):
+    return _prefix(name) + "".join(word.capitalize() for word in _words(name))
+
+
+def to_upper(name):
+    return _prefix(name) + "_".join(_words(name)).upper()
+
+
+STYLES = {
+    "snake_case": (SNAKE, to_snake),
+    "camelCase": (CAMEL, to_camel),
+    "PascalCase": (PASCAL, to_pascal),
+    "UPPER_SNAKE_CASE": (UPPER, to_upper),
+}
+
+# Accepted styles per language and element type; the first one is suggested.
+RULES = {
+    "python": {
+        "class": ["PascalCase"],
+        "function": ["snake_case"],
+        "method": ["snake_case"],
+        "parameter": ["snake_case"],
+        "variable": ["snake_case"],
+        "constant": ["UPPER_SNAKE_CASE", "snake_case"],
+        "class_attribute": ["snake_case", "UPPER_SNAKE_CASE"],
+    },
+    "javascript": {
+        "class": ["PascalCase"],
+        # PascalCase functions are React components.
+        "function": ["camelCase", "PascalCase"],
+        "method": ["camelCase"],
+        "parameter": ["camelCase"],
+        "variable": ["camelCase"],
+        "constant": ["camelCase", "UPPER_SNAKE_CASE", "PascalCase"],
+        "interface": ["PascalCase"],
+        "type": ["PascalCase"],
+        "enum": ["PascalCase"],
+    },
+    "java": {
+        "class": ["PascalCase"],
+        "interface": ["PascalCase"],
+        "enum": ["PascalCase"],
+        "method": ["camelCase"],
+        "parameter": ["camelCase"],
+        "variable": ["camelCase"],
+        "constant": ["UPPER_SNAKE_CASE"],
+    },
+    "c": {
+        "struct": ["snake_case", "PascalCase"],
+        "function": ["snake_case"],
+        "parameter": ["snake_case", "camelCase"],
+        "variable": ["snake_case", "camelCase"],
+        # Local const values read like variables.
+        "constant": ["UPPER_SNAKE_CASE", "snake_case", "camelCase"],
+        "macro": ["UPPER_SNAKE_CASE"],
+    },
+    "cpp": {
+        "class": ["PascalCase"],
+        "struct": ["PascalCase", "snake_case"],
+        "function": ["snake_case", "camelCase", "PascalCase"],
+        "parameter": ["snake_case", "camelCase"],
+        "variable": ["snake_case", "camelCase"],
+        "constant": ["UPPER_SNAKE_CASE", "snake_case", "camelCase", "PascalCase"],
+        "macro": ["UPPER_SNAKE_CASE"],
+    },
+    "php": {
+        "class": ["PascalCase"],
+        "interface": ["PascalCase"],
+        "trait": ["PascalCase"],
+        "method": ["camelCase"],
+        "function": ["snake_case", "camelCase"],
+        "variable": ["camelCase", "snake_case"],
+        "constant": ["UPPER_SNAKE_CASE"],
+    },
+}
+RULES["typescript"] = RULES["javascript"]
+
+LANGUAGE_NAMES = {
+    "python": "Python", "javascript": "JavaScript", "typescript": "TypeScript", "java": "Java",
+    "c": "C", "cpp": "C++", "php": "PHP",
+}
+
+
+class Finder:
+    """ Collects (element_type, name, line, context) for one file; context flags extra checks """
+
+    def __init__(self):
+        self.elements = []
+
+    def add(self, element_type, name, line, boolean=False, loop=False):
+        if name:
+            self.elements.append((element_type, name, line, boolean, loop))
+
+
+# ---------------------------------------------------------------- Python
+
+class PythonFinder(ast.NodeVisitor, Finder):
+    """ Walks a Python AST keeping track of whether names live at module, class or function level """
+
+    def __init__(self):
+        Finder.__init__(self)
+        self.scope = ["module"]
+
+    def visit_ClassDef(self, node):
+        self.add("class", node.name, node.lineno)
+        self.scope.append("class")
+        self.generic_visit(node)
+        self.scope.pop()
+
+    def _visit_function(self, node):
+        if not (node.name.startswith("__") and node.name.endswith("__")) and not PYTHON_FRAMEWORK_METHODS.match(node.name):
+            self.add("method" if self.scope[-1] == "class" else "function", node.name, node.lineno)
+        arguments = node.args
+        for arg in arguments.posonlyargs + arguments.args + arguments.kwonlyargs + [arguments.vararg, arguments.kwarg]:
+            if arg is not None and arg.arg not in ("self", "cls"):
+                self.add("parameter", arg.arg, arg.lineno)
+        self.scope.append("function")
+        self.generic_visit(node)
+        self.scope.pop()
+
+    visit_FunctionDef = _visit_function
+    visit_AsyncFunctionDef = _visit_function
+
+    def _targets(self, target):
+        if isinstance(target, ast.Name):
+            yield target
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for element in target.elts:
+                yield from self._targets(element)
+        elif isinstance(target, ast.Starred):
+            yield from self._targets(target.value)
+
+    def _visit_assignment(self, targets, value, lineno):
+        scope = self.scope[-1]
+        is_boolean = isinstance(value, ast.Constant) and isinstance(value.value, bool)
+        for target in targets:
+            for name_node in self._targets(target):
+                name = name_node.id
+                if name == "_" or (name.startswith("__") and name.endswith("__")):
+                    continue
+                if scope == "class":
+                    if not PYTHON_FRAMEWORK_METHODS.match(name):
+                        self.add("class_attribute", name, lineno)
+                elif scope == "module":
+                    # Module-level aliases (Base = declarative_base(), T = TypeVar("T")) keep their casing.
+                    core = _core(name)
+                    if PASCAL.match(core) and (len(core) == 1 or not UPPER.match(core)) and not isinstance(value, ast.Constant):
+                        continue
+                    self.add("constant" if UPPER.match(_core(name)) else "variable", name, lineno, boolean=is_boolean)
+                else:
+                    self.add("variable", name, lineno, boolean=is_boolean)
+
+    def visit_Assign(self, node):
+        self._visit_assignment(node.targets, node.value, node.lineno)
+        self.generic_visit(node)
+
+    def visit_AnnAssign(self, node):
+        self._visit_assignment([node.target], node.value, node.lineno)
+        self.generic_visit(node)
+
+
+def find_python(source):
+    finder = PythonFinder()
+    finder.visit(ast.parse(source))
+    return finder.elements
+
+
+# ------------------------------------------------------------ JavaScript
+
+def find_javascript(source):
+    """ Declarations from an esprima parse (JSX enabled, tolerant of recoverable errors) """
+    nodes = []
+    options = {"jsx": True, "tolerant": True, "loc": True, "range": True}
+    try:
+        esprima.parseModule(source, options, lambda node, metadata: nodes.append(node))
+    except Exception:
+        nodes = []
+        esprima.parseScript(source, options, lambda node, metadata: nodes.append(node))
+
+    # for (let i = 0; ...) / for (const key of ...) declare loop variables.
+    loop_ranges = []
+    for node in nodes:
+        if node.type == "ForStatement" and node.init is not None:
+            loop_ranges.append(node.init.range)
+        elif node.type in ("ForInStatement", "ForOfStatement"):
+            loop_ranges.append(node.left.range)
+
+    def in_loop_header(node):
+        return any(start <= node.range[0] and node.range[1] <= end for start, end in loop_ranges)
+
+    finder = Finder()
+
+    def add_params(params):
+        for param in params:
+            if param.type == "AssignmentPattern":
+                param = param.left
+            elif param.type == "RestElement":
+                param = param.argument
+            if param.type == "Identifier":
+                finder.add("parameter", param.name, param.loc.start.line)
+
+    for node in nodes:
+        if node.type in ("ClassDeclaration", "ClassExpression") and node.id is not None:
+            finder.add("class", node.id.name, node.loc.start.line)
+        elif node.type == "FunctionDeclaration" and node.id is not None:
+            finder.add("function", node.id.name, node.loc.start.line)
+            add_params(node.params)
+        elif node.type in ("FunctionExpression", "ArrowFunctionExpression"):
+            add_params(node.params)
+        elif node.type == "MethodDefinition" and not node.computed and node.key.type == "Identifier":
+            if node.key.name != "constructor":
+                finder.add("method", node.key.name, node.loc.start.line)
+        elif node.type == "VariableDeclaration":
+            loop = in_loop_header(node)
+            for declarator in node.declarations:
+                if declarator.id.type != "Identifier":
+                    continue  # Destructuring takes its names from the source object
+                init = declarator.init
+                is_boolean = init is not None and init.type == "Literal" and isinstance(init.value, bool)
+                element_type = "constant" if node.kind == "const" else "variable"
+                finder.add(element_type, declarator.id.name, declarator.loc.start.line, boolean=is_boolean, loop=loop)
+    return finder.elements
+
+
+# ------------------------------------------------------ Regex tokenizers
+
+_C_LIKE_NOISE = re.compile(
+    r"//[^\n]*|/\*.*?\*/|\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`",
+    re.DOTALL,
+)
+_HASH_COMMENT = re.compile(r"#(?!\[)[^\n]*")
+_PREPROCESSOR = re.compile(r"^[ \t]*#(?!define)[^\n]*", re.MULTILINE)
+
+
+def _blank(match):
+    """ Replace comments and strings with blanks of the same line structure """
+    text = match.group(0)
+    if text[0] in "\"'`":
+        return text[0] * 2 + "\n" * text.count("\n")
+    return "\n" * text.count("\n")
+
+
+def strip_noise(source, hash_comments=False, preprocessor=False):
+    source = _C_LIKE_NOISE.sub(_blank, source)
+    if hash_comments:
+        source = _HASH_COMMENT.sub("", source)
+    if preprocessor:
+        source = _PREPROCESSOR.sub("", source)
+    return source
+
+
+class LineIndex:
+    """ Offset -> 1-based line number """
+
+    def __init__(self, text):
+        self.starts = [0] + [match.end() for match in re.finditer("\n", text)]
+
+    def line(self, offset):
+        return bisect.bisect_right(self.starts, offset)
+
+
+KEYWORDS = {
+    "if", "for", "while", "switch", "catch", "return", "new", "sizeof", "else", "do", "try",
+    "throw", "case", "delete", "typeof", "instanceof", "synchronized", "super", "this", "elseif",
+    "foreach", "function", "operator", "defined", "using", "namespace", "template", "typename",
+}
+
+_JAVA_TYPES = re.compile(r"\b(class|interface|enum|record)\s+([A-Za-z_$][\w$]*)")
+_JAVA_METHOD = re.compile(
+    r"(?:^|[;{}])\s*(?:@\w+(?:\([^)]*\))?\s*)*(?:(?:public|protected|private|static|final|abstract|"
+    r"synchronized|native|default|strictfp)\s+)*(?:<[^>]*>\s*)?[\w$][\w$.<>\[\],?\s]*?\s+([A-Za-z_$][\w$]*)\s*"
+    r"\([^;{}()]*\)\s*(?:throws\s+[\w$.,\s]+)?\{"
+)
+_JAVA_CONSTANT = re.compile(r"\bstatic\s+final\s+[\w$.<>\[\],?\s]+?\s+([A-Za-z_$][\w$]*)\s*=")
+_JAVA_VARIABLE = re.compile(
+    r"(?:^|([;{}(,]))\s*(?:final\s+)?(?:int|long|short|byte|char|float|double|boolean|String|var|"
+    r"[A-Z][\w$]*(?:<[^;=(){}]*>)?)(?:\[\])*\s+([A-Za-z_$][\w$]*)\s*(?=(=|;|:|,|\)))"
+)
+
+
+def find_java(source):
+    text = strip_noise(source)
+    lines = LineIndex(text)
+    finder = Finder()
+    type_names = set()
+    for match in _JAVA_TYPES.finditer(text):
+        element_type = "class" if match.group(1) in ("class", "record") else match.group(1)
+        type_names.add(match.group(2))
+        finder.add(element_type, match.group(2), lines.line(match.start(2)))
+
+    constants = set()
+    for match in _JAVA_CONSTANT.finditer(text):
+        constants.add(match.start(1))
+        finder.add("constant", match.group(1), lines.line(match.start(1)))
+
+    for match in _JAVA_METHOD.finditer(text):
+        name = match.group(1)
+        if re.search(r"\bnew\s+$", text[match.start():match.start(1)]):
+            continue  # Anonymous class: new Runnable() { ... }
+        if name not in KEYWORDS and name not in type_names:  # Constructors carry the class name
+            finder.add("method", name, lines.line(match.start(1)))
+
+    _add_declarations(finder, _JAVA_VARIABLE, text, lines, constants)
+    return finder.elements
+
+
+_C_TYPES = re.compile(r"\b(class|struct|union|enum)\s+([A-Za-z_]\w*)\s*(?::[^{;]*)?\{")
+_C_MACRO = re.compile(r"^[ \t]*#define\s+([A-Za-z_]\w*)", re.MULTILINE)
+_C_FUNCTION = re.compile(
+    r"(?:^|[;{}])\s*(?:template\s*<[^>]*>\s*)?(?:[\w:<>,*&~]+\s+)+[*&]*\s*([A-Za-z_]\w*)\s*"
+    r"\([^;{}()]*\)\s*(?:const\s*)?(?:noexcept\s*)?(?:override\s*)?\{"
+)
+_C_CONSTANT = re.compile(r"\b(?:const|constexpr)\s+(?:static\s+)?[\w:<>]+\s*[*&]?\s*([A-Za-z_]\w*)\s*(?==|\[)")
+_C_VARIABLE = re.compile(
+    r"(?:^|([;{}(,]))\s*(?:const\s+|static\s+|unsigned\s+|signed\s+|long\s+|short\s+)*(?:int|long|short|char|float|"
+    r"double|bool|size_t|auto|std::\w+(?:<[^;=(){}]*>)?)\s*[*&]*\s*([A-Za-z_]\w*)\s*(?=(=|;|\[|,|\)))"
+)
+
+
+def find_c(source):
+    text = strip_noise(source)
+    lines = LineIndex(text)
+    finder = Finder()
+    for match in _C_MACRO.finditer(text):
+        finder.add("macro", match.group(1), lines.line(match.start(1)))
+
+    text = _PREPROCESSOR.sub("", _C_MACRO.sub("", text).replace("\\\n", " \n"))
+    lines = LineIndex(text)  # Offsets moved; the line structure did not
+    type_names = set()
+    for match in _C_TYPES.finditer(text):
+        element_type = "class" if match.group(1) == "class" else "struct"
+        type_names.add(match.group(2))
+        finder.add(element_type, match.group(2), lines.line(match.start(2)))
+
+    for match in _C_FUNCTION.finditer(text):
+        name = match.group(1)
+        if name not in KEYWORDS and name not in type_names and name != "main":
+            finder.add("function", name, lines.line(match.start(1)))
+
+    constants = set()
+    for match in _C_CONSTANT.finditer(text):
+        constants.add(match.start(1))
+        finder.add("constant", match.group(1), lines.line(match.start(1)))
+
+    _add_declarations(finder, _C_VARIABLE, text, lines, constants)
+    return finder.elements
+
+
+def _add_declarations(finder, pattern, text, lines, constants):
+    """ Typed declarations: parameters when they sit in a ( ... , ... ) list, variables otherwise """
+    for match in pattern.finditer(text):
+        name = match.group(2)
+        if match.start(2) in constants or name in KEYWORDS:
+            continue
+        loop = _in_for_header(text, match.start())
+        is_parameter = not loop and match.group(1) in ("(", ",") and match.group(3) in (",", ")")
+        finder.add("parameter" if is_parameter else "variable", name, lines.line(match.start(2)), loop=loop)
+
+
+def _in_for_header(text, offset):
+    return re.search(r"for\s*\($", text[max(0, offset - 12):offset + 1]) is not None
+
+
+_PHP_TYPES = re.compile(r"\b(class|interface|trait|enum)\s+([A-Za-z_]\w*)", re.IGNORECASE)
+_PHP_FUNCTION = re.compile(r"\bfunction\s*&?\s*([A-Za-z_]\w*)\s*\(", re.IGNORECASE)
+_PHP_CONSTANT = re.compile(r"\bconst\s+([A-Za-z_]\w*)\s*=|\bdefine\s*\(\s*[\"']([A-Za-z_]\w*)[\"']", re.IGNORECASE)
+_PHP_VARIABLE = re.compile(r"\$([A-Za-z_]\w*)\s*=(?!=|>)")
+PHP_BUILTIN_VARIABLES = {"this", "GLOBALS", "_SERVER", "_GET", "_POST", "_FILES", "_COOKIE", "_SESSION", "_REQUEST", "_ENV"}
+
+
+def find_php(source):
+    # Constant names in define('NAME', ...) live in strings, so read them first.
+    lines = LineIndex(source)
+    finder = Finder()
+    for match in _PHP_CONSTANT.finditer(source):
+        group = 1 if match.group(1) else 2
+        finder.add("constant", match.group(group), lines.line(match.start(group)))
+
+    text = strip_noise(source, hash_comments=True)
+    lines = LineIndex(text)
+    depth_at = _brace_depths(text)
+    class_bodies = []
+    for match in _PHP_TYPES.finditer(text):
+        finder.add(match.group(1).lower() if match.group(1).lower() != "enum" else "class", match.group(2), lines.line(match.start(2)))
+        body_start = text.find("{", match.end())
+        if body_start != -1:
+            class_bodies.append((body_start, depth_at(body_start)))
+
+    def in_class_body(offset):
+        # A method is a function declared directly inside a class body.
+        depth = depth_at(offset)
+        return any(start < offset and depth == class_depth + 1 for start, class_depth in class_bodies)
+
+    for match in _PHP_FUNCTION.finditer(text):
+        name = match.group(1)
+        if name.startswith("__"):
+            continue  # Magic methods
+        finder.add("method" if in_class_body(match.start()) else "function", name, lines.line(match.start(1)))
+
+    seen = set()
+    for match in _PHP_VARIABLE.finditer(text):
+        name = match.group(1)
+        if name in PHP_BUILTIN_VARIABLES or name in seen:
+            continue
+        seen.add(name)  # Report a variable once, at its first assignment
+        loop = _in_for_header(text, match.start())
+        finder.add("variable", name, lines.line(match.start(1)), loop=loop)
+    return finder.elements
+
+
+def _brace_depths(text):
+    """ Returns a function giving the {...} nesting depth at an offset """
+    offsets, depths, depth = [], [], 0
+    for match in re.finditer(r"[{}]", text):
+        depth += 1 if match.group(0) == "{" else -1
+        offsets.append(match.start())
+        depths.append(depth)
+
+    def depth_at(offset):
+        index = bisect.bisect_left(offsets, offset) - 1
+        return depths[index] if index >= 0 else 0
+    return depth_at
+
+
+_TS_DECLARATIONS = re.compile(
+    r"\b(interface|type|enum|class)\s+([A-Za-z_$][\w$]*)\s*(?:<[^>{}]*>\s*)?(?==|\{|extends\b|implements\b)"
+)
+_TS_FUNCTION = re.compile(r"\bfunction\s*\*?\s*([A-Za-z_$][\w$]*)")
+_TS_VARIABLE = re.compile(r"\b(const|let|var)\s+([A-Za-z_$][\w$]*)\s*(?::[^=;]+)?=\s*(true|false)?")
+
+
+def find_typescript(source):
+    """ Tokenizer for TypeScript (and JavaScript esprima cannot parse) """
+    text = strip_noise(source)
+    lines = LineIndex(text)
+    finder = Finder()
+    for match in _TS_DECLARATIONS.finditer(text):
+        finder.add(match.group(1), match.group(2), lines.line(match.start(2)))
+    for match in _TS_FUNCTION.finditer(text):
+        finder.add("function", match.group(1), lines.line(match.start(1)))
+    for match in _TS_VARIABLE.finditer(text):
+        loop = _in_for_header(text, match.start())
+        finder.add(
+            "constant" if match.group(1) == "const" else "variable",
+            match.group(2), lines.line(match.start(2)),
+            boolean=match.group(3) is not None, loop=loop,
+        )
+    return finder.elements
+
+
+FINDERS = {
+    "python": find_python,
+    "javascript": find_javascript,
+    "typescript": find_typescript,
+    "java": find_java,
+    "c": find_c,
+    "cpp": find_c,
+    "php": find_php,
+}
+
+
+# ------------------------------------------------------------------ Rules
+
+def check_element(language, element_type, name, boolean=False, loop=False):
+    """
+    Return (suggested_name, reason) when the name breaks a rule, else None.
+    suggested_name is None when no name can be derived (single letters).
+    """
+    label = LANGUAGE_NAMES[language]
+    core = _core(name)
+    if not core or not core.isascii():
+        return None
+
+    if len(core) == 1:
+        # Single letters are fine as loop counters and parameters (lambdas, maths).
+        if element_type in ("variable", "constant") and not loop and core.lower() not in LOOP_COUNTERS:
+            return None, (
+                f"Single-letter {element_type} name '{name}' is not descriptive; "
+                "rename it after what it holds (no name can be suggested automatically)"
+            )
+        return None
+
+    allowed = RULES[language].get(element_type)
+    if allowed and not any(STYLES[style][0].match(core) for style in allowed):
+        style = allowed[0]
+        if element_type == "constant" and language in ("javascript", "typescript"):
+            style = "UPPER_SNAKE_CASE" if core.upper() == core else "camelCase"
+        suggestion = STYLES[style][1](name)
+        readable_type = element_type.replace("_", " ")
+        return suggestion, f"{label} {readable_type} names should use {' or '.join(allowed)}"
+
+    if boolean and element_type in ("variable", "constant") and not UPPER.match(core):
+        words = _words(name)
+        if words and words[0] not in BOOLEAN_PREFIXES:
+            converter = to_snake if language == "python" else to_camel
+            return converter("is_" + core), f"Boolean {element_type} '{name}' should start with is/has/can/should"
+    return None
+
+
+def analyze_source(source, path, language):
+    """ Naming issues for one file's source, in the stored issues schema """
+    finder = FINDERS[language]
+    if language == "javascript" and esprima is None:
+        finder = find_typescript
+    try:
+        elements = finder(source)
+    except (SyntaxError, ValueError, RecursionError):
+        return []
+    except Exception:
+        if language != "javascript":
+            return []
+        # esprima-python does not know every modern syntax form.
+        elements = find_typescript(source)
+
+    issues = []
+    seen = set()
+    for element_type, name, line, boolean, loop in elements:
+        key = (element_type, name, line)
+        if key in seen:
+            continue
+        seen.add(key)
+        result = check_element(language, element_type, name, boolean, loop)
+        if result is None:
+            continue
+        suggestion, reason = result
+        issue = {
+            "file_path": path,
+            "line_number": line,
+            "element_type": "variable" if element_type == "class_attribute" else element_type,
+            "element_name": name,
+            "reason": reason,
+        }
+        if suggestion is not None:
+            issue["suggested_name"] = suggestion
+        issues.append(issue)
+    return issues
+
+
+def analyze_file(task):
+    """ Process-pool entry point: task is (absolute_path, repo_relative_path, language) """
+    file_path, path, language = task
+    try:
+        with open(file_path, "rb") as f:
+            source = f.read().decode("utf-8", errors="replace")
+    except OSError:
+        return []
+    return analyze_source(source, path, language)
+
+
+def language_for(path):
+    return LANGUAGES.get(os.path.splitext(path)[1].lower())
+
+
+def is_analyzable(path, size=None):
+    if size is not None and size > NAMING_MAX_FILE_BYTES:
+        return False
+    if path.endswith(GENERATED_SUFFIXES):
+        return False
+    if any(part in EXCLUDED_DIRS for part in path.split("/")[:-1]):
+        return False
+    return language_for(path) is not None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                try:
+                    context = multiprocessing.get_context(NAMING_START_METHOD)
+                except ValueError:
+                    context = multiprocessing.get_context()
+                _pool = ProcessPoolExecutor(max_workers=NAMING_WORKERS, mp_context=context)
+    return _pool
+
+
+def analyze_files(files):
+    """
+    Analyse [(absolute_path, repo_relative_path)] and return the stored schema:
+    {"status": "Yes"} or {"status": "No", "issues": [...]}. Issues beyond
+    NAMING_MAX_ISSUES are left out; "total_issues" then has the full count
+    and "truncated" is set.
+    """
+    tasks = [(file_path, path, language_for(path)) for file_path, path in files]
+    if len(tasks) >= NAMING_PARALLEL_MIN_FILES and NAMING_WORKERS > 1:
+        chunksize = max(1, len(tasks) // (NAMING_WORKERS * 4))
+        results = get_pool().map(analyze_file, tasks, chunksize=chunksize)
+    else:
+        results = map(analyze_file, tasks)
+
+    issues = [issue for file_issues in results for issue in file_issues]
+    issues.sort(key=lambda issue: (issue["file_path"], issue["line_number"]))
+    if not issues:
+        return {"status": "Yes"}
+    result = {"status": "No", "issues": issues[:NAMING_MAX_ISSUES], "total_issues": len(issues)}
+    if len(issues) > NAMING_MAX_ISSUES:
+        result["truncated"] = True
+    return result
+
+
+def check_code_naming_local(snapshot, paths=None):
+    """ Run the naming engine over every source file of a repository snapshot (or only over paths) """
+    wanted = set(paths) if paths is not None else None
+    files = [
+        (snapshot.file_path(path), path)
+        for path, info in snapshot.files()
+        if (wanted is None or path in wanted) and is_analyzable(path, info.get("size"))
+    ]
+    return analyze_files(files)
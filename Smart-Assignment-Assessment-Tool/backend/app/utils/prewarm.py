@@ -0,0 +1,120 @@
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from app.models.code_model import Code
+from app.utils import code_metrics, file_naming, naming_engine
+from app.utils.analysis_cache import analyzer_version, cached_analysis
+from app.utils.code_metrics import compute_code_metrics
+from app.utils.commit_index import CommitIndex
+from app.utils.file_naming import FILE_NAMING_ENGINE, check_file_naming_local
+from app.utils.github_api import fetch_repo_tree
+from app.utils.github_client import parse_repo_url
+from app.utils.github_scheduler import BATCH, github_priority
+from app.utils.naming_engine import NAMING_ENGINE, check_code_naming_local
+from app.utils.repo_snapshot import REPO_SNAPSHOTS_ENABLED, get_snapshot, resolve_head_sha
+from app.utils.stats_warmer import STATS_WARM_TIMEOUT, warm_contributor_stats
+
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "true").lower() == "true"
+PREWARM_WORKERS = int(os.getenv("PREWARM_WORKERS", "2"))
+
+_executor = ThreadPoolExecutor(max_workers=PREWARM_WORKERS, thread_name_prefix="prewarm")
+
+
+def _now():
+    return datetime.utcnow().isoformat()
+
+
+def _analyze(repo_url, analysis, version, compute):
+    """ Fill the analysis cache the way the /check-* routes read it """
+    result, _ = cached_analysis(repo_url, analysis, version, compute)
+    if "error" in result:
+        raise RuntimeError(result["error"])
+
+
+def _steps(repo_url, owner, repo, sha):
+    """ The warm-up steps in order, as (name, callable) """
+    steps = []
+    if REPO_SNAPSHOTS_ENABLED:
+        steps.append(("snapshot", lambda: get_snapshot(owner, repo, sha)))
+    steps.append(("tree", lambda: fetch_repo_tree(owner, repo, sha)))
+    steps.append(("contributor_stats", lambda: warm_contributor_stats(owner, repo, sha).result(timeout=STATS_WARM_TIMEOUT)))
+    steps.append(("commits", lambda: CommitIndex(owner, repo).refresh()))
+    # The local analyzers, under the same cache keys as their routes' full runs
+    if FILE_NAMING_ENGINE == "local":
+        steps.append(("file_naming", lambda: _analyze(
+            repo_url, "file_naming", analyzer_version(file_naming),
+            lambda head: check_file_naming_local(owner, repo, head)
+        )))
+    if NAMING_ENGINE == "local":
+        steps.append(("code_naming", lambda: _analyze(
+            repo_url, "code_naming", analyzer_version(naming_engine),
+            lambda head: check_code_naming_local(get_snapshot(owner, repo, head), None)
+        )))
+    steps.append(("code_metrics", lambda: _analyze(
+        repo_url, "code_metrics", analyzer_version(code_metrics),
+        lambda head: compute_code_metrics(get_snapshot(owner, repo, head))
+    )))
+    return steps
+
+
+def _record(db, code_id, job_id, fields):
+    """ Write job fields; False once another job has been queued for the code """
+    try:
+        return Code.update_prewarm_status(db, code_id, {**fields, "prewarm.updated_at": _now()}, job_id)
+    except Exception as e:
+        print(f"Could not record pre-warm status for {code_id}: {e}")
+        return True
+
+
+def run_prewarm(db, code_id, github_url, job_id):
+    """
+    Resolve the submitted commit, snapshot the repository, fill the tree,
+    contributor-statistics and commit caches and run the local analyzers.
+    Each step's outcome is written to the code document under `prewarm`; a
+    failing step does not stop the rest. The job stops once it has been
+    replaced by a newer one (job_id no longer current).
+    """
+    try:
+        owner, repo = parse_repo_url(github_url)
+    except ValueError as e:
+        _record(db, code_id, job_id, {"prewarm.status": "failed", "prewarm.error": str(e)})
+        return
+
+    with github_priority(BATCH):
+        try:
+            sha = resolve_head_sha(owner, repo)
+        except Exception as e:
+            _record(db, code_id, job_id, {"prewarm.status": "failed", "prewarm.error": str(e)})
+            return
+        if not _record(db, code_id, job_id, {"prewarm.status": "running", "prewarm.sha": sha}):
+            return
+
+        failed = []
+        for name, step in _steps(github_url, owner, repo, sha):
+            started = time.monotonic()
+            result = {"status": "done"}
+            try:
+                step()
+            except Exception as e:
+                result = {"status": "failed", "error": str(e)}
+                failed.append(name)
+            result["duration_ms"] = int((time.monotonic() - started) * 1000)
+            if not _record(db, code_id, job_id, {f"prewarm.steps.{name}": result}):
+                return
+
+    _record(db, code_id, job_id, {"prewarm.status": "partial" if failed else "done", "prewarm.finished_at": _now()})
+
+
+def enqueue_prewarm(db, code_id, github_url):
+    """
+    Queue a pre-warm job for a freshly saved code submission. A job queued
+    again replaces the previous one, whose later writes are then dropped.
+    """
+    if not PREWARM_ENABLED:
+        return None
+    job_id = uuid.uuid4().hex
+    _record(db, code_id, None, {"prewarm": {"job_id": job_id, "status": "queued", "steps": {}, "queued_at": _now()}})
+    return _executor.submit(run_prewarm, db, code_id, github_url, job_id)
@@ -1,263 +1,289 @@
-import google.generativeai as genai
-import os
 import json
-from dotenv import load_dotenv
 
-load_dotenv()  # Load environment variables from .env
-GEMINI_API_KEY_CODE = os.getenv("GEMINI_API_KEY_CODE")
+from app.utils.comment_pairs import COMMENTS_ACCURACY_INPUT, pack_pairs, resolve_issues
+from app.utils.context_packer import load_sources, map_chunks, pack_chunks, pack_paths, reduce_results
+from app.utils.github_api import fetch_repo_tree
+from app.utils.github_client import parse_repo_url
+from app.utils.llm_gateway import generate, usage_of
+from app.utils.naming_engine import EXCLUDED_DIRS
 
-# Configure Gemini API
-genai.configure(api_key=GEMINI_API_KEY_CODE)
 
-def check_file_naming_conventions(RepoURL):
+def parse_json_response(response_text):
+    """
+    Parse the JSON object in a Gemini answer, tolerating markdown code fences
+    and // comments. Returns {"error", "raw_response"} when it cannot be parsed.
+    """
+    try:
+        text = response_text
+        # Remove any markdown code block formatting if present
+        if "```json" in text:
+            text = text.split("```json")[1].split("```")[0].strip()
+        elif "```" in text:
+            text = text.split("```")[1].split("```")[0].strip()
+
+        try:
+            return json.loads(text)
+        except ValueError:
+            # Remove any comments that could break JSON parsing
+            clean_lines = [line.split('//')[0].strip() for line in text.split('\n')]
+            return json.loads(' '.join(clean_lines))
+    except Exception as e:
+        return {
+            "error": f"Failed to parse response: {str(e)}",
+            "raw_response": response_text
+        }
+
+
+def run_prompt(prompt, caller):
+    """ Send one prompt to Gemini through the LLM gateway; returns (parsed result, token usage) """
+    response = generate(prompt, caller=caller)
+    return parse_json_response(response.text), usage_of(response)
+
+
+def check_file_naming_conventions(RepoURL, sha=None):
     """
     Use Gemini API to check file naming conventions across various programming languages.
+    The repository's file list is sent in token-budgeted chunks, analysed in parallel.
     Returns a JSON object with the analysis results.
     """
-    prompt = f"""
-    You are an AI code analyzer examining GitHub repositories. Analyze the repository at {RepoURL} and check if all files follow standard naming conventions for their respective programming languages or file types.
+    owner, repo = parse_repo_url(RepoURL)
+    _, _, entries = fetch_repo_tree(owner, repo, sha)
+    paths = [
+        entry["path"] for entry in entries
+        if entry["type"] == "blob" and not any(part in EXCLUDED_DIRS for part in entry["path"].split("/")[:-1])
+    ]
+
+    def run_chunk(chunk):
+        prompt = f"""
+        You are an AI code analyzer examining GitHub repositories. Analyze the repository at {RepoURL} and check if all files follow standard naming conventions for their respective programming languages or file types.
 
-    Apply these language-specific naming conventions:
+        Apply these language-specific naming conventions:
     
-    1. Python:
-       - Module files: lowercase with underscores (snake_case), e.g., data_processor.py
-       - Class files: lowercase with underscores, e.g., user_model.py
-       - Test files: test_*.py or *_test.py
+        1. Python:
+           - Module files: lowercase with underscores (snake_case), e.g., data_processor.py
+           - Class files: lowercase with underscores, e.g., user_model.py
+           - Test files: test_*.py or *_test.py
     
-    2. JavaScript/TypeScript:
-       - React components: PascalCase, e.g., UserProfile.jsx, UserProfile.tsx
-       - Regular modules: camelCase, e.g., dataUtils.js, apiClient.ts
-       - Config files: lowercase with hyphens, e.g., webpack-config.js
-       - Test files: *.test.js, *.spec.js
+        2. JavaScript/TypeScript:
+           - React components: PascalCase, e.g., UserProfile.jsx, UserProfile.tsx
+           - Regular modules: camelCase, e.g., dataUtils.js, apiClient.ts
+           - Config files: lowercase with hyphens, e.g., webpack-config.js
+           - Test files: *.test.js, *.spec.js
     
-    3. Java:
-       - Class files: PascalCase matching class name, e.g., UserService.java
-       - Package directories: lowercase, e.g., com/example/project
+        3. Java:
+           - Class files: PascalCase matching class name, e.g., UserService.java
+           - Package directories: lowercase, e.g., com/example/project
     
-    4. C/C++:
-       - Source files: snake_case, e.g., string_utils.c, memory_manager.cpp
-       - Header files: snake_case, e.g., string_utils.h, memory_manager.hpp
+        4. C/C++:
+           - Source files: snake_case, e.g., string_utils.c, memory_manager.cpp
+           - Header files: snake_case, e.g., string_utils.h, memory_manager.hpp
     
-    5. PHP:
-       - Class files: PascalCase matching class name, e.g., UserModel.php
-       - Regular files: lowercase with hyphens, e.g., admin-functions.php
+        5. PHP:
+           - Class files: PascalCase matching class name, e.g., UserModel.php
+           - Regular files: lowercase with hyphens, e.g., admin-functions.php
     
-    6. General rules across all languages:
-       - No spaces in file names
-       - Config files: lowercase with appropriate separators (_, -, .)
-       - Documentation files: uppercase for main docs (README.md, CONTRIBUTING.md)
-       - Hidden files (starting with '.') should only be system or config files
-       - Asset files (images, fonts, etc.): lowercase with hyphens, e.g., hero-image.png
+        6. General rules across all languages:
+           - No spaces in file names
+           - Config files: lowercase with appropriate separators (_, -, .)
+           - Documentation files: uppercase for main docs (README.md, CONTRIBUTING.md)
+           - Hidden files (starting with '.') should only be system or config files
+           - Asset files (images, fonts, etc.): lowercase with hyphens, e.g., hero-image.png
 
-    Exceptions:
-    - Ignore generated files, build directories, and dependency directories like node_modules, .venv, dist, build, etc.
-    - Respect framework-specific conventions (e.g., Next.js, Django, Rails)
-    - Standard names like README.md, LICENSE, Dockerfile are acceptable
+        Exceptions:
+        - Ignore generated files, build directories, and dependency directories like node_modules, .venv, dist, build, etc.
+        - Respect framework-specific conventions (e.g., Next.js, Django, Rails)
+        - Standard names like README.md, LICENSE, Dockerfile are acceptable
     
-    IMPORTANT: Return ONLY a valid JSON object with no additional text, markdown, or formatting, exactly like this:
-    {{"status": "Yes"}} // If all files follow appropriate naming conventions
-    OR
-    {{"status": "No", "invalid_files": [{{"file_name": "filename", "path": "relative_path", "reason": "reason for violation"}}]}} // If errors found
-    """
+        IMPORTANT: Return ONLY a valid JSON object with no additional text, markdown, or formatting, exactly like this:
+        {{"status": "Yes"}} // If all files follow appropriate naming conventions
+        OR
+        {{"status": "No", "invalid_files": [{{"file_name": "filename", "path": "relative_path", "reason": "reason for violation"}}]}} // If errors found
 
-    model = genai.GenerativeModel("gemini-1.5-flash")
-    response = model.generate_content(prompt)
-    
-    try:
-        # Extract the JSON content from the response
-        response_text = response.text
-        # Clean up the response text to ensure it's valid JSON
-        # Remove any markdown code block formatting if present
-        if "```json" in response_text:
-            response_text = response_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in response_text:
-            response_text = response_text.split("```")[1].split("```")[0].strip()
-        
-        # Remove any comments that could break JSON parsing
-        lines = response_text.split('\n')
-        clean_lines = [line.split('//')[0].strip() for line in lines]
-        clean_text = ' '.join(clean_lines)
-            
-        # Parse the cleaned text as JSON
-        result = json.loads(clean_text)
-        return result
-    except Exception as e:
-        return {
-            "error": f"Failed to parse response: {str(e)}", 
-            "raw_response": response.text
-        }
+        The repository contains these files, one path per line relative to the repository root:
+
+{chunk['text']}
+        """
+        return run_prompt(prompt, "repo_analysis.file_naming")
+
+    chunks = pack_paths(paths)
+    return reduce_results(
+        map_chunks(chunks, run_chunk), "invalid_files",
+        lambda item: item.get("path") or item.get("file_name"), "Yes", "No"
+    )
 
-def check_code_naming_conventions(RepoURL):
+def check_code_naming_conventions(RepoURL, sha=None, paths=None):
     """
     Use Gemini API to check code element naming conventions across various programming languages.
     Analyzes variable names, function declarations, class names, etc.
+    The source files (or only those in paths) are packed into token-budgeted chunks
+    that are analysed in parallel.
     Returns a JSON object with the analysis results.
     """
-    prompt = f"""
-    You are an expert code reviewer analyzing a GitHub repository at {RepoURL}. Your analysis must be based SOLELY on the actual code found in this repository - do not make assumptions or include examples from other projects. Examine all code elements including:
+    def run_chunk(chunk):
+        prompt = f"""
+        You are an expert code reviewer analyzing a GitHub repository at {RepoURL}. Your analysis must be based SOLELY on the actual code found in this repository - do not make assumptions or include examples from other projects. Examine all code elements including:
 
-    1. Variable declarations
-    2. Function/method declarations
-    3. Class declarations
-    4. Constants
-    5. Parameter names
-    6. Interface/abstract class names
-    7. Enum declarations
+        1. Variable declarations
+        2. Function/method declarations
+        3. Class declarations
+        4. Constants
+        5. Parameter names
+        6. Interface/abstract class names
+        7. Enum declarations
 
-    Apply these language-specific naming conventions:
+        Apply these language-specific naming conventions:
 
-    [Keep all the existing language convention details exactly as in the original prompt]
+        1. Python: snake_case variables, functions and parameters; PascalCase classes; UPPER_SNAKE_CASE constants
+        2. JavaScript/TypeScript: camelCase variables and functions; PascalCase classes, components, interfaces and types; UPPER_SNAKE_CASE constants
+        3. Java: camelCase variables and methods; PascalCase classes, interfaces and enums; UPPER_SNAKE_CASE constants
+        4. C/C++: snake_case variables and functions; PascalCase or snake_case types used consistently; UPPER_SNAKE_CASE macros and constants
+        5. PHP: camelCase variables and methods; PascalCase classes; UPPER_SNAKE_CASE constants
 
-    For any language, check if:
-    - Names are descriptive and meaningful
-    - No single-letter variables (except in limited contexts like loop counters)
-    - No unnecessarily abbreviated names
-    - No Hungarian notation unless appropriate for framework
-    - Function names reflect actions (verbs)
-    - Class names reflect entities (nouns)
-    - Boolean variables have prefixes like 'is', 'has', 'can', etc.
+        For any language, check if:
+        - Names are descriptive and meaningful
+        - No single-letter variables (except in limited contexts like loop counters)
+        - No unnecessarily abbreviated names
+        - No Hungarian notation unless appropriate for framework
+        - Function names reflect actions (verbs)
+        - Class names reflect entities (nouns)
+        - Boolean variables have prefixes like 'is', 'has', 'can', etc.
 
-    STRICT REQUIREMENTS:
-    1. All findings must be verified against the actual repository content
-    2. File paths must be exact and correct relative to the repository root
-    3. Line numbers must be precise
-    4. Only report issues you can confirm exist in the provided repository
-    5. Never include hypothetical examples or general advice
+        STRICT REQUIREMENTS:
+        1. All findings must be verified against the actual repository content
+        2. File paths must be exact and correct relative to the repository root
+        3. Line numbers must be precise
+        4. Only report issues you can confirm exist in the provided repository
+        5. Never include hypothetical examples or general advice
 
-    Exclude from analysis:
-    - Generated code
-    - Third-party libraries
-    - Known framework conventions that intentionally differ
-    - Build files and configuration
-    - Test fixture data
-    - Any files not actually present in the repository
+        Exclude from analysis:
+        - Generated code
+        - Third-party libraries
+        - Known framework conventions that intentionally differ
+        - Build files and configuration
+        - Test fixture data
+        - Any files not actually present in the repository
 
-    IMPORTANT: Return ONLY a valid JSON object with no additional text, markdown, or formatting, following this exact structure:
-    {{"status": "Yes"}} // If all code elements follow appropriate naming conventions
-    OR
-    {{"status": "No", "issues": [
-        {{
-            "file_path": "exact/correct/path/from/repo/root/file.ext", // MUST be accurate
-            "line_number": 42, // MUST be precise
-            "element_type": "variable|function|class|etc", // MUST match actual element
-            "element_name": "badlyNamedVariable", // MUST be the exact name found
-            "suggested_name": "properly_named_variable", // MUST follow conventions
-            "reason": "Concise explanation based ONLY on repository content"
-        }}
-    ]}}
+        IMPORTANT: Return ONLY a valid JSON object with no additional text, markdown, or formatting, following this exact structure:
+        {{"status": "Yes"}} // If all code elements follow appropriate naming conventions
+        OR
+        {{"status": "No", "issues": [
+            {{
+                "file_path": "exact/correct/path/from/repo/root/file.ext", // MUST be accurate
+                "line_number": 42, // MUST be precise
+                "element_type": "variable|function|class|etc", // MUST match actual element
+                "element_name": "badlyNamedVariable", // MUST be the exact name found
+                "suggested_name": "properly_named_variable", // MUST follow conventions
+                "reason": "Concise explanation based ONLY on repository content"
+            }}
+        ]}}
 
-    DO NOT include any markdown formatting, additional explanations, or text outside the JSON object. The response must be parseable as pure JSON.
-    """
+        DO NOT include any markdown formatting, additional explanations, or text outside the JSON object. The response must be parseable as pure JSON.
 
-    model = genai.GenerativeModel("gemini-1.5-flash")
-    response = model.generate_content(prompt)
-    
-    try:
-        # Extract the JSON content from the response
-        response_text = response.text
-        
-        # Clean up the response text to ensure it's valid JSON
-        if "```json" in response_text:
-            response_text = response_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in response_text:
-            response_text = response_text.split("```")[1].split("```")[0].strip()
-        
-        # Remove any comments that could break JSON parsing
-        lines = response_text.split('\n')
-        clean_lines = [line.split('//')[0].strip() for line in lines]
-        clean_text = ' '.join(clean_lines)
-            
-        # Parse the cleaned text as JSON
-        result = json.loads(clean_text)
-        return result
-    except Exception as e:
-        return {
-            "error": f"Failed to parse response: {str(e)}", 
-            "raw_response": response.text
-        }
+        The repository files for this part of the analysis follow, each line prefixed with its line number.
+        Report only issues found in these files, using the paths and line numbers exactly as shown.
+
+{chunk['text']}
+        """
+        return run_prompt(prompt, "repo_analysis.code_naming")
 
-def check_code_comments_accuracy(RepoURL):
+    chunks, skipped = pack_chunks(load_sources(RepoURL, sha, paths))
+    result = reduce_results(
+        map_chunks(chunks, run_chunk), "issues",
+        lambda issue: (issue.get("file_path"), issue.get("line_number"), issue.get("element_name")), "Yes", "No"
+    )
+    result["usage"]["skipped_files"] = len(skipped)
+    return result
+
+def check_code_comments_accuracy(RepoURL, sha=None, paths=None, mode=None):
     """
     Use Gemini API to check if code comments accurately match and describe the code content.
     Analyzes comment relevance, accuracy, and completeness across all files in a repository.
+    By default (mode "pairs") only the comments of the source files (or of those in paths)
+    are sent, each with the code it describes; mode "files" sends the whole files.
+    Either way the input is packed into token-budgeted chunks that are analysed in parallel.
     Returns a JSON object with the analysis results.
     """
-    prompt = f"""
-    You are an expert code reviewer analyzing a GitHub repository at {RepoURL}. Examine the relationship between comments and code to ensure comments are accurate, relevant, and helpful. Focus on:
+    pairs = (mode or COMMENTS_ACCURACY_INPUT) == "pairs"
+    if pairs:
+        pair_field = '"pair_id": "P3", // The id shown before the comment\n                '
+        source_note = """The comments to review follow, grouped by file. Each starts with its id in brackets (e.g. [P3]),
+        its type and line numbers, then the numbered comment lines and, under "code:", the numbered code it describes.
+        Judge each comment against the code shown with it, and report only issues with these comments, giving their ids."""
+    else:
+        pair_field = ""
+        source_note = """The repository files for this part of the analysis follow, each line prefixed with its line number.
+        Report only issues found in these files, using the paths and line numbers exactly as shown."""
+
+    def run_chunk(chunk):
+        prompt = f"""
+        You are an expert code reviewer analyzing a GitHub repository at {RepoURL}. Examine the relationship between comments and code to ensure comments are accurate, relevant, and helpful. Focus on:
     
-    1. Function/method docstrings
-    2. Class documentation
-    3. Inline comments
-    4. Block comments
-    5. Module/file header comments
+        1. Function/method docstrings
+        2. Class documentation
+        3. Inline comments
+        4. Block comments
+        5. Module/file header comments
     
-    For each code file, analyze if:
+        For each code file, analyze if:
     
-    - Comments accurately describe what the code actually does (not what it's supposed to do)
-    - Function/method docstrings correctly document parameters, return values, and exceptions
-    - Comments explain "why" for complex logic, not just restate the code
-    - Comments are present for non-obvious code sections
-    - Outdated comments that no longer match the current code implementation
-    - Comments that contradict the actual behavior of the code
-    - Missing documentation for public APIs, classes, or functions
-    - Excessive commenting of self-explanatory code
+        - Comments accurately describe what the code actually does (not what it's supposed to do)
+        - Function/method docstrings correctly document parameters, return values, and exceptions
+        - Comments explain "why" for complex logic, not just restate the code
+        - Comments are present for non-obvious code sections
+        - Outdated comments that no longer match the current code implementation
+        - Comments that contradict the actual behavior of the code
+        - Missing documentation for public APIs, classes, or functions
+        - Excessive commenting of self-explanatory code
     
-    Exclude from analysis:
-    - Generated code
-    - Third-party libraries
-    - Build files and configuration
-    - Test fixture data
-    - TODO comments (these are meant to be temporary)
+        Exclude from analysis:
+        - Generated code
+        - Third-party libraries
+        - Build files and configuration
+        - Test fixture data
+        - TODO comments (these are meant to be temporary)
     
-    IMPORTANT: Return ONLY a valid JSON object with no additional text, markdown, or formatting, following this exact structure:
-    {{"status": "Pass"}} // If all code comments match their code content appropriately
-    OR
-    {{"status": "Fail", "issues": [
-        {{
-            "file_path": "path/to/file.ext",
-            "line_number": 42,
-            "comment_type": "docstring|inline|block|header",
-            "actual_comment": "The existing comment text",
-            "issue": "Concise explanation of the mismatch or problem",
-            "suggestion": "Proposed improved comment that would accurately describe the code"
-        }}
-    ]}}
+        IMPORTANT: Return ONLY a valid JSON object with no additional text, markdown, or formatting, following this exact structure:
+        {{"status": "Pass"}} // If all code comments match their code content appropriately
+        OR
+        {{"status": "Fail", "issues": [
+            {{
+                {pair_field}"file_path": "path/to/file.ext",
+                "line_number": 42,
+                "comment_type": "docstring|inline|block|header",
+                "actual_comment": "The existing comment text",
+                "issue": "Concise explanation of the mismatch or problem",
+                "suggestion": "Proposed improved comment that would accurately describe the code"
+            }}
+        ]}}
     
-    Analyze the content and relationships deeply, checking if comments:
-    1. Make false claims about what the code does
-    2. Miss critical details about edge cases or assumptions
-    3. Describe functionality that was changed or removed
-    4. Document parameters that don't exist or miss parameters that do exist
-    5. Claim return values different from what the code actually returns
-    6. Mention error handling that doesn't match implementation
+        Analyze the content and relationships deeply, checking if comments:
+        1. Make false claims about what the code does
+        2. Miss critical details about edge cases or assumptions
+        3. Describe functionality that was changed or removed
+        4. Document parameters that don't exist or miss parameters that do exist
+        5. Claim return values different from what the code actually returns
+        6. Mention error handling that doesn't match implementation
     
-    For docstrings specifically, validate that they follow the appropriate format for the language
-    (e.g., PEP 257 for Python, JSDoc for JavaScript) and contain all required sections.
-    """
+        For docstrings specifically, validate that they follow the appropriate format for the language
+        (e.g., PEP 257 for Python, JSDoc for JavaScript) and contain all required sections.
 
-    model = genai.GenerativeModel("gemini-1.5-flash")
-    response = model.generate_content(prompt)
-    
-    try:
-        # Extract the JSON content from the response
-        response_text = response.text
-        
-        # Clean up the response text to ensure it's valid JSON
-        if "```json" in response_text:
-            response_text = response_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in response_text:
-            response_text = response_text.split("```")[1].split("```")[0].strip()
-        
-        # Remove any comments that could break JSON parsing
-        lines = response_text.split('\n')
-        clean_lines = [line.split('//')[0].strip() for line in lines]
-        clean_text = ' '.join(clean_lines)
-            
-        # Parse the cleaned text as JSON
-        result = json.loads(clean_text)
-        return result
-    except Exception as e:
-        return {
-            "error": f"Failed to parse response: {str(e)}", 
-            "raw_response": response.text
-        }
\ No newline at end of file
+        {source_note}
+
+{chunk['text']}
+        """
+        result, usage = run_prompt(prompt, "repo_analysis.comments_accuracy")
+        if pairs:
+            # Paths, lines and comment texts come from the extracted pairs, not the model.
+            result = resolve_issues(chunk, result)
+        return result, usage
+
+    sources = load_sources(RepoURL, sha, paths)
+    chunks, skipped = pack_pairs(sources) if pairs else pack_chunks(sources)
+    result = reduce_results(
+        map_chunks(chunks, run_chunk), "issues",
+        lambda issue: (issue.get("file_path"), issue.get("line_number"), issue.get("actual_comment")), "Pass", "Fail"
+    )
+    result["usage"]["skipped_files"] = len(skipped)
+    if pairs:
+        result["usage"]["pairs"] = sum(len(chunk["pairs"]) for chunk in chunks)
+    return result
@@ -0,0 +1,386 @@
+import hashlib
+import json
+import os
+import posixpath
+import re
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from app.config import cache_dir
+from app.utils.blob_store import get_blob_store
+from app.utils.github_client import github_get
+
+try:
+    import fcntl  # Serialises ingestion across gunicorn workers (POSIX only)
+except ImportError:
+    fcntl = None
+
+REPO_SNAPSHOTS_ENABLED = os.getenv("REPO_SNAPSHOTS_ENABLED", "true").lower() == "true"
+SNAPSHOT_MAX_BYTES = int(os.getenv("SNAPSHOT_MAX_BYTES", str(5 * 1024 ** 3)))
+SNAPSHOT_MAX_AGE_SECONDS = int(os.getenv("SNAPSHOT_MAX_AGE_HOURS", "72")) * 3600
+# Repositories with a bigger tarball are left to the contents API.
+SNAPSHOT_MAX_TARBALL_BYTES = int(os.getenv("SNAPSHOT_MAX_TARBALL_BYTES", str(500 * 1024 ** 2)))
+# Snapshots used this recently are never evicted: a request may still be reading them.
+SNAPSHOT_EVICT_GRACE_SECONDS = int(os.getenv("SNAPSHOT_EVICT_GRACE_SECONDS", "600"))
+# How long a resolved HEAD is trusted before asking GitHub again.
+HEAD_SHA_TTL_SECONDS = int(os.getenv("HEAD_SHA_TTL_SECONDS", "60"))
+
+MANIFEST_NAME = ".saat-manifest.json"
+CHUNK_SIZE = 1024 * 1024
+
+_COMMIT_SHA_PATTERN = re.compile(r"^[0-9a-f]{40}$")
+
+
+class SnapshotError(Exception):
+    """ Raised when a repository cannot be snapshotted """
+
+
+class Snapshot:
+    """
+    Immutable local copy of a repository at one commit.
+    The manifest lists every file with its size and git blob SHA, so directory
+    listings never touch the filesystem tree.
+    """
+
+    def __init__(self, root, manifest):
+        self.root = root
+        self.owner = manifest["owner"]
+        self.repo = manifest["repo"]
+        self.sha = manifest["sha"]
+        self.entries = manifest["entries"]
+        self._children = {}
+        for path in self.entries:
+            parent = posixpath.dirname(path)
+            self._children.setdefault(parent, []).append(path)
+
+    def is_dir(self, path):
+        return path == "" or self.entries.get(path, {}).get("type") == "dir"
+
+    def is_file(self, path):
+        return self.entries.get(path, {}).get("type") == "file"
+
+    def entry(self, path):
+        """ One item in the shape of the GitHub contents API """
+        info = self.entries[path]
+        return {
+            "name": posixpath.basename(path),
+            "path": path,
+            "type": info["type"],
+            "sha": info.get("sha"),
+            "size": info.get("size", 0),
+        }
+
+    def list_directory(self, path=""):
+        """ Directory listing in contents-API shape (directories first), or None """
+        path = path.strip("/")
+        if not self.is_dir(path):
+            return None
+        items = [self.entry(child) for child in self._children.get(path, [])]
+        items.sort(key=lambda item: (item["type"] != "dir", item["name"].lower()))
+        return items
+
+    def file_path(self, path):
+        """ Absolute path of a file inside the snapshot, or None """
+        path = path.strip("/")
+        if not self.is_file(path):
+            return None
+        return os.path.join(self.root, *path.split("/"))
+
+    def read_file(self, path):
+        file_path = self.file_path(path)
+        if file_path is None:
+            return None
+        with open(file_path, "rb") as f:
+            return f.read()
+
+    def files(self):
+        """ (path, entry) pairs for every regular file """
+        return [(path, info) for path, info in self.entries.items() if info["type"] == "file"]
+
+
+_head_cache = {}
+_head_cache_lock = threading.Lock()
+
+
+def resolve_head_sha(owner, repo, ref=None):
+    """ Resolve a branch / tag / HEAD to a commit SHA (cached for HEAD_SHA_TTL_SECONDS) """
+    if ref and _COMMIT_SHA_PATTERN.match(ref):
+        return ref  # Already a full commit SHA
+    key = (owner.lower(), repo.lower(), ref or "HEAD")
+    now = time.time()
+    with _head_cache_lock:
+        cached = _head_cache.get(key)
+    if cached and now - cached[1] < HEAD_SHA_TTL_SECONDS:
+        return cached[0]
+
+    response = github_get(
+        f"/repos/{owner}/{repo}/commits/{ref or 'HEAD'}",
+        headers={"Accept": "application/vnd.github.sha"},
+    )
+    if not response.ok:
+        raise SnapshotError(f"Could not resolve {ref or 'HEAD'} of {owner}/{repo}: {response.status_code}")
+    sha = response.text.strip()
+
+    with _head_cache_lock:
+        _head_cache[key] = (sha, now)
+    return sha
+
+
+def _snapshot_root(owner, repo, sha):
+    return os.path.join(cache_dir("snapshots"), owner.lower(), repo.lower(), sha)
+
+
+def _load(root):
+    try:
+        with open(os.path.join(root, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    os.utime(root)  # LRU position for size-based eviction
+    return Snapshot(root, manifest)
+
+
+_key_locks = {}
+_key_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _ingest_lock(owner, repo, sha):
+    """ One ingestion per (owner, repo, sha) across threads and worker processes """
+    key = f"{owner.lower()}__{repo.lower()}__{sha}"
+    with _key_locks_guard:
+        thread_lock = _key_locks.setdefault(key, threading.Lock())
+    with thread_lock:
+        if fcntl is None:
+            yield
+            return
+        lock_path = os.path.join(cache_dir("snapshots/.locks"), key)
+        with open(lock_path, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _too_large_path(owner, repo, sha):
+    return os.path.join(cache_dir("snapshots/.too-large"), f"{owner.lower()}__{repo.lower()}__{sha}")
+
+
+def _mark_too_large(owner, repo, sha, size):
+    """ Remember that a commit's tarball exceeded the limit, so it is not downloaded again """
+    try:
+        with open(_too_large_path(owner, repo, sha), "w") as f:
+            json.dump({"size_at_least": size, "created_at": time.time()}, f)
+    except OSError as e:
+        print(f"Could not record oversized snapshot {owner}/{repo}@{sha}: {e}")
+
+
+def _check_too_large(owner, repo, sha):
+    try:
+        with open(_too_large_path(owner, repo, sha)) as f:
+            size = json.load(f).get("size_at_least", 0)
+    except (OSError, ValueError):
+        return
+    # Raising SNAPSHOT_MAX_TARBALL_BYTES lets the commit be tried again.
+    if size > SNAPSHOT_MAX_TARBALL_BYTES:
+        raise SnapshotError(f"{owner}/{repo}@{sha} exceeds SNAPSHOT_MAX_TARBALL_BYTES")
+
+
+def get_snapshot(owner, repo, ref=None):
+    """
+    Return the snapshot of owner/repo at ref (a commit SHA, branch or tag;
+    HEAD when omitted), downloading the tarball once if no worker has
+    ingested that commit yet. Commits found too large are remembered and
+    fail without a download.
+    """
+    sha = ref if ref and _COMMIT_SHA_PATTERN.match(ref) else resolve_head_sha(owner, repo, ref)
+    root = _snapshot_root(owner, repo, sha)
+    snapshot = _load(root)
+    if snapshot is not None:
+        return snapshot
+    _check_too_large(owner, repo, sha)
+
+    with _ingest_lock(owner, repo, sha):
+        snapshot = _load(root)  # Another worker may have finished meanwhile
+        if snapshot is None:
+            _check_too_large(owner, repo, sha)
+            _ingest(owner, repo, sha, root)
+            snapshot = _load(root)
+
+    evict_snapshots()
+    return snapshot
+
+
+def find_snapshot(owner, repo, sha):
+    """ Return an already-ingested snapshot without downloading anything """
+    return _load(_snapshot_root(owner, repo, sha))
+
+
+def _safe_member_path(name):
+    """ Strip GitHub's '<owner>-<repo>-<sha>/' prefix and reject unsafe paths """
+    parts = name.split("/", 1)
+    if len(parts) < 2 or not parts[1]:
+        return None
+    path = posixpath.normpath(parts[1])
+    if path.startswith("/") or path == ".." or path.startswith("../") or path == MANIFEST_NAME:
+        return None
+    return path
+
+
+def _ingest(owner, repo, sha, root):
+    response = github_get(f"/repos/{owner}/{repo}/tarball/{sha}", stream=True)
+    if not response.ok:
+        response.close()
+        raise SnapshotError(f"Tarball download for {owner}/{repo}@{sha} failed: {response.status_code}")
+
+    parent = os.path.dirname(root)
+    os.makedirs(parent, exist_ok=True)
+    tmp_root = tempfile.mkdtemp(prefix=".ingest-", dir=parent)
+    blob_store = get_blob_store()
+    entries = {}
+    total_size = 0
+
+    try:
+        response.raw.decode_content = True
+        with tarfile.open(fileobj=response.raw, mode="r|gz") as archive:
+            for member in archive:
+                path = _safe_member_path(member.name)
+                if path is None:
+                    continue
+                target = os.path.join(tmp_root, *path.split("/"))
+
+                if member.isdir():
+                    os.makedirs(target, exist_ok=True)
+                    entries[path] = {"type": "dir"}
+                    continue
+                if not member.isfile():
+                    continue  # Symlinks, devices and the like are not served
+
+                total_size += member.size
+                if total_size > SNAPSHOT_MAX_TARBALL_BYTES:
+                    _mark_too_large(owner, repo, sha, total_size)
+                    raise SnapshotError(f"{owner}/{repo}@{sha} exceeds SNAPSHOT_MAX_TARBALL_BYTES")
+
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                digest = hashlib.sha1(f"blob {member.size}\0".encode())
+                source = archive.extractfile(member)
+                with open(target, "wb") as f:
+                    for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                        digest.update(chunk)
+                        f.write(chunk)
+                blob_sha = digest.hexdigest()
+                _share_with_blob_store(blob_store, blob_sha, target)
+
+                entries[path] = {"type": "file", "size": member.size, "sha": blob_sha}
+                # Parent directories are not always listed before their files.
+                parent_path = posixpath.dirname(path)
+                while parent_path and parent_path not in entries:
+                    entries[parent_path] = {"type": "dir"}
+                    parent_path = posixpath.dirname(parent_path)
+
+        manifest = {
+            "owner": owner,
+            "repo": repo,
+            "sha": sha,
+            "created_at": time.time(),
+            "total_size": total_size,
+            "entries": entries,
+        }
+        with open(os.path.join(tmp_root, MANIFEST_NAME), "w") as f:
+            json.dump(manifest, f)
+
+        # Publishing is a single rename, so readers only ever see complete snapshots.
+        try:
+            os.rename(tmp_root, root)
+        except OSError:
+            if not os.path.exists(os.path.join(root, MANIFEST_NAME)):
+                raise
+            shutil.rmtree(tmp_root, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp_root, ignore_errors=True)
+        raise
+    finally:
+        response.close()
+
+
+def _share_with_blob_store(blob_store, blob_sha, target):
+    """
+    Deduplicate file content with the blob store: identical files in other
+    snapshots, forks and re-submissions end up as hard links to one inode.
+    """
+    try:
+        existing = blob_store.path_for(blob_sha)
+        if existing is not None:
+            os.remove(target)
+            os.link(existing, target)
+        else:
+            blob_store.adopt(target, blob_sha)
+    except OSError as e:
+        # Hard links need both trees on one filesystem; the snapshot copy is enough.
+        if not os.path.exists(target):
+            raise SnapshotError(f"Could not write {target}: {e}")
+
+
+def _remove_snapshot(root):
+    """ Unpublish a snapshot with one rename (new readers re-ingest it), then delete it """
+    trash = os.path.join(os.path.dirname(root), f".evict-{os.path.basename(root)}-{os.getpid()}-{threading.get_ident()}")
+    try:
+        os.rename(root, trash)
+    except OSError:
+        return
+    shutil.rmtree(trash, ignore_errors=True)
+
+
+def evict_snapshots():
+    """
+    Drop snapshots older than SNAPSHOT_MAX_AGE_HOURS, then LRU ones above
+    SNAPSHOT_MAX_BYTES. Snapshots loaded in the last SNAPSHOT_EVICT_GRACE_SECONDS
+    are kept either way, as a request may still be reading them.
+    """
+    base = cache_dir("snapshots")
+    snapshots = []
+    now = time.time()
+
+    for name in os.listdir(cache_dir("snapshots/.too-large")):
+        marker = os.path.join(cache_dir("snapshots/.too-large"), name)
+        try:
+            if now - os.stat(marker).st_mtime > SNAPSHOT_MAX_AGE_SECONDS:
+                os.remove(marker)
+        except OSError:
+            continue
+
+    for owner in os.listdir(base):
+        owner_dir = os.path.join(base, owner)
+        if owner.startswith(".") or not os.path.isdir(owner_dir):
+            continue
+        for repo in os.listdir(owner_dir):
+            repo_dir = os.path.join(owner_dir, repo)
+            for sha in os.listdir(repo_dir):
+                root = os.path.join(repo_dir, sha)
+                if sha.startswith("."):
+                    continue  # Ingestion in progress
+                try:
+                    with open(os.path.join(root, MANIFEST_NAME)) as f:
+                        manifest = json.load(f)
+                    accessed_at = os.stat(root).st_mtime
+                except (OSError, ValueError):
+                    continue
+                in_use = now - accessed_at < SNAPSHOT_EVICT_GRACE_SECONDS
+                if now - manifest.get("created_at", 0) > SNAPSHOT_MAX_AGE_SECONDS and not in_use:
+                    _remove_snapshot(root)
+                    continue
+                snapshots.append((accessed_at, manifest.get("total_size", 0), root, in_use))
+
+    total = sum(size for _, size, _, _ in snapshots)
+    for _, size, root, in_use in sorted(snapshots):
+        if total <= SNAPSHOT_MAX_BYTES:
+            break
+        if in_use:
+            continue
+        _remove_snapshot(root)
+        total -= size
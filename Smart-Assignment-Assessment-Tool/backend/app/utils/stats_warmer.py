@@ -0,0 +1,181 @@
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+
+from app.config import cache_dir
+from app.utils.git_mirror import GIT_MIRRORS_ENABLED, MirrorError, contributor_stats_from_mirror
+from app.utils.github_cache import LRUCache
+from app.utils.github_client import github_get
+from app.utils.github_scheduler import BATCH, INTERACTIVE, github_priority
+from app.utils.repo_snapshot import resolve_head_sha
+
+STATS_WARMER_WORKERS = int(os.getenv("STATS_WARMER_WORKERS", "2"))
+# Warm-ups a request is waiting on run on their own threads, never behind batch jobs.
+STATS_INTERACTIVE_WORKERS = int(os.getenv("STATS_INTERACTIVE_WORKERS", "4"))
+# Cohort loads warm one repository per submission; sized like the cohort fan-out (COHORT_MAX_WORKERS).
+STATS_COHORT_WORKERS = int(os.getenv("STATS_COHORT_WORKERS", os.getenv("COHORT_MAX_WORKERS", "16")))
+# Give up on a repository GitHub is still computing after this long.
+STATS_WARM_TIMEOUT = float(os.getenv("STATS_WARM_TIMEOUT", "300"))
+STATS_POLL_MAX_DELAY = float(os.getenv("STATS_POLL_MAX_DELAY", "30"))
+
+COHORT = "cohort"  # Lane of the cohort view's warm-ups
+
+# lane -> executor; a lower rank overtakes a job still queued in a higher-ranked lane.
+_executors = {
+    INTERACTIVE: ThreadPoolExecutor(max_workers=STATS_INTERACTIVE_WORKERS, thread_name_prefix="stats-interactive"),
+    COHORT: ThreadPoolExecutor(max_workers=STATS_COHORT_WORKERS, thread_name_prefix="stats-cohort"),
+    BATCH: ThreadPoolExecutor(max_workers=STATS_WARMER_WORKERS, thread_name_prefix="stats-warmer"),
+}
+_LANE_RANK = {INTERACTIVE: 0, COHORT: 1, BATCH: 2}
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+_memory = LRUCache(int(os.getenv("STATS_CACHE_MAX_ENTRIES", "1000")))
+
+
+class StatsUnavailableError(Exception):
+    """ Raised when GitHub did not produce contributor statistics in time """
+
+
+def _cache_path(owner, repo, sha):
+    return os.path.join(cache_dir("stats"), f"{owner.lower()}__{repo.lower()}__{sha}.json")
+
+
+def get_cached_stats(owner, repo, sha):
+    """
+    Contributor statistics for owner/repo at commit sha as {login: entry},
+    or None when they have not been warmed yet.
+    """
+    key = (owner.lower(), repo.lower(), sha)
+    stats = _memory.get(key)
+    if stats is not None:
+        return stats
+    try:
+        with open(_cache_path(owner, repo, sha)) as f:
+            stats = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    _memory.set(key, stats)
+    return stats
+
+
+def _store(owner, repo, sha, contributors):
+    stats = {}
+    for contributor in contributors or []:
+        login = (contributor.get("author") or {}).get("login")
+        if login:
+            contributor["weeks"] = sorted(contributor.get("weeks", []), key=lambda week: week.get("w", 0))
+            stats[login.lower()] = contributor
+
+    # Written atomically so other workers never read half a file.
+    path = _cache_path(owner, repo, sha)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(fd, "w") as f:
+        json.dump(stats, f)
+    os.replace(tmp_path, path)
+    _memory.set((owner.lower(), repo.lower(), sha), stats)
+    return stats
+
+
+def _warm(owner, repo, sha, priority):
+    """
+    Compute the statistics from a local git mirror when mirrors are enabled;
+    otherwise (or if git fails) poll /stats/contributors with backoff until
+    GitHub has computed it.
+    """
+    stats = get_cached_stats(owner, repo, sha)
+    if stats is not None:
+        return stats  # Warmed by a job that overtook this one
+    deadline = time.monotonic() + STATS_WARM_TIMEOUT
+    delay = 1.0
+    with github_priority(priority):
+        if GIT_MIRRORS_ENABLED:
+            try:
+                return _store(owner, repo, sha, contributor_stats_from_mirror(owner, repo, sha))
+            except MirrorError as e:
+                print(f"Git mirror unavailable for {owner}/{repo}, using GitHub statistics: {e}")
+
+        while True:
+            response = github_get(f"/repos/{owner}/{repo}/stats/contributors")
+            if response.status_code == 200:
+                return _store(owner, repo, sha, response.json())
+            if response.status_code == 204:
+                return _store(owner, repo, sha, [])  # Empty repository
+            if response.status_code != 202:
+                raise StatsUnavailableError(f"GitHub API error: {response.status_code}")
+            if time.monotonic() + delay > deadline:
+                raise StatsUnavailableError("GitHub is still calculating statistics")
+            # 202: GitHub started computing; come back later.
+            time.sleep(delay + random.uniform(0, delay / 2))
+            delay = min(delay * 2, STATS_POLL_MAX_DELAY)
+
+
+def warm_contributor_stats(owner, repo, sha=None, priority=BATCH, lane=None):
+    """
+    Make sure contributor statistics for the repository's HEAD get computed
+    and cached. Returns a Future resolving to {login: entry}; concurrent calls
+    for the same commit share one warm-up. The job runs in the executor of
+    `lane` (default: the priority's), so interactive warm-ups never wait
+    behind batch ones; one still queued in a slower lane is overtaken.
+    """
+    lane = lane or priority
+    sha = sha or resolve_head_sha(owner, repo)
+    stats = get_cached_stats(owner, repo, sha)
+    if stats is not None:
+        future = Future()
+        future.set_result(stats)
+        return future
+
+    key = (owner.lower(), repo.lower(), sha)
+    with _in_flight_lock:
+        queued = _in_flight.get(key)
+        if queued is not None:
+            future, queued_lane = queued
+            if future.running() or future.done() or _LANE_RANK[queued_lane] <= _LANE_RANK[lane]:
+                return future
+        future = _executors[lane].submit(_warm, owner, repo, sha, priority)
+        _in_flight[key] = (future, lane)
+
+    def _forget(_):
+        with _in_flight_lock:
+            if _in_flight.get(key, (None, None))[0] is future:
+                _in_flight.pop(key, None)
+
+    future.add_done_callback(_forget)
+    return future
+
+
+def contributor_activity(entry):
+    """ Weekly series and totals for one contributor in the shape the frontend charts """
+    weeks_data = entry.get("weeks", [])
+    activity_data = []
+    for i, week in enumerate(weeks_data):
+        week_timestamp = week.get('w', 0)
+        week_date = datetime.fromtimestamp(week_timestamp).strftime('%Y-%m-%d')
+        activity_data.append({
+            'week': f"Week {i+1}",
+            'commits': week.get('c', 0),
+            'additions': week.get('a', 0),
+            'deletions': week.get('d', 0),
+            'date': week_date
+        })
+
+    return {
+        "activity_data": activity_data,
+        "total_commits": entry.get('total', 0),
+        "total_additions": sum(week.get('a', 0) for week in weeks_data),
+        "total_deletions": sum(week.get('d', 0) for week in weeks_data)
+    }
+
+
+def contributors_from_stats(stats):
+    """ Contributors in the shape of GitHub's /contributors, most commits first """
+    contributors = [
+        {**entry["author"], "contributions": entry.get("total", 0)}
+        for entry in stats.values()
+    ]
+    return sorted(contributors, key=lambda contributor: contributor["contributions"], reverse=True)
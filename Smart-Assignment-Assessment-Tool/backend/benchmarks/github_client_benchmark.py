@@ -0,0 +1,96 @@
+"""
+Micro-benchmark for the pooled GitHub client.
+
+Starts a local stub of the GitHub API and times back-to-back GET requests made
+with a bare requests.get (new connection per call, which is what the routes used
+to do) against app.utils.github_client.github_get (shared keep-alive pool).
+
+A per-connection delay stands in for the TCP + TLS handshake to api.github.com,
+which never shows up on loopback.
+
+Usage (from the backend directory):
+    python benchmarks/github_client_benchmark.py --requests 200 --handshake-ms 40
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+# Register the `app` package without running app/__init__.py, which would
+# initialise Firebase; the benchmark only needs the GitHub client.
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+_app_package = types.ModuleType("app")
+_app_package.__path__ = [os.path.join(BACKEND_DIR, "app")]
+sys.modules.setdefault("app", _app_package)
+
+from app.utils import github_client  # noqa: E402
+
+PAYLOAD = json.dumps({"name": "stub-repo", "full_name": "owner/stub-repo", "size": 42}).encode()
+
+
+def make_handler(handshake_delay):
+    class StubGitHubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            # Runs once per new connection, so pooled requests only pay it once.
+            time.sleep(handshake_delay)
+            super().setup()
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(PAYLOAD)))
+            self.end_headers()
+            self.wfile.write(PAYLOAD)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubGitHubHandler
+
+
+def time_requests(label, fetch, url, count):
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = fetch(url)
+        response.content
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:<24} mean {statistics.mean(latencies):7.2f} ms   "
+          f"p50 {statistics.median(latencies):7.2f} ms   p95 {p95:7.2f} ms")
+    return statistics.mean(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100, help="requests per client")
+    parser.add_argument("--handshake-ms", type=float, default=30.0, help="simulated connection setup cost")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.handshake_ms / 1000))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/repos/owner/stub-repo"
+
+    print(f"{args.requests} sequential GETs, {args.handshake_ms:.0f} ms simulated handshake\n")
+    bare = time_requests("bare requests.get", lambda u: requests.get(u, timeout=10), url, args.requests)
+    pooled = time_requests("pooled github_get", github_client.github_get, url, args.requests)
+    print(f"\nspeed-up: {bare / pooled:.1f}x")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
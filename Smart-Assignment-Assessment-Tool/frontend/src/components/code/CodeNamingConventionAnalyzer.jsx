@@ -140,9 +140,11 @@ const CodeNamingConventionAnalyzer = ({ github_url, code_id, onBack }) => {
                   <p className="text-sm text-gray-600 dark:text-gray-300">
                     <span className="font-medium">Type:</span> {issue.element_type}
                   </p>
-                  <p className="text-sm text-gray-600 dark:text-gray-300">
-                    <span className="font-medium">Suggested:</span> {issue.suggested_name}
-                  </p>
+                  {issue.suggested_name && (
+                    <p className="text-sm text-gray-600 dark:text-gray-300">
+                      <span className="font-medium">Suggested:</span> {issue.suggested_name}
+                    </p>
+                  )}
                   <p className="text-sm text-gray-600 dark:text-gray-300">
                     <span className="font-medium">Issue:</span> {issue.reason}
                   </p>
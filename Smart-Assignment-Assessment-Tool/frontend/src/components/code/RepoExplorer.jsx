@@ -39,16 +39,26 @@ const RepoExplorer = ({ repoUrl , codeId }) => {
     const fetchRootContents = async () => {
       try {
         setIsLoading(true);
+        // One call for the whole tree; every directory is then expanded locally.
         const response = await axios.get(
-          `${import.meta.env.VITE_BACKEND_URL}/repo/repo-contents`,
+          `${import.meta.env.VITE_BACKEND_URL}/repo/tree`,
           { params: { repo_url: repoUrl } },
         );
-        setContents((prev) => ({
-          ...prev,
-          "": response.data,
-        }));
-      } catch (error) {
-        console.error("Error fetching repository contents:", error);
+        setContents(groupTreeByDirectory(response.data.tree));
+      } catch (treeError) {
+        console.error("Error fetching repository tree:", treeError);
+        try {
+          const response = await axios.get(
+            `${import.meta.env.VITE_BACKEND_URL}/repo/repo-contents`,
+            { params: { repo_url: repoUrl } },
+          );
+          setContents((prev) => ({
+            ...prev,
+            "": response.data,
+          }));
+        } catch (error) {
+          console.error("Error fetching repository contents:", error);
+        }
       } finally {
         setIsLoading(false);
       }
@@ -56,6 +66,31 @@ const RepoExplorer = ({ repoUrl , codeId }) => {
     fetchRootContents();
   }, [repoUrl]);
 
+  const groupTreeByDirectory = (tree) => {
+    const grouped = { "": [] };
+    tree.forEach((entry) => {
+      if (entry.type === "commit") return; // submodules have no browsable content
+      const slash = entry.path.lastIndexOf("/");
+      const parent = slash === -1 ? "" : entry.path.slice(0, slash);
+      const item = {
+        name: entry.path.slice(slash + 1),
+        path: entry.path,
+        sha: entry.sha,
+        size: entry.size,
+        type: entry.type === "tree" ? "dir" : "file",
+      };
+      if (!grouped[parent]) grouped[parent] = [];
+      grouped[parent].push(item);
+      if (item.type === "dir" && !grouped[item.path]) grouped[item.path] = [];
+    });
+    Object.values(grouped).forEach((items) =>
+      items.sort((a, b) =>
+        a.type === b.type ? a.name.localeCompare(b.name) : a.type === "dir" ? -1 : 1,
+      ),
+    );
+    return grouped;
+  };
+
   const fetchSubdirectoryContents = async (itemPath) => {
     try {
       setLoadingPaths(prev => new Set(prev).add(itemPath));
@@ -106,7 +141,7 @@ const RepoExplorer = ({ repoUrl , codeId }) => {
         setLoadingPaths(prev => new Set(prev).add(item.path));
         const response = await axios.get(
           `${import.meta.env.VITE_BACKEND_URL}/repo/file-content`,
-          { params: { repo_url: repoUrl, path: item.path } },
+          { params: { repo_url: repoUrl, path: item.path, sha: item.sha } },
         );
         setFileContents((prev) => ({
           ...prev,
@@ -157,7 +192,7 @@ const RepoExplorer = ({ repoUrl , codeId }) => {
           const isItemLoading = loadingPaths.has(itemPath);
 
           return (
-            <li key={item.sha} className="py-1">
+            <li key={item.path || item.sha} className="py-1">
               {item.type === "dir" ? (
                 <div className="group">
                   <div